@@ -0,0 +1,162 @@
+"""
+Motore di aggregazione.
+Costruisce in un solo passaggio sul frame VM un cubo
+datacenter × cluster × host × stato × famiglia OS × versione OS
+con conteggi e somme di vCPU/vRAM/disco; tutti i riepiloghi del report
+(globali, per datacenter, per host, distribuzioni OS) derivano dal cubo.
+"""
+
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from os_classifier import FAMILIES
+
+
+DIMS = ("datacenter", "cluster", "host", "power", "os_family", "simple_os")
+MEASURES = ("count", "tot_vcpu", "vram_mb", "disk_used_gb", "disk_prov_gb")
+# Etichetta usata nel report per datacenter/host vuoti
+EMPTY_LABEL = "N/D"
+LABELLED_DIMS = ("datacenter", "host")
+
+
+class AggregationCube:
+    """
+    Celle del cubo in ordine di prima apparizione, ciascuna con le misure
+    aggregate e le posizioni (crescenti) delle VM nel frame di origine.
+    """
+
+    def __init__(self, vms: pd.DataFrame):
+        if len(vms):
+            power = np.where(vms["power_state"].to_numpy() == "poweredon", "on", "off")
+            keys = pd.MultiIndex.from_arrays(
+                [vms["datacenter"], vms["cluster"], vms["host"], power, vms["os_family"], vms["simple_os"]],
+                names=DIMS,
+            )
+            codes, cells = pd.factorize(keys)
+            cells = cells.to_frame(index=False, name=list(DIMS))
+        else:
+            # Foglio senza VM: factorize non sa dedurre i livelli di un MultiIndex vuoto
+            codes = np.empty(0, dtype=np.int64)
+            cells = pd.DataFrame({d: pd.Series([], dtype=object) for d in DIMS})
+        n_cells = len(cells)
+
+        # Unico passaggio: bincount per le misure, argsort stabile per le posizioni
+        self.cells = cells
+        self.cells["count"] = np.bincount(codes, minlength=n_cells)
+        self.cells["tot_vcpu"] = np.bincount(codes, weights=vms["num_vcpu"].to_numpy(), minlength=n_cells).astype(np.int64)
+        self.cells["vram_mb"] = np.bincount(codes, weights=vms["memory_mb"].to_numpy(), minlength=n_cells)
+        self.cells["disk_used_gb"] = np.bincount(codes, weights=vms["disk_used_gb"].to_numpy(), minlength=n_cells)
+        self.cells["disk_prov_gb"] = np.bincount(codes, weights=vms["disk_provisioned_gb"].to_numpy(), minlength=n_cells)
+
+        order = np.argsort(codes, kind="stable")
+        bounds = np.cumsum(self.cells["count"].to_numpy())[:-1]
+        self.positions = np.split(order, bounds) if n_cells else []
+
+    def _select(self, where: Optional[dict]) -> pd.DataFrame:
+        cells = self.cells
+        for dim, value in (where or {}).items():
+            cells = cells[cells[dim] == value]
+        return cells
+
+    def _cell_positions(self, cell_ids) -> np.ndarray:
+        if not len(cell_ids):
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate([self.positions[i] for i in cell_ids]))
+
+    def rollup(self, by: Tuple[str, ...], where: Optional[dict] = None,
+               labelled: bool = True) -> Dict[tuple, dict]:
+        """
+        Aggrega le celle (filtrate da where) sulle dimensioni by.
+        Chiavi nell'ordine di prima apparizione delle VM; con labelled
+        datacenter e host vuoti confluiscono in "N/D" come nel report.
+        """
+        cells = self._select(where)
+        out = {}
+        if cells.empty:
+            return out
+        if labelled:
+            cells = cells.assign(**{
+                d: cells[d].where(cells[d] != "", EMPTY_LABEL) for d in LABELLED_DIMS if d in by
+            })
+        grouped = cells.groupby(list(by), sort=False)
+        sums = grouped[list(MEASURES)].sum()
+        indices = grouped.indices
+        # sort=False: gruppi nell'ordine delle celle, quindi della prima VM di ciascuno
+        for key, row in zip(sums.index, sums.to_numpy()):
+            cell_ids = indices[key]
+            out[key if isinstance(key, tuple) else (key,)] = {
+                **dict(zip(MEASURES, row)),
+                "positions": self._cell_positions(cells.index[cell_ids]),
+            }
+        return out
+
+    def summaries(self, by: Tuple[str, ...], wrap: Callable[[np.ndarray], Iterable],
+                  where: Optional[dict] = None) -> Dict[tuple, dict]:
+        """
+        Riepiloghi (conteggi, totali e distribuzione OS) per ogni chiave di by,
+        ricavati da un solo rollup by × famiglia × versione OS.
+        wrap converte le posizioni delle VM nella lista esposta come os_vms.
+        """
+        out: Dict[tuple, dict] = {}
+        parts: Dict[tuple, dict] = {}
+        for key, g in self.rollup(by + ("os_family", "simple_os"), where).items():
+            head, (family, simple_os) = key[:len(by)], key[len(by):]
+            s = parts.get(head)
+            if s is None:
+                s = parts[head] = {
+                    "count": 0, "tot_vcpu": 0, "vram_mb": 0.0, "disk_used_gb": 0.0, "disk_prov_gb": 0.0,
+                    "os_counts": {f: 0 for f in FAMILIES},
+                    "os_pos": {f: [] for f in FAMILIES},
+                    "os_dist": {f: {} for f in FAMILIES},
+                }
+            for m in MEASURES:
+                s[m] += g[m]
+            s["os_counts"][family] += int(g["count"])
+            s["os_pos"][family].append(g["positions"])
+            s["os_dist"][family][simple_os] = int(g["count"])
+
+        for head, s in parts.items():
+            out[head] = _format_summary(s, wrap)
+        return out
+
+    def summary(self, wrap: Callable[[np.ndarray], Iterable], where: Optional[dict] = None) -> dict:
+        return self.summaries((), wrap, where).get(()) or empty_summary(wrap)
+
+
+def empty_summary(wrap) -> dict:
+    return _format_summary({
+        "count": 0, "tot_vcpu": 0, "vram_mb": 0.0, "disk_used_gb": 0.0, "disk_prov_gb": 0.0,
+        "os_counts": {f: 0 for f in FAMILIES},
+        "os_pos": {f: [] for f in FAMILIES},
+        "os_dist": {f: {} for f in FAMILIES},
+    }, wrap)
+
+
+def _format_summary(s: dict, wrap) -> dict:
+    os_vms = {}
+    for fam, pos in s["os_pos"].items():
+        os_vms[fam] = wrap(np.sort(np.concatenate(pos)) if pos else np.empty(0, dtype=np.int64))
+    return {
+        "count": int(s["count"]),
+        "tot_vcpu": int(s["tot_vcpu"]),
+        "tot_vram_gb": round(float(s["vram_mb"]) / 1024, 3),
+        "tot_disk_used_gb": round(float(s["disk_used_gb"]), 3),
+        "tot_disk_prov_gb": round(float(s["disk_prov_gb"]), 3),
+        "os_counts": s["os_counts"],
+        "os_vms": os_vms,
+        # Ordina i dizionari os_dist per nome OS
+        "os_dist": {fam: dict(sorted(d.items())) for fam, d in s["os_dist"].items()},
+    }
+
+
+def totals(group: dict) -> dict:
+    """Misure di un gruppo del rollup nel formato usato dal template."""
+    return {
+        "count": int(group["count"]),
+        "tot_vcpu": int(group["tot_vcpu"]),
+        "tot_vram_gb": float(group["vram_mb"]) / 1024,
+        "tot_disk_used_gb": float(group["disk_used_gb"]),
+        "tot_disk_prov_gb": float(group["disk_prov_gb"]),
+    }
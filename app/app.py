@@ -7,17 +7,33 @@ import os
 import uuid
 import json
 import shutil
+import hashlib
+import time
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 
 from flask import (
     Flask, request, redirect, url_for,
-    send_file, render_template, abort, jsonify, make_response
+    send_file, render_template, abort, jsonify, make_response, Response
 )
-from weasyprint import HTML
-from apscheduler.schedulers.background import BackgroundScheduler
-from parser import parse_rvtools
-from report_builder import build_report
+from werkzeug.utils import secure_filename
+from catalog import READY, Catalog
+from diff import get_diff, load_report_inventory
+from exports import DATASETS, FORMATS, parquet_available, stream_export
+from fleet import fleet_overview, report_rollup
+from jobs import JobQueue
+from maintenance import Maintenance
+from metrics import MetricsStore, PhaseTimer
+from parse_cache import ParseCache
+from parser import check_workbook
+from pdf_cache import get_pdf
+from report_builder import ENCODINGS, fmt_gb, fmt_int
+from search_index import SearchIndex, parse_query
+from sections import SECTIONS, get_section
+from upload_stream import StreamingRequest, purge_parts
+from vm_index import DEFAULT_PER_PAGE, get_vm_index
+from whatif import MAX_CPU_RATIO, MAX_MEM_RATIO, MAX_RESERVE, get_whatif, parse_params
 
 # ── Config ──────────────────────────────────────────────────────────────────
 BASE_DIR = Path(__file__).parent
@@ -26,15 +42,44 @@ UPLOADS_DIR = DATA_DIR / "uploads"
 REPORTS_DIR = DATA_DIR / "reports"
 STATIC_DIR = BASE_DIR / "static"
 SETTINGS_FILE = DATA_DIR / "settings.json"
+CACHE_DIR = DATA_DIR / "cache"
+JOBS_DIR = DATA_DIR / "jobs"
+CATALOG_FILE = DATA_DIR / "catalog.sqlite3"
+METRICS_FILE = DATA_DIR / "metrics.sqlite3"
+SEARCH_FILE = DATA_DIR / "search.sqlite3"
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+PDF_PRERENDER = os.environ.get("PDF_PRERENDER", "1") == "1"
 RETENTION_DAYS = 180
+# Pulizia dei report scaduti: blocchi di CLEANUP_BATCH, al massimo CLEANUP_TIME_BUDGET secondi per tick
+CLEANUP_BATCH = 50
+CLEANUP_TIME_BUDGET = 60
+PDF_PRERENDER_BATCH = 10
+ROLLUP_BACKFILL_BATCH = 50
+SEARCH_BACKFILL_BATCH = 20
+HISTORY_PER_PAGE = 20
+DIFF_LIST_LIMIT = 200
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", "50"))
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("PARSE_CACHE_MAX_MB", "2048")) * 1024 * 1024
 PORT = 8080
 
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 UPLOADS_DIR.mkdir(exist_ok=True)
 REPORTS_DIR.mkdir(exist_ok=True)
 
+parse_cache = ParseCache(CACHE_DIR)
+# Un job perso con il suo processo non lascia report a metà né righe nel catalogo
+job_queue = JobQueue(JOBS_DIR, max_workers=JOB_WORKERS, on_lost=lambda report_id: remove_report(report_id))
+catalog = Catalog(CATALOG_FILE)
+metrics = MetricsStore(METRICS_FILE)
+search_index = SearchIndex(SEARCH_FILE)
+
 app = Flask(__name__, template_folder="templates", static_folder="static")
-app.config["MAX_CONTENT_LENGTH"] = 50 * 1024 * 1024  # 50 MB
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_MB * 1024 * 1024
+# Gli xlsx caricati vengono scritti direttamente nella cartella degli upload
+app.request_class = StreamingRequest
+StreamingRequest.upload_dir = UPLOADS_DIR
+# Stessi filtri del report per i frammenti delle sezioni caricati nella pagina
+app.jinja_env.filters.update(fmt_gb=fmt_gb, fmt_int=fmt_int)
 
 
 # ── Settings (logo + colori personalizzabili) ────────────────────────────────
@@ -61,42 +106,116 @@ def save_settings(data: dict):
         json.dump(current, f)
 
 
-# ── Pulizia automatica (5 giorni) ────────────────────────────────────────────
-def cleanup_old_files():
-    cutoff = datetime.now() - timedelta(days=RETENTION_DAYS)
-    for folder in [UPLOADS_DIR, REPORTS_DIR]:
-        for entry in folder.iterdir():
-            if entry.is_dir():
-                ts_file = entry / "timestamp.txt"
-                if ts_file.exists():
-                    ts = datetime.fromisoformat(ts_file.read_text().strip())
-                    if ts < cutoff:
-                        shutil.rmtree(entry)
+# ── Manutenzione: pulizia automatica, cache, precalcoli ──────────────────────
+def remove_report(report_id: str):
+    for folder in (UPLOADS_DIR / report_id, REPORTS_DIR / report_id):
+        if folder.exists():
+            shutil.rmtree(folder)
+    catalog.delete(report_id)
+    search_index.delete(report_id)
+
+
+def rebuild_empty_catalog():
+    # Primo avvio con un catalogo nuovo su una cartella dati esistente
+    if catalog.is_empty():
+        catalog.rebuild(REPORTS_DIR, UPLOADS_DIR)
+
+
+def cleanup_expired_reports() -> bool:
+    """Elimina i report scaduti a blocchi, entro un tempo massimo; True se ne restano."""
+    cutoff = (datetime.now() - timedelta(days=RETENTION_DAYS)).isoformat()
+    deadline = time.monotonic() + CLEANUP_TIME_BUDGET
+    while time.monotonic() < deadline:
+        batch = catalog.expired(cutoff, limit=CLEANUP_BATCH)
+        if not batch:
+            return False
+        for report_id in batch:
+            remove_report(report_id)
+    return True
+
+
+def evict_parse_cache():
+    # Dopo la rimozione dei report, i blob xlsx non più referenziati si liberano
+    parse_cache.evict(max_age_days=RETENTION_DAYS, max_bytes=PARSE_CACHE_MAX_BYTES)
+
+
+def purge_temporary_files():
+    job_queue.expire_stale()
+    job_queue.purge()
+    purge_parts(UPLOADS_DIR)
+
+
+def prerender_recent_pdfs():
+    """PDF dei report più recenti con il branding corrente (es. dopo un cambio di impostazioni)."""
+    settings = get_settings()
+    reports, _ = catalog.search(per_page=PDF_PRERENDER_BATCH)
+    for meta in reports:
+        report_folder = REPORTS_DIR / meta["id"]
+        if (report_folder / "report.html").exists():
+            get_pdf(report_folder, settings, BASE_DIR, STATIC_DIR)
 
 
-scheduler = BackgroundScheduler()
-scheduler.add_job(cleanup_old_files, "interval", hours=12)
-scheduler.start()
+def backfill_fleet_rollup():
+    """Totali per la dashboard della flotta dei report che non li hanno (creati prima o catalogo ricostruito)."""
+    for report_id in catalog.missing_rollups(limit=ROLLUP_BACKFILL_BATCH):
+        try:
+            inventory = load_report_inventory(REPORTS_DIR / report_id, UPLOADS_DIR / report_id)
+        except FileNotFoundError:
+            continue
+        catalog.put_rollup(report_id, report_rollup(inventory))
+
+
+def sync_search_index():
+    """
+    Allinea l'indice di ricerca al catalogo: toglie i report non più presenti
+    (es. eliminati da un job fallito o catalogo ricostruito) e indicizza a
+    blocchi quelli pronti che mancano (creati prima dell'indice).
+    """
+    ready = catalog.ready()
+    indexed = search_index.indexed()
+    for report_id in indexed - {meta["id"] for meta in ready}:
+        search_index.delete(report_id)
+    missing = [meta for meta in ready if meta["id"] not in indexed][:SEARCH_BACKFILL_BATCH]
+    for meta in missing:
+        try:
+            inventory = load_report_inventory(REPORTS_DIR / meta["id"], UPLOADS_DIR / meta["id"])
+        except FileNotFoundError:
+            continue
+        search_index.add(meta, inventory["vms"])
+
+
+# Un solo worker (il leader) esegue le attività; le altre istanze restano in attesa
+maintenance = Maintenance(DATA_DIR, metrics=metrics)
+maintenance.add_task("cleanup_reports", cleanup_expired_reports, interval_hours=12)
+maintenance.add_task("evict_parse_cache", evict_parse_cache, interval_hours=12)
+maintenance.add_task("purge_temporary_files", purge_temporary_files, interval_hours=1)
+maintenance.add_task("backfill_fleet_rollup", backfill_fleet_rollup, interval_hours=1)
+maintenance.add_task("sync_search_index", sync_search_index, interval_hours=1)
+if PDF_PRERENDER:
+    maintenance.add_task("prerender_pdfs", prerender_recent_pdfs, interval_hours=1)
+# All'avvio lo ricostruisce il solo worker che diventa leader, non tutti insieme sullo stesso file
+maintenance.run_as_leader(rebuild_empty_catalog)
+maintenance.start()
 
 
 # ── Helper per metadati report ───────────────────────────────────────────────
 def get_report_meta(report_id: str) -> dict | None:
-    meta_file = REPORTS_DIR / report_id / "meta.json"
-    if meta_file.exists():
-        with open(meta_file) as f:
-            return json.load(f)
-    return None
+    return catalog.get(report_id)
 
 
-def list_reports() -> list:
-    reports = []
-    for d in sorted(REPORTS_DIR.iterdir(), reverse=True):
-        if d.is_dir():
-            meta = get_report_meta(d.name)
-            if meta:
-                reports.append(meta)
-    reports.sort(key=lambda x: x.get("created", ""), reverse=True)
-    return reports
+@lru_cache(maxsize=256)
+def _file_digest(path: str, size: int, mtime_ns: int) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def report_etag(html_path: Path) -> str:
+    """ETag forte: hash del contenuto di report.html, calcolato una volta per versione del file."""
+    st = html_path.stat()
+    return _file_digest(str(html_path), st.st_size, st.st_mtime_ns)
 
 
 # ── Routes ───────────────────────────────────────────────────────────────────
@@ -107,15 +226,35 @@ def index():
     return render_template("index.html", settings=settings)
 
 
+def upload_error(message: str, status: int = 400):
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify(error=message), status
+    return render_template("error.html", message=message, settings=get_settings()), status
+
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return upload_error(f"Il file supera la dimensione massima consentita ({MAX_UPLOAD_MB} MB).", 413)
+
+
 @app.route("/upload", methods=["POST"])
 def upload():
-    if "file" not in request.files:
+    timer = PhaseTimer()
+    # Il corpo multipart viene letto al primo accesso a request.files
+    with timer.phase("upload_receive"):
+        f = request.files.get("file")
+    if f is None:
         return redirect(url_for("index"))
-    f = request.files["file"]
     if not f.filename or not f.filename.lower().endswith(".xlsx"):
-        return render_template("error.html",
-                               message="Carica un file .xlsx valido.",
-                               settings=get_settings()), 400
+        return upload_error("Carica un file .xlsx valido.")
+
+    # Verifica di fogli e colonne prima di accodare il parsing completo
+    f.stream.flush()
+    with timer.phase("upload_check"):
+        try:
+            workbook = check_workbook(str(f.stream.path))
+        except ValueError as e:
+            return upload_error(str(e))
 
     report_id = uuid.uuid4().hex
     upload_folder = UPLOADS_DIR / report_id
@@ -128,19 +267,8 @@ def upload():
     (upload_folder / "timestamp.txt").write_text(ts)
     (report_folder / "timestamp.txt").write_text(ts)
 
-    # Salva il file xlsx
-    xlsx_path = upload_folder / f.filename
-    f.save(str(xlsx_path))
-
-    # Analizza
-    try:
-        data = parse_rvtools(str(xlsx_path))
-    except Exception as e:
-        shutil.rmtree(upload_folder, ignore_errors=True)
-        shutil.rmtree(report_folder, ignore_errors=True)
-        return render_template("error.html",
-                               message=f"Errore nella lettura del file: {e}",
-                               settings=get_settings()), 400
+    # Il file è già su disco (ricevuto in streaming): basta spostarlo
+    xlsx_path = f.stream.commit(upload_folder / f.filename)
 
     # Custom Metadata
     custom_title = request.form.get("report_title", "").strip()
@@ -152,83 +280,278 @@ def upload():
         except:
             pass
 
-    # Genera HTML
-    settings = get_settings()
-    html_content = build_report(
-        data, report_id, f.filename, 
-        custom=settings, 
-        custom_title=custom_title,
-        custom_date=custom_date
-    )
-    html_path = report_folder / "report.html"
-    html_path.write_text(html_content, encoding="utf-8")
-
-    # Salva metadati
-    meta = {
-        "id": report_id,
+    catalog.add_pending(report_id, f.filename, ts, custom_title, custom_date)
+
+    # Analisi e generazione del report in background: il job id è l'id del report
+    params = {
+        "report_id": report_id,
+        "xlsx_path": str(xlsx_path),
         "filename": f.filename,
+        "upload_folder": str(upload_folder),
+        "report_folder": str(report_folder),
+        "cache_dir": str(CACHE_DIR),
+        "settings": get_settings(),
         "created": ts,
         "custom_title": custom_title,
         "custom_date": custom_date,
-        "vms_on": data["summary_on"]["count"],
-        "vms_off": data["summary_off"]["count"],
-        "total": data["summary_total"]["count"],
+        # PDF pre-generato in background una volta pronto il report
+        "base_dir": str(BASE_DIR) if PDF_PRERENDER else None,
+        "static_dir": str(STATIC_DIR) if PDF_PRERENDER else None,
+        "catalog_path": str(CATALOG_FILE),
+        "metrics_path": str(METRICS_FILE),
+        "search_path": str(SEARCH_FILE),
+        "timings": timer.phases,
+        "sha256": f.stream.hexdigest(),
     }
-    with open(report_folder / "meta.json", "w") as mf:
-        json.dump(meta, mf)
-
-    return redirect(url_for("view_report", report_id=report_id))
+    try:
+        job_queue.submit(report_id, params)
+    except Exception:
+        # Senza job il report non verrebbe mai completato: niente cartelle né riga in attesa
+        remove_report(report_id)
+        raise
+
+    if request.accept_mimetypes.best == "application/json":
+        response = {"job_id": report_id, "status_url": url_for("job_status", job_id=report_id)}
+        if workbook["missing"]:
+            # Il report si genera comunque, ma quei campi restano vuoti (i facoltativi non contano)
+            response["warning"] = (f"Colonne non trovate nel foglio {workbook['vinfo']}: "
+                                   f"{', '.join(workbook['missing'])}; nel report i relativi valori restano vuoti.")
+        return jsonify(response), 202
+    return redirect(url_for("index", job=report_id))
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id: str):
+    status = job_queue.get(job_id)
+    if status is None:
+        abort(404)
+    if status["status"] == "done":
+        status["report_url"] = url_for("view_report", report_id=status["report_id"])
+    return jsonify(status)
 
 
 @app.route("/report/<report_id>")
 def view_report(report_id: str):
     html_path = REPORTS_DIR / report_id / "report.html"
-    return html_path.read_text(encoding="utf-8")
+    if not html_path.exists():
+        # Report ancora in elaborazione: torna alla pagina che ne segue il job
+        status = job_queue.get(report_id)
+        if status and status["status"] in ("queued", "running"):
+            return redirect(url_for("index", job=report_id))
+        abort(404)
+
+    # Copia precompressa se il client la accetta (report generati prima non ce l'hanno)
+    etag = report_etag(html_path)
+    path, encoding = html_path, None
+    for enc, suffix in ENCODINGS:
+        candidate = html_path.with_name(html_path.name + suffix)
+        if request.accept_encodings[enc] and candidate.exists():
+            path, encoding = candidate, enc
+            etag = f"{etag}-{enc}"
+            break
+
+    response = send_file(str(path), mimetype="text/html", etag=etag, conditional=True,
+                         last_modified=html_path.stat().st_mtime)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response
+
+
+@app.route("/report/<report_id>/vms")
+def report_vms(report_id: str):
+    """Elenco paginato delle VM del report, con filtri e ordinamento."""
+    args = request.args
+    try:
+        index = get_vm_index(REPORTS_DIR / report_id)
+    except FileNotFoundError:
+        abort(404)
+    try:
+        result = index.query(
+            dc=args.get("dc"),
+            host=args.get("host"),
+            power=args.get("power"),
+            simple_os=args.get("os"),
+            family=args.get("family"),
+            q=args.get("q"),
+            sort=args.get("sort", "name"),
+            page=args.get("page", 1),
+            per_page=args.get("per_page", DEFAULT_PER_PAGE),
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(result)
+
+
+@app.route("/report/<report_id>/sections/<name>")
+def report_section(report_id: str, name: str):
+    """Sezione di un foglio opzionale (vSnapshot, vPartition, vDisk), calcolata alla prima richiesta."""
+    report_folder = REPORTS_DIR / report_id
+    if name not in SECTIONS or not (report_folder / "report.html").exists():
+        abort(404)
+    try:
+        section = get_section(name, report_folder, UPLOADS_DIR / report_id)
+    except FileNotFoundError:
+        abort(404)
+
+    if request.args.get("format") == "json" or request.accept_mimetypes.best == "application/json":
+        return jsonify(section)
+    response = make_response(render_template(f"section_{name}.html", section=section))
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response
+
+
+@app.route("/report/<report_id>/whatif")
+def report_whatif(report_id: str):
+    """Simulazione di consolidamento: host necessari e liberabili per rapporti di overcommit e riserva dati."""
+    meta = get_report_meta(report_id)
+    if not meta or meta["status"] != READY:
+        abort(404)
+    try:
+        params = parse_params(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    try:
+        result = get_whatif(REPORTS_DIR / report_id, UPLOADS_DIR / report_id).simulate(**params)
+    except FileNotFoundError:
+        abort(404)
+
+    if request.args.get("format") == "json" or request.accept_mimetypes.best == "application/json":
+        return jsonify(result)
+    limits = {"cpu_ratio": MAX_CPU_RATIO, "mem_ratio": MAX_MEM_RATIO, "reserve": MAX_RESERVE}
+    response = make_response(render_template("section_whatif.html", result=result, limits=limits))
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response
+
+
+@app.route("/report/<report_id>/export/<dataset>.<fmt>")
+def export_data(report_id: str, dataset: str, fmt: str):
+    """Inventario VM, host, datacenter o distribuzione OS in CSV, JSON Lines o Parquet, in streaming."""
+    meta = get_report_meta(report_id)
+    if dataset not in DATASETS or fmt not in FORMATS or not meta or meta["status"] != READY:
+        abort(404)
+    if fmt == "parquet" and not parquet_available():
+        return jsonify(error="Esportazione Parquet non disponibile: installare pyarrow"), 501
+    try:
+        inventory = load_report_inventory(REPORTS_DIR / report_id, UPLOADS_DIR / report_id)
+    except FileNotFoundError:
+        abort(404)
+
+    mimetype, ext = FORMATS[fmt]
+    filename = secure_filename(f"{Path(meta['filename']).stem}_{dataset}.{ext}")
+    response = Response(stream_export(inventory, dataset, fmt), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response.cache_control.private = True
+    return response
 
 
 @app.route("/report/<report_id>/pdf")
 def export_pdf(report_id: str):
-    html_path = REPORTS_DIR / report_id / "report.html"
-    if not html_path.exists():
+    report_folder = REPORTS_DIR / report_id
+    if not (report_folder / "report.html").exists():
         abort(404)
-    
-    html_content = html_path.read_text(encoding="utf-8")
-    
-    # Per WeasyPrint, i percorsi che iniziano con / vengono cercati alla radice del filesystem.
-    # Trasformiamo i percorsi /static/ in static/ (relativi alla base_url)
-    html_content = html_content.replace('src="/static/', 'src="static/')
-    html_content = html_content.replace('href="/static/', 'href="static/')
-    
-    # Per WeasyPrint, dobbiamo specificare la base_url per caricare immagini e font locali
-    # Usiamo il percorso assoluto della cartella app
-    base_url = str(BASE_DIR)
-    
-    # Genera PDF
-    pdf_bytes = HTML(string=html_content, base_url=base_url).write_pdf()
-    
+
+    # PDF dalla cache (generato al massimo una volta per contenuto + branding)
+    settings = get_settings()
+    timer = PhaseTimer()
+    pdf_path, key = get_pdf(report_folder, settings, BASE_DIR, STATIC_DIR, timer=timer)
+    if timer.phases:
+        metrics.record_phases(timer.phases)
+
     # Recupera metadati per un nome file più parlante
     meta = get_report_meta(report_id)
-    settings = get_settings()
     customer = settings.get("company_name", "VarGroup").replace(" ", "_").replace("/", "-")
     title = meta.get("custom_title", "Analisi_RVTools").replace(" ", "_") if meta else "Analisi_RVTools"
     date_str = datetime.now().strftime("%Y%m%d_%H%M")
-    
+
     filename = f"{customer}_{title}_{date_str}.pdf"
-    
-    response = make_response(pdf_bytes)
-    response.headers["Content-Type"] = "application/pdf"
+
+    response = send_file(str(pdf_path), mimetype="application/pdf", download_name=filename,
+                         etag=key, conditional=True, last_modified=pdf_path.stat().st_mtime)
     response.headers["Content-Disposition"] = f"inline; filename={filename}"
-    
+    # Sempre rivalidato: un cambio di branding produce un nuovo ETag
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
     return response
 
 
+@app.route("/metrics")
+def prometheus_metrics():
+    """Metriche di tutti i worker e dei processi dei job, in formato Prometheus."""
+    response = make_response(metrics.exposition())
+    response.mimetype = "text/plain"
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    return response
+
+
+@app.route("/maintenance")
+def maintenance_status():
+    """Ultima esecuzione, durata ed esito delle attività di manutenzione."""
+    return jsonify(maintenance.status())
 
 
 @app.route("/history")
 def history():
-    reports = list_reports()
+    q = request.args.get("q", "").strip()
+    page = max(1, request.args.get("page", 1, type=int))
+    reports, total = catalog.search(q, page=page, per_page=HISTORY_PER_PAGE)
+    pages = max(1, -(-total // HISTORY_PER_PAGE))
     settings = get_settings()
-    return render_template("history.html", reports=reports, settings=settings)
+    return render_template("history.html", reports=reports, settings=settings,
+                           q=q, page=page, pages=pages, total=total)
+
+
+@app.route("/fleet")
+def fleet():
+    """Totali e andamento di tutti i report conservati, dalla tabella rollup del catalogo."""
+    result = fleet_overview(catalog.rollups())
+    if request.args.get("format") == "json" or request.accept_mimetypes.best == "application/json":
+        return jsonify(result)
+    return render_template("fleet.html", fleet=result, settings=get_settings())
+
+
+@app.route("/search")
+def search():
+    """Ricerca di VM, host, cluster, datacenter e sistemi operativi in tutti i report conservati."""
+    wants_json = request.args.get("format") == "json" or request.accept_mimetypes.best == "application/json"
+    result, error = None, None
+    if request.args.get("q", "").strip():
+        try:
+            params = parse_query(request.args)
+        except ValueError as e:
+            if wants_json:
+                return jsonify(error=str(e)), 400
+            error = str(e)
+        else:
+            result = search_index.search(**params)
+    elif wants_json:
+        return jsonify(error="Parametro q obbligatorio"), 400
+    if wants_json:
+        return jsonify(result)
+    return render_template("search.html", result=result, error=error, args=request.args, settings=get_settings())
+
+
+@app.route("/diff/<base_id>/<target_id>")
+def diff_reports(base_id: str, target_id: str):
+    """Confronto tra due report: base (prima) e target (dopo)."""
+    base, target = get_report_meta(base_id), get_report_meta(target_id)
+    if not base or not target or {base["status"], target["status"]} != {READY}:
+        abort(404)
+    try:
+        result = get_diff(base_id, target_id, REPORTS_DIR, UPLOADS_DIR)
+    except FileNotFoundError:
+        abort(404)
+
+    if request.args.get("format") == "json" or request.accept_mimetypes.best == "application/json":
+        return jsonify(base=base, target=target, **result)
+    # Nella pagina solo gli host in cui il numero di VM è cambiato
+    changed_hosts = [h for h in result["hosts"] if h["added"] or h["removed"] or h["delta_count"]]
+    return render_template("diff.html", base=base, target=target, diff=result, changed_hosts=changed_hosts,
+                           limit=DIFF_LIST_LIMIT, settings=get_settings())
 
 
 @app.route("/history/<report_id>/download")
@@ -246,14 +569,7 @@ def download_report_excel(report_id: str):
 @app.route("/history/<report_id>/delete", methods=["POST"])
 def delete_report(report_id: str):
     """Elimina definitivamente un report e i suoi file."""
-    upload_folder = UPLOADS_DIR / report_id
-    report_folder = REPORTS_DIR / report_id
-
-    if upload_folder.exists():
-        shutil.rmtree(upload_folder)
-    if report_folder.exists():
-        shutil.rmtree(report_folder)
-
+    remove_report(report_id)
     return redirect(url_for("history"))
 
 
@@ -0,0 +1,182 @@
+"""
+Importazione massiva di export RVTools da riga di comando.
+
+    cd app && DATA_DIR=... python3 bulk_ingest.py /percorso/export/ "altri/*.xlsx"
+
+Ogni file viene elaborato con la stessa pipeline dell'upload web (stesse
+cartelle uploads/<id> e reports/<id>, stesso meta.json e catalogo) in un
+pool di processi. L'avanzamento è registrato in un file di stato JSONL:
+rilanciando il comando i file già importati vengono saltati e quelli in
+errore ritentati.
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from catalog import Catalog
+from pipeline import generate_report
+
+
+BASE_DIR = Path(__file__).parent
+DATA_DIR = Path(os.environ.get("DATA_DIR", str(BASE_DIR / "data")))
+STATE_FILE = "bulk_ingest.jsonl"
+
+
+def find_files(sources: list, recursive: bool = False) -> list:
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            pattern = "**/*.xlsx" if recursive else "*.xlsx"
+            matches = [str(p) for p in Path(source).glob(pattern)]
+        else:
+            matches = glob.glob(source, recursive=recursive)
+        # Esclude i file di lock di Excel (~$nome.xlsx)
+        files += [m for m in matches if m.lower().endswith(".xlsx") and not os.path.basename(m).startswith("~$")]
+    return sorted({os.path.abspath(f) for f in files})
+
+
+def _file_key(path: str) -> tuple:
+    st = os.stat(path)
+    return path, st.st_size, st.st_mtime_ns
+
+
+def load_state(state_path: Path) -> dict:
+    """Ultimo esito per ogni file sorgente (percorso, dimensione, mtime)."""
+    state = {}
+    if state_path.exists():
+        with open(state_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Riga troncata da un'interruzione
+                    continue
+                state[(entry["source"], entry["size"], entry["mtime_ns"])] = entry
+    return state
+
+
+def ingest_file(source: str, data_dir: str, settings: dict, with_pdf: bool) -> dict:
+    """Eseguito nel processo del pool: un errore riguarda solo questo file."""
+    data_dir = Path(data_dir)
+    started = time.perf_counter()
+    report_id = uuid.uuid4().hex
+    upload_folder = data_dir / "uploads" / report_id
+    report_folder = data_dir / "reports" / report_id
+    catalog_path = data_dir / "catalog.sqlite3"
+    filename = os.path.basename(source)
+    result = {"report_id": report_id, "size_bytes": os.path.getsize(source)}
+    try:
+        upload_folder.mkdir(parents=True)
+        report_folder.mkdir(parents=True)
+        ts = datetime.now().isoformat()
+        (upload_folder / "timestamp.txt").write_text(ts)
+        (report_folder / "timestamp.txt").write_text(ts)
+        xlsx_path = upload_folder / filename
+        shutil.copyfile(source, xlsx_path)
+        Catalog(catalog_path).add_pending(report_id, filename, ts)
+
+        meta = generate_report(
+            report_id=report_id,
+            xlsx_path=str(xlsx_path),
+            filename=filename,
+            upload_folder=str(upload_folder),
+            report_folder=str(report_folder),
+            cache_dir=str(data_dir / "cache"),
+            settings=settings,
+            created=ts,
+            base_dir=str(Path(__file__).parent) if with_pdf else None,
+            static_dir=str(Path(__file__).parent / "static") if with_pdf else None,
+            catalog_path=str(catalog_path),
+            metrics_path=str(data_dir / "metrics.sqlite3"),
+            search_path=str(data_dir / "search.sqlite3"),
+        )
+        result.update(status="done", vms=meta["total"])
+    except Exception as e:
+        traceback.print_exc()
+        shutil.rmtree(upload_folder, ignore_errors=True)
+        shutil.rmtree(report_folder, ignore_errors=True)
+        Catalog(catalog_path).delete(report_id)
+        result.update(status="error", error=f"{type(e).__name__}: {e}", report_id=None)
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Importa in blocco export RVTools (.xlsx).")
+    ap.add_argument("sources", nargs="+", help="cartelle o pattern glob di file .xlsx")
+    ap.add_argument("-r", "--recursive", action="store_true", help="cerca anche nelle sottocartelle")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="processi paralleli (default: tutti i core)")
+    ap.add_argument("--pdf", action="store_true", help="genera subito anche i PDF")
+    ap.add_argument("--state", help=f"file di stato per la ripresa (default: DATA_DIR/{STATE_FILE})")
+    args = ap.parse_args(argv)
+
+    for sub in ("uploads", "reports"):
+        (DATA_DIR / sub).mkdir(parents=True, exist_ok=True)
+    state_path = Path(args.state) if args.state else DATA_DIR / STATE_FILE
+    settings = {}
+    if (DATA_DIR / "settings.json").exists():
+        with open(DATA_DIR / "settings.json") as f:
+            settings = json.load(f)
+
+    state = load_state(state_path)
+    files = find_files(args.sources, args.recursive)
+    todo, skipped = [], 0
+    for path in files:
+        key = _file_key(path)
+        if state.get(key, {}).get("status") == "done":
+            skipped += 1
+        else:
+            todo.append(key)
+    print(f"{len(files)} file trovati, {skipped} già importati, {len(todo)} da elaborare")
+
+    started = time.perf_counter()
+    done = failed = vms = size = 0
+    with open(state_path, "a") as log, ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {
+            pool.submit(ingest_file, path, str(DATA_DIR), settings, args.pdf): (path, fsize, mtime_ns)
+            for path, fsize, mtime_ns in todo
+        }
+        for n, future in enumerate(as_completed(futures), 1):
+            path, fsize, mtime_ns = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # Il processo del pool è terminato (es. memoria esaurita)
+                result = {"status": "error", "error": f"{type(e).__name__}: {e}", "report_id": None,
+                          "size_bytes": fsize, "seconds": None}
+            entry = {"source": path, "size": fsize, "mtime_ns": mtime_ns,
+                     "finished": datetime.now().isoformat(), **result}
+            log.write(json.dumps(entry) + "\n")
+            log.flush()
+
+            if result["status"] == "done":
+                done += 1
+                vms += result["vms"]
+                size += result["size_bytes"]
+                print(f"[{n}/{len(todo)}] OK     {path} -> {result['report_id']} "
+                      f"({result['vms']} VM, {result['seconds']:.1f}s)")
+            else:
+                failed += 1
+                print(f"[{n}/{len(todo)}] ERRORE {path}: {result['error']}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    rate = elapsed or 1e-9
+    print()
+    print(f"Importati: {done}  Errori: {failed}  Saltati: {skipped}")
+    print(f"Tempo: {elapsed:.1f}s  ({done / rate:.2f} file/s, {vms / rate:.0f} VM/s, "
+          f"{size / 1024 / 1024 / rate:.1f} MB/s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
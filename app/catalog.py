@@ -0,0 +1,233 @@
+"""
+Catalogo dei report su SQLite (WAL): storico paginato con ricerca,
+metadati per id e query dei report scaduti senza scandire le cartelle.
+La tabella rollup tiene i totali di ogni report pronto per la dashboard
+della flotta; le righe seguono quelle di reports (inserite e cancellate
+insieme).
+I file su disco restano la fonte di verità: il catalogo si ricostruisce con
+
+    python catalog.py rebuild
+"""
+
+import json
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from fleet import ROLLUP_FIELDS
+
+
+PENDING, READY = "pending", "ready"
+META_FIELDS = ("id", "filename", "sha256", "created", "custom_title", "custom_date", "vms_on", "vms_off", "total")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id           TEXT PRIMARY KEY,
+    status       TEXT NOT NULL,
+    filename     TEXT NOT NULL DEFAULT '',
+    sha256       TEXT,
+    created      TEXT NOT NULL,
+    custom_title TEXT NOT NULL DEFAULT '',
+    custom_date  TEXT,
+    vms_on       INTEGER,
+    vms_off      INTEGER,
+    total        INTEGER
+);
+CREATE INDEX IF NOT EXISTS reports_created ON reports (created);
+CREATE INDEX IF NOT EXISTS reports_status_created ON reports (status, created);
+CREATE INDEX IF NOT EXISTS reports_filename ON reports (filename COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS reports_title ON reports (custom_title COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS rollup (
+    report_id           TEXT PRIMARY KEY,
+    vms                 INTEGER NOT NULL,
+    vms_on              INTEGER NOT NULL,
+    vcpu                INTEGER NOT NULL,
+    vcpu_on             INTEGER NOT NULL,
+    vram_gb             REAL NOT NULL,
+    vram_gb_on          REAL NOT NULL,
+    disk_used_gb        REAL NOT NULL,
+    disk_provisioned_gb REAL NOT NULL,
+    hosts               INTEGER NOT NULL,
+    vms_windows         INTEGER NOT NULL,
+    vms_linux           INTEGER NOT NULL,
+    vms_other           INTEGER NOT NULL
+);
+"""
+
+
+def _like(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class Catalog:
+    def __init__(self, path):
+        self.path = Path(path)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Una connessione per operazione: usabile da thread, worker e processi del pool
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add_pending(self, report_id: str, filename: str, created: str, custom_title: str = "",
+                    custom_date: Optional[str] = None):
+        """Registra un upload appena ricevuto, prima che il job lo elabori."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO reports (id, status, filename, created, custom_title, custom_date) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (report_id, PENDING, filename, created, custom_title or "", custom_date),
+            )
+
+    def put(self, meta: dict):
+        """Inserisce o aggiorna un report pronto a partire dal suo meta.json."""
+        with self._connect() as conn:
+            self._put(conn, meta)
+
+    @staticmethod
+    def _put(conn, meta: dict):
+        row = {k: meta.get(k) for k in META_FIELDS}
+        row["custom_title"] = row["custom_title"] or ""
+        row["filename"] = row["filename"] or ""
+        conn.execute(
+            f"INSERT OR REPLACE INTO reports (status, {', '.join(META_FIELDS)}) "
+            f"VALUES (?, {', '.join('?' for _ in META_FIELDS)})",
+            (READY, *row.values()),
+        )
+        if meta.get("rollup"):
+            Catalog._put_rollup(conn, meta["id"], meta["rollup"])
+
+    @staticmethod
+    def _put_rollup(conn, report_id: str, rollup: dict):
+        conn.execute(
+            f"INSERT OR REPLACE INTO rollup (report_id, {', '.join(ROLLUP_FIELDS)}) "
+            f"VALUES (?, {', '.join('?' for _ in ROLLUP_FIELDS)})",
+            (report_id, *(rollup.get(k, 0) for k in ROLLUP_FIELDS)),
+        )
+
+    def put_rollup(self, report_id: str, rollup: dict):
+        """Totali di un report già catalogato (report creati prima della tabella rollup)."""
+        with self._connect() as conn:
+            self._put_rollup(conn, report_id, rollup)
+
+    def delete(self, report_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM reports WHERE id = ?", (report_id,))
+            conn.execute("DELETE FROM rollup WHERE report_id = ?", (report_id,))
+
+    def get(self, report_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM reports WHERE id = ?", (report_id,)).fetchone()
+        return dict(row) if row else None
+
+    def search(self, q: str = "", page: int = 1, per_page: int = 20) -> tuple:
+        """Report pronti, dal più recente, filtrati per nome file o titolo. Restituisce (righe, totale)."""
+        where, params = "status = ?", [READY]
+        if q:
+            where += " AND (filename LIKE ? ESCAPE '\\' OR custom_title LIKE ? ESCAPE '\\')"
+            params += [_like(q), _like(q)]
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM reports WHERE {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM reports WHERE {where} ORDER BY created DESC LIMIT ? OFFSET ?",
+                (*params, per_page, (page - 1) * per_page),
+            ).fetchall()
+        return [dict(r) for r in rows], total
+
+    def expired(self, cutoff: str, limit: int = -1) -> list:
+        """
+        Id dei report (anche non completati) creati prima di cutoff (ISO 8601),
+        dal più vecchio; al massimo limit (-1: tutti).
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM reports WHERE created < ? ORDER BY created LIMIT ?",
+                                (cutoff, limit)).fetchall()
+        return [r["id"] for r in rows]
+
+    def rollups(self) -> list:
+        """Totali dei report pronti con titolo, nome file e date, dal più vecchio."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT r.id, r.filename, r.custom_title, r.custom_date, r.created, u.* "
+                "FROM reports r JOIN rollup u ON u.report_id = r.id WHERE r.status = ? ORDER BY r.created",
+                (READY,),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def missing_rollups(self, limit: int = -1) -> list:
+        """Id dei report pronti senza riga in rollup, dal più recente."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM reports WHERE status = ? AND id NOT IN (SELECT report_id FROM rollup) "
+                "ORDER BY created DESC LIMIT ?",
+                (READY, limit),
+            ).fetchall()
+        return [r["id"] for r in rows]
+
+    def ready(self, limit: int = -1) -> list:
+        """Report pronti (id, nome file, titolo, data), dal più recente."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, filename, custom_title, created FROM reports WHERE status = ? "
+                "ORDER BY created DESC LIMIT ?",
+                (READY, limit),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def is_empty(self) -> bool:
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM reports LIMIT 1").fetchone() is None
+
+    def rebuild(self, reports_dir, uploads_dir) -> int:
+        """
+        Ricrea il catalogo dalle cartelle dei report: meta.json per i report
+        pronti, timestamp.txt per quelli senza metadati (che così scadono
+        comunque con la retention). I totali per la flotta vengono da
+        meta.json; quelli mancanti li ricalcola la manutenzione.
+        Restituisce il numero di report catalogati.
+        """
+        rows = {}
+        for folder in (Path(uploads_dir), Path(reports_dir)):
+            for entry in folder.iterdir():
+                ts_file = entry / "timestamp.txt"
+                if entry.is_dir() and ts_file.exists():
+                    rows[entry.name] = (entry.name, PENDING, "", ts_file.read_text().strip())
+        ready = []
+        for entry in Path(reports_dir).iterdir():
+            meta_file = entry / "meta.json"
+            if meta_file.exists():
+                with open(meta_file) as f:
+                    meta = json.load(f)
+                pending = rows.pop(entry.name, None)
+                if not meta.get("created") and pending:
+                    meta["created"] = pending[3]
+                ready.append(meta)
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM reports")
+            conn.execute("DELETE FROM rollup")
+            conn.executemany("INSERT INTO reports (id, status, filename, created) VALUES (?, ?, ?, ?)", rows.values())
+            for meta in ready:
+                self._put(conn, meta)
+        return len(rows) + len(ready)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("Uso: python catalog.py rebuild")
+    data_dir = Path(os.environ.get("DATA_DIR", str(Path(__file__).parent / "data")))
+    n = Catalog(data_dir / "catalog.sqlite3").rebuild(data_dir / "reports", data_dir / "uploads")
+    print(f"Catalogo ricostruito: {n} report")
@@ -0,0 +1,189 @@
+"""
+Confronto tra due export dello stesso ambiente.
+Gli inventari colonnari dei due report vengono uniti con un hash join
+sull'identità della VM (UUID se entrambi i fogli lo riportano, altrimenti
+nome + datacenter): VM aggiunte, rimosse, spostate, ridimensionate, con
+stato di accensione cambiato e variazioni di disco, più i delta aggregati
+per datacenter e per host.
+Il risultato è salvato in JSON nella cartella del report più recente.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aggregation import EMPTY_LABEL
+from parse_cache import load_inventory, save_inventory
+from parser import read_inventory
+from vm_index import INVENTORY_FILE
+
+
+DIFF_VERSION = 1
+DIFFS_DIR = "diffs"
+# Sotto questa soglia (GB) una variazione di disco non viene segnalata
+DISK_EPSILON = 0.001
+MEASURES = ("count", "on", "num_vcpu", "vram_gb", "disk_used_gb", "disk_provisioned_gb")
+INT_MEASURES = ("count", "on", "num_vcpu")
+
+
+def load_report_inventory(report_folder, upload_folder) -> dict:
+    """
+    Inventario colonnare del report. I report creati prima dell'API /vms non
+    hanno inventory.npz: il file xlsx viene rianalizzato e l'inventario salvato.
+    """
+    path = Path(report_folder) / INVENTORY_FILE
+    if not path.exists():
+        xlsx = next((f for f in Path(upload_folder).glob("*.xlsx")), None)
+        if xlsx is None:
+            raise FileNotFoundError(f"Inventario non disponibile per {Path(report_folder).name}")
+        save_inventory(path, read_inventory(str(xlsx)))
+    return load_inventory(path)
+
+
+def report_inventory(report_folder, upload_folder) -> pd.DataFrame:
+    """Frame VM del report."""
+    return load_report_inventory(report_folder, upload_folder)["vms"]
+
+
+def _has_uuid(vms: pd.DataFrame) -> bool:
+    return "uuid" in vms.columns and len(vms) > 0 and bool((vms["uuid"] != "").all())
+
+
+def _keyed(vms: pd.DataFrame, by_uuid: bool) -> pd.DataFrame:
+    key = vms["uuid"] if by_uuid else vms["name"] + "\x1f" + vms["datacenter"]
+    # Chiavi duplicate (es. VM omonime nello stesso datacenter): numerate per occorrenza
+    occurrence = key.groupby(key, sort=False).cumcount()
+    dup = (occurrence > 0).to_numpy()
+    if dup.any():
+        key = key.copy()
+        key[dup] = key[dup] + "\x1e" + occurrence[dup].astype(str)
+    label = lambda col: np.where(vms[col].to_numpy() == "", EMPTY_LABEL, vms[col].to_numpy())
+    return pd.DataFrame({
+        "key": key.to_numpy(),
+        "name": vms["name"].to_numpy(),
+        "datacenter": label("datacenter"),
+        "host": label("host"),
+        "on": vms["power_state"].to_numpy() == "poweredon",
+        "num_vcpu": vms["num_vcpu"].to_numpy(),
+        "vram_gb": vms["memory_mb"].to_numpy() / 1024,
+        "disk_used_gb": vms["disk_used_gb"].to_numpy(),
+        "disk_provisioned_gb": vms["disk_provisioned_gb"].to_numpy(),
+    })
+
+
+def _records(frame: pd.DataFrame) -> list:
+    return json.loads(frame.round(3).to_json(orient="records"))
+
+
+def _group_deltas(a: pd.DataFrame, b: pd.DataFrame, added: pd.DataFrame, removed: pd.DataFrame, by: list) -> list:
+    """Totali prima/dopo e differenze per gruppo (datacenter o datacenter + host)."""
+    def totals(frame):
+        g = frame.assign(count=1).groupby(by, sort=False)
+        return g[list(MEASURES)].sum()
+
+    before, after = totals(a), totals(b)
+    out = before.join(after, how="outer", lsuffix="_before", rsuffix="_after").fillna(0)
+    for m in MEASURES:
+        out[f"delta_{m}"] = out[f"{m}_after"] - out[f"{m}_before"]
+        if m in INT_MEASURES:
+            cols = [f"{m}_before", f"{m}_after", f"delta_{m}"]
+            out[cols] = out[cols].astype(np.int64)
+    out["added"] = added.groupby([f"{c}_b" for c in by], sort=False).size().rename_axis(by)
+    out["removed"] = removed.groupby([f"{c}_a" for c in by], sort=False).size().rename_axis(by)
+    out[["added", "removed"]] = out[["added", "removed"]].fillna(0).astype(np.int64)
+    return _records(out.sort_index().reset_index())
+
+
+def compute_diff(base_vms: pd.DataFrame, target_vms: pd.DataFrame) -> dict:
+    by_uuid = _has_uuid(base_vms) and _has_uuid(target_vms)
+    a, b = _keyed(base_vms, by_uuid), _keyed(target_vms, by_uuid)
+
+    # Hash join sulla chiave: lineare nel numero di VM
+    m = a.merge(b, on="key", how="outer", suffixes=("_a", "_b"), indicator=True, sort=False)
+    removed = m[m["_merge"] == "left_only"]
+    added = m[m["_merge"] == "right_only"]
+    both = m[m["_merge"] == "both"]
+
+    moved = both[(both["datacenter_a"] != both["datacenter_b"]) | (both["host_a"] != both["host_b"])]
+    resized = both[(both["num_vcpu_a"] != both["num_vcpu_b"]) | ~np.isclose(both["vram_gb_a"], both["vram_gb_b"])]
+    power = both[both["on_a"] != both["on_b"]]
+    disk_delta = both["disk_used_gb_b"] - both["disk_used_gb_a"]
+    prov_delta = both["disk_provisioned_gb_b"] - both["disk_provisioned_gb_a"]
+    disk = both.assign(delta_used_gb=disk_delta, delta_provisioned_gb=prov_delta)
+    disk = disk[(disk_delta.abs() > DISK_EPSILON) | (prov_delta.abs() > DISK_EPSILON)]
+    disk = disk.iloc[np.argsort(-disk["delta_used_gb"].abs().to_numpy(), kind="stable")]
+
+    vm_cols = ["name", "datacenter", "host", "num_vcpu", "vram_gb", "disk_used_gb", "disk_provisioned_gb"]
+    side = lambda frame, s: frame[[f"{c}_{s}" for c in vm_cols]].set_axis(vm_cols, axis=1) \
+        .astype({"num_vcpu": np.int64})
+    powered_on = int(power["on_b"].astype(bool).sum())
+
+    return {
+        "version": DIFF_VERSION,
+        "key": "uuid" if by_uuid else "name+datacenter",
+        "summary": {
+            "base_count": len(a),
+            "target_count": len(b),
+            "added": len(added),
+            "removed": len(removed),
+            "moved": len(moved),
+            "resized": len(resized),
+            "powered_on": powered_on,
+            "powered_off": len(power) - powered_on,
+            "disk_changed": len(disk),
+            "delta_num_vcpu": int(b["num_vcpu"].sum() - a["num_vcpu"].sum()),
+            "delta_vram_gb": round(float(b["vram_gb"].sum() - a["vram_gb"].sum()), 3),
+            "delta_disk_used_gb": round(float(b["disk_used_gb"].sum() - a["disk_used_gb"].sum()), 3),
+            "delta_disk_provisioned_gb": round(float(b["disk_provisioned_gb"].sum() - a["disk_provisioned_gb"].sum()), 3),
+        },
+        "datacenters": _group_deltas(a, b, added, removed, ["datacenter"]),
+        "hosts": _group_deltas(a, b, added, removed, ["datacenter", "host"]),
+        "changes": {
+            "added": _records(side(added, "b").sort_values("name", kind="stable")),
+            "removed": _records(side(removed, "a").sort_values("name", kind="stable")),
+            "moved": _records(moved[["name_b", "datacenter_a", "host_a", "datacenter_b", "host_b"]]
+                              .set_axis(["name", "from_datacenter", "from_host", "to_datacenter", "to_host"], axis=1)
+                              .sort_values("name", kind="stable")),
+            "resized": _records(resized[["name_b", "datacenter_b", "host_b", "num_vcpu_a", "num_vcpu_b",
+                                         "vram_gb_a", "vram_gb_b"]]
+                                .set_axis(["name", "datacenter", "host", "vcpu_before", "vcpu_after",
+                                           "vram_gb_before", "vram_gb_after"], axis=1)
+                                .astype({"vcpu_before": np.int64, "vcpu_after": np.int64})
+                                .sort_values("name", kind="stable")),
+            "power": _records(power[["name_b", "datacenter_b", "host_b", "on_a", "on_b"]]
+                              .set_axis(["name", "datacenter", "host", "on_before", "on_after"], axis=1)
+                              .astype({"on_before": bool, "on_after": bool})
+                              .sort_values("name", kind="stable")),
+            "disk": _records(disk[["name_b", "datacenter_b", "host_b", "disk_used_gb_a", "disk_used_gb_b",
+                                   "delta_used_gb", "disk_provisioned_gb_a", "disk_provisioned_gb_b",
+                                   "delta_provisioned_gb"]]
+                             .set_axis(["name", "datacenter", "host", "used_before_gb", "used_after_gb",
+                                        "delta_used_gb", "provisioned_before_gb", "provisioned_after_gb",
+                                        "delta_provisioned_gb"], axis=1)),
+        },
+    }
+
+
+def get_diff(base_id: str, target_id: str, reports_dir, uploads_dir) -> dict:
+    """Confronto base -> target, calcolato una sola volta e poi letto dal JSON salvato."""
+    target_folder = Path(reports_dir) / target_id
+    path = target_folder / DIFFS_DIR / f"{base_id}.v{DIFF_VERSION}.json"
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    base_vms = report_inventory(Path(reports_dir) / base_id, Path(uploads_dir) / base_id)
+    target_vms = report_inventory(target_folder, Path(uploads_dir) / target_id)
+    result = compute_diff(base_vms, target_vms)
+
+    path.parent.mkdir(exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(result, f)
+    os.replace(tmp, path)
+    return result
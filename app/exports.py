@@ -0,0 +1,174 @@
+"""
+Esportazione dei dati di un report in CSV, JSON Lines e Parquet:
+inventario VM, host, datacenter e distribuzione dei sistemi operativi.
+I dati vengono dall'inventario colonnare salvato con il report (nessuna
+nuova lettura dell'xlsx) e le risposte sono generate a blocchi di righe:
+il download inizia subito e il payload completo non viene mai costruito
+in memoria.
+"""
+
+import io
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from aggregation import EMPTY_LABEL, LABELLED_DIMS, AggregationCube
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # Parquet disponibile solo se pyarrow è installato
+    pa = pq = None
+
+
+CHUNK_ROWS = 5000
+# formato -> (mimetype, estensione)
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+VM_COLUMNS = (
+    "name", "uuid", "power_state", "datacenter", "cluster", "host", "num_vcpu", "num_cpu", "memory_mb",
+    "disk_used_gb", "disk_provisioned_gb", "os", "simple_os", "os_family",
+)
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+# ── Dataset ──────────────────────────────────────────────────────────────────
+def _vm_chunks(inventory: dict) -> Iterator[pd.DataFrame]:
+    vms = inventory["vms"]
+    columns = [c for c in VM_COLUMNS if c in vms.columns]
+    for start in range(0, max(len(vms), 1), CHUNK_ROWS):
+        chunk = vms.iloc[start:start + CHUNK_ROWS][columns]
+        yield chunk.assign(vram_gb=(chunk["memory_mb"] / 1024).round(2)).reset_index(drop=True)
+
+
+def _by(cube: AggregationCube, by: tuple, labelled: bool = True) -> pd.DataFrame:
+    """Totali del cubo per le dimensioni by, con VM e vCPU separate per stato."""
+    cells = cube.cells
+    on = (cells["power"] == "on").to_numpy()
+    labels = {d: cells[d].where(cells[d] != "", EMPTY_LABEL) for d in LABELLED_DIMS if d in by} if labelled else {}
+    cells = cells.assign(
+        vms_on=np.where(on, cells["count"], 0),
+        vcpu_on=np.where(on, cells["tot_vcpu"], 0),
+        **labels,
+    )
+    out = cells.groupby(list(by), sort=True).agg(
+        vms=("count", "sum"), vms_on=("vms_on", "sum"), vcpu=("tot_vcpu", "sum"), vcpu_on=("vcpu_on", "sum"),
+        vram_mb=("vram_mb", "sum"), disk_used_gb=("disk_used_gb", "sum"), disk_provisioned_gb=("disk_prov_gb", "sum"),
+    ).reset_index()
+    out.insert(out.columns.get_loc("vms_on") + 1, "vms_off", out["vms"] - out["vms_on"])
+    out.insert(out.columns.get_loc("vram_mb"), "vram_gb", out.pop("vram_mb") / 1024)
+    return out.round(3)
+
+
+def _host_chunks(inventory: dict) -> Iterator[pd.DataFrame]:
+    # Come HostStats: host da vHost (a parità di nome l'ultima riga) più quelli
+    # che compaiono solo nelle VM, con datacenter e cluster della prima VM
+    vms = inventory["vms"]
+    hosts = inventory["hosts"].drop_duplicates("name", keep="last").rename(columns={"name": "host"})
+    first = vms.drop_duplicates("host")[["host", "datacenter", "cluster"]]
+    first_dc = vms[vms["datacenter"] != ""].drop_duplicates("host").set_index("host")["datacenter"]
+    totals = _by(AggregationCube(vms), ("host",), labelled=False) if len(vms) else None
+    out = hosts.merge(first, on="host", how="outer", suffixes=("", "_vm"))
+    for col in ("datacenter", "cluster"):
+        out[col] = out[col].where(out[col].notna(), out[f"{col}_vm"]).fillna("")
+    out["datacenter"] = out["datacenter"].where(out["datacenter"] != "", out["host"].map(first_dc)).fillna("")
+    out = out.drop(columns=["datacenter_vm", "cluster_vm"]).fillna({"num_cpu": 0, "num_cores": 0, "memory_gb": 0})
+    # Inventari salvati prima della colonna dei core non la hanno
+    out = out.astype({c: np.int64 for c in ("num_cpu", "num_cores") if c in out.columns})
+    if totals is not None:
+        out = out.merge(totals, on="host", how="left")
+        count_cols = ["vms", "vms_on", "vms_off", "vcpu", "vcpu_on"]
+        out = out.fillna(0).astype({c: np.int64 for c in count_cols})
+    yield out.sort_values(["datacenter", "host"], kind="stable").reset_index(drop=True)
+
+
+def _datacenter_chunks(inventory: dict) -> Iterator[pd.DataFrame]:
+    vms = inventory["vms"]
+    if len(vms):
+        yield _by(AggregationCube(vms), ("datacenter",))
+
+
+def _os_chunks(inventory: dict) -> Iterator[pd.DataFrame]:
+    vms = inventory["vms"]
+    if len(vms):
+        yield _by(AggregationCube(vms), ("os_family", "simple_os"))
+
+
+# nome -> generatore di blocchi (DataFrame) a partire dall'inventario
+DATASETS = {
+    "vms": _vm_chunks,
+    "hosts": _host_chunks,
+    "datacenters": _datacenter_chunks,
+    "os": _os_chunks,
+}
+
+
+# ── Formati ──────────────────────────────────────────────────────────────────
+def _csv(chunks: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header, lineterminator="\n").encode("utf-8")
+        header = False
+
+
+def _jsonl(chunks: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    for chunk in chunks:
+        if len(chunk):
+            yield chunk.to_json(orient="records", lines=True, force_ascii=False).rstrip("\n").encode("utf-8") + b"\n"
+
+
+class _Drain(io.RawIOBase):
+    """File in sola scrittura i cui byte vengono prelevati dopo ogni row group."""
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _parquet(chunks: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    # Un row group per blocco: il footer con i metadati arriva alla chiusura
+    sink, writer = _Drain(), None
+    for chunk in chunks:
+        if writer is None:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            writer = pq.ParquetWriter(sink, table.schema, compression="snappy")
+        else:
+            table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+        writer.write_table(table)
+        yield sink.take()
+    if writer is not None:
+        writer.close()
+        yield sink.take()
+
+
+ENCODERS = {"csv": _csv, "jsonl": _jsonl, "parquet": _parquet}
+
+
+def stream_export(inventory: dict, dataset: str, fmt: str) -> Iterator[bytes]:
+    """Byte del dataset nel formato richiesto, a blocchi. KeyError se dataset o formato non esistono."""
+    chunks, encode = DATASETS[dataset], ENCODERS[fmt]
+    return (data for data in encode(chunks(inventory)) if data)
@@ -0,0 +1,99 @@
+"""
+Vista d'insieme su tutti i report conservati.
+Per ogni report il catalogo tiene una riga di totali (VM, vCPU, vRAM, disco,
+famiglie OS) scritta quando il report diventa pronto e cancellata insieme
+al report: la dashboard /fleet legge solo queste righe, mai xlsx o HTML.
+I report con lo stesso titolo (o, senza titolo, lo stesso nome file) sono
+lo stesso ambiente: i totali della flotta in un giorno sommano l'ultimo
+report di ogni ambiente disponibile a quella data.
+"""
+
+import numpy as np
+import pandas as pd
+
+from os_classifier import FAMILIES
+
+
+ROLLUP_FIELDS = (
+    "vms", "vms_on", "vcpu", "vcpu_on", "vram_gb", "vram_gb_on", "disk_used_gb", "disk_provisioned_gb", "hosts",
+) + tuple(f"vms_{family}" for family in FAMILIES)
+# Campi della riga di un report mostrati come variazione rispetto al report precedente
+DELTA_FIELDS = ("vms", "vcpu", "vram_gb", "disk_used_gb", "disk_provisioned_gb")
+
+
+def report_rollup(inventory: dict) -> dict:
+    """Totali di un report dal suo inventario colonnare."""
+    vms = inventory["vms"]
+    on = vms["power_state"].to_numpy() == "poweredon"
+    vcpu = vms["num_vcpu"].to_numpy()
+    vram_gb = vms["memory_mb"].to_numpy() / 1024
+    families = vms["os_family"].value_counts()
+    # Come host_stats: host di vHost più quelli che compaiono solo nelle VM
+    names = np.concatenate([inventory["hosts"]["name"].to_numpy(dtype=object), vms["host"].to_numpy(dtype=object)])
+    hosts = pd.unique(names[names != ""])
+    return {
+        "vms": len(vms),
+        "vms_on": int(on.sum()),
+        "vcpu": int(vcpu.sum()),
+        "vcpu_on": int(vcpu[on].sum()),
+        "vram_gb": round(float(vram_gb.sum()), 3),
+        "vram_gb_on": round(float(vram_gb[on].sum()), 3),
+        "disk_used_gb": round(float(vms["disk_used_gb"].sum()), 3),
+        "disk_provisioned_gb": round(float(vms["disk_provisioned_gb"].sum()), 3),
+        "hosts": len(hosts),
+        **{f"vms_{family}": int(families.get(family, 0)) for family in FAMILIES},
+    }
+
+
+def estate_name(row: dict) -> str:
+    """Ambiente di un report (riga di catalogo o meta.json): il titolo o, in mancanza, il nome file."""
+    return row.get("custom_title") or row.get("filename") or ""
+
+
+def _totals(rows) -> dict:
+    totals = {field: 0 for field in ROLLUP_FIELDS}
+    for row in rows:
+        for field in ROLLUP_FIELDS:
+            totals[field] += row[field]
+    return {k: round(v, 3) if isinstance(v, float) else v for k, v in totals.items()}
+
+
+def fleet_overview(rows: list) -> dict:
+    """
+    Totali correnti, andamento giornaliero e ultimo report di ogni ambiente,
+    dalle righe di Catalog.rollups() (in ordine di creazione).
+    """
+    latest, previous, counts = {}, {}, {}
+    trend, day, current = [], None, {}
+    for row in rows:
+        estate = estate_name(row)
+        if estate in latest:
+            previous[estate] = latest[estate]
+        latest[estate] = row
+        counts[estate] = counts.get(estate, 0) + 1
+
+        created = row["created"][:10]
+        if day is not None and created != day:
+            trend.append({"date": day, "estates": len(current), **_totals(current.values())})
+        day, current[estate] = created, row
+    if day is not None:
+        trend.append({"date": day, "estates": len(current), **_totals(current.values())})
+
+    estates = []
+    for estate, row in sorted(latest.items(), key=lambda item: item[0].lower()):
+        prev = previous.get(estate)
+        estates.append({
+            "estate": estate,
+            "report_id": row["id"],
+            "created": row["created"],
+            "custom_date": row["custom_date"],
+            "reports": counts[estate],
+            **{field: row[field] for field in ROLLUP_FIELDS},
+            **{f"delta_{field}": round(row[field] - prev[field], 3) if prev else None for field in DELTA_FIELDS},
+        })
+    return {
+        "summary": {"estates": len(latest), "reports": len(rows), **_totals(latest.values())},
+        "estates": estates,
+        "trend": trend,
+        "families": list(FAMILIES),
+    }
@@ -0,0 +1,123 @@
+"""
+Inventario delle VM in forma struct-of-arrays.
+Ogni campo è un array tipizzato; le stringhe molto ripetute (host, cluster,
+datacenter, stato, OS) sono codici interi più un elenco di categorie
+internate, quindi ogni valore distinto esiste una sola volta in memoria.
+I raggruppamenti (per host, datacenter, famiglia OS) sono array di posizioni
+(VMList) e le righe sono viste leggere (VMRow) create all'accesso, con gli
+stessi attributi di VMInfo usati dal template.
+"""
+
+import sys
+from collections.abc import Sequence
+
+import numpy as np
+import pandas as pd
+
+
+# Campi esposti dalle righe: quelli di VMInfo, più famiglia OS e UUID
+FIELDS = (
+    "name", "power_state", "host", "datacenter", "cluster", "num_cpu", "memory_mb",
+    "disk_used_gb", "disk_provisioned_gb", "num_vcpu", "os", "simple_os", "os_family", "uuid",
+)
+# Colonne memorizzate come codici + categorie
+CATEGORICAL = ("power_state", "host", "datacenter", "cluster", "os", "simple_os", "os_family")
+
+
+def _codes_dtype(n_categories: int):
+    return np.int16 if n_categories <= np.iinfo(np.int16).max else np.int32
+
+
+class VMInventory:
+    def __init__(self, frame: pd.DataFrame):
+        self.size = len(frame)
+        self.arrays = {}       # colonne numeriche e nomi VM
+        self.codes = {}        # colonne categoriche: codice per riga ...
+        self.categories = {}   # ... e valori distinti
+        self._getters = {}
+        for col in frame.columns:
+            values = frame[col]
+            if col in CATEGORICAL:
+                codes, uniques = pd.factorize(values.to_numpy(dtype=object))
+                cats = [sys.intern(str(c)) for c in uniques]
+                codes = codes.astype(_codes_dtype(len(cats)))
+                self.codes[col], self.categories[col] = codes, cats
+                self._getters[col] = lambda pos, item=codes.item, cats=cats: cats[item(pos)]
+            else:
+                arr = values.to_numpy()
+                self.arrays[col] = arr
+                # item() restituisce tipi Python (int, float, str), non scalari numpy
+                self._getters[col] = arr.item
+
+    def __len__(self):
+        return self.size
+
+    def column(self, name: str) -> np.ndarray:
+        """Valori di una colonna per tutte le righe (le categoriche decodificate)."""
+        if name in self.codes:
+            return np.asarray(self.categories[name], dtype=object)[self.codes[name]]
+        return self.arrays[name]
+
+    def row(self, pos: int) -> "VMRow":
+        return VMRow(self._getters, pos)
+
+    def rows(self, positions=None) -> "VMList":
+        return VMList(self, positions)
+
+    def nbytes(self) -> int:
+        """Byte occupati da array e codici (esclusi gli oggetti stringa)."""
+        return sum(a.nbytes for a in self.arrays.values()) + sum(c.nbytes for c in self.codes.values())
+
+
+class VMRow:
+    """Vista su una riga dell'inventario: nessun dato copiato, solo la posizione."""
+
+    __slots__ = ("_get", "_pos")
+
+    def __init__(self, getters: dict, pos: int):
+        self._get = getters
+        self._pos = pos
+
+    def __eq__(self, other):
+        return isinstance(other, VMRow) and self._get is other._get and self._pos == other._pos
+
+    def __hash__(self):
+        return hash((id(self._get), self._pos))
+
+    def __repr__(self):
+        return f"VMRow({self._pos}, name={self.name!r})"
+
+
+def _field(name: str) -> property:
+    def get(self):
+        try:
+            getter = self._get[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        return getter(self._pos)
+    return property(get)
+
+
+for _name in FIELDS:
+    setattr(VMRow, _name, _field(_name))
+
+
+class VMList(Sequence):
+    """Sequenza di VMRow su un sottoinsieme di righe dell'inventario."""
+
+    def __init__(self, inventory: VMInventory, positions=None):
+        self.inventory = inventory
+        self.positions = np.arange(len(inventory)) if positions is None else np.asarray(positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return VMList(self.inventory, self.positions[i])
+        return self.inventory.row(int(self.positions[i]))
+
+    def __iter__(self):
+        getters = self.inventory._getters
+        for pos in self.positions.tolist():
+            yield VMRow(getters, pos)
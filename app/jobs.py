@@ -0,0 +1,227 @@
+"""
+Job asincroni per l'elaborazione degli upload.
+Lo stato di ogni job è un file JSON in DATA_DIR/jobs, leggibile da qualunque
+worker gunicorn; l'esecuzione avviene in un pool di processi limitato.
+Un file di claim creato in modo esclusivo (O_EXCL) garantisce che ogni job
+venga eseguito una sola volta anche se sottomesso da più worker.
+Un job il cui processo è terminato resterebbe in esecuzione per sempre: se
+il processo del claim non esiste più il job passa in errore e on_lost ne
+rimuove i file. Lo stesso per un job in coda nel pool di un worker gunicorn
+terminato (owner), che non partirà più; un job in attesa in un pool vivo
+non scade mai.
+"""
+
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from pipeline import generate_report
+
+
+QUEUED, RUNNING, DONE, ERROR = "queued", "running", "done", "error"
+# Fase di generate_report -> descrizione usata nei messaggi di errore
+PHASE_LABELS = {
+    "queued": "l'avvio dell'elaborazione",
+    "parsing": "la lettura del file",
+    "summarizing": "il calcolo delle statistiche",
+    "indexing": "l'indicizzazione delle VM",
+    "rendering": "la generazione del report",
+    "saving": "il salvataggio del report",
+    "done": "il completamento del report",
+}
+
+
+def _write_status(path: Path, status: dict):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(status, f)
+    os.replace(tmp, path)
+
+
+def _read_status(path: Path) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _claim(jobs_dir: Path, job_id: str) -> bool:
+    try:
+        fd = os.open(jobs_dir / f"{job_id}.claim", os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    os.write(fd, str(os.getpid()).encode())
+    os.close(fd)
+    return True
+
+
+def _claim_pid(jobs_dir: Path, job_id: str) -> Optional[int]:
+    try:
+        return int((jobs_dir / f"{job_id}.claim").read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_job(jobs_dir: str, job_id: str, params: dict):
+    """Eseguito nel processo del pool."""
+    jobs_dir = Path(jobs_dir)
+    if not _claim(jobs_dir, job_id):
+        return
+    status_path = jobs_dir / f"{job_id}.json"
+    status = _read_status(status_path) or {"id": job_id}
+    if status.get("status") == ERROR:
+        # Già dato per perso (e ripulito) mentre attendeva nella coda
+        return
+
+    def progress(phase: str, pct: int):
+        status.update(status=RUNNING if phase != "done" else DONE, phase=phase,
+                      progress=pct, updated=datetime.now().isoformat())
+        _write_status(status_path, status)
+
+    try:
+        generate_report(progress=progress, **params)
+    except Exception as e:
+        traceback.print_exc()
+        # La fase in cui si è fermato il job è l'ultima segnalata da progress
+        failed = status.get("phase", "queued")
+        status.update(status=ERROR, phase="error", failed_phase=failed,
+                      error=f"Errore durante {PHASE_LABELS.get(failed, failed)}: {e}",
+                      updated=datetime.now().isoformat())
+        _write_status(status_path, status)
+
+
+class JobQueue:
+    """
+    Pool creato alla prima sottomissione, cioè dopo il fork del worker
+    gunicorn: ogni worker ha il proprio pool di al massimo max_workers processi.
+    Se un processo del pool muore (OOM, crash di WeasyPrint) il pool non
+    accetta più job: viene ricreato e i job mai partiti vi sono risottomessi.
+    """
+
+    def __init__(self, jobs_dir, max_workers: int = 2, on_lost: Optional[Callable[[str], None]] = None):
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
+        # Rimuove cartelle e righe di catalogo del report di un job perso
+        self.on_lost = on_lost
+        self._pool = None
+        self._pid = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self, broken: Optional[ProcessPoolExecutor] = None) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None or self._pid != os.getpid() or self._pool is broken:
+                if broken is not None:
+                    broken.shutdown(wait=False, cancel_futures=True)
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def _run(self, job_id: str, params: dict):
+        pool = self._executor()
+        try:
+            future = pool.submit(run_job, str(self.jobs_dir), job_id, params)
+        except BrokenProcessPool:
+            pool = self._executor(broken=pool)
+            future = pool.submit(run_job, str(self.jobs_dir), job_id, params)
+        future.add_done_callback(lambda f: self._check_lost(f, pool, job_id, params))
+
+    def _check_lost(self, future: Future, pool: ProcessPoolExecutor, job_id: str, params: dict):
+        """
+        Callback del future: un job perso con il pool si risottomette se non
+        era ancora partito, altrimenti passa subito in errore.
+        """
+        if future.cancelled() or not isinstance(future.exception(), BrokenProcessPool):
+            return
+        if _claim_pid(self.jobs_dir, job_id) is None:
+            self._run(job_id, params)
+            return
+        status = _read_status(self.jobs_dir / f"{job_id}.json")
+        if status is not None and self._stale(job_id, status):
+            self._fail_stale(job_id, status)
+
+    def submit(self, job_id: str, params: dict) -> dict:
+        status = {
+            "id": job_id,
+            "report_id": params["report_id"],
+            "status": QUEUED,
+            "phase": "queued",
+            "progress": 0,
+            "created": datetime.now().isoformat(),
+            # Processo che tiene la coda del pool
+            "owner": os.getpid(),
+        }
+        status_path = self.jobs_dir / f"{job_id}.json"
+        _write_status(status_path, status)
+        try:
+            self._run(job_id, params)
+        except Exception:
+            status_path.unlink(missing_ok=True)
+            raise
+        return status
+
+    def get(self, job_id: str) -> Optional[dict]:
+        status = _read_status(self.jobs_dir / f"{job_id}.json")
+        if status is not None and self._stale(job_id, status):
+            status = self._fail_stale(job_id, status)
+        return status
+
+    def _stale(self, job_id: str, status: dict) -> bool:
+        if status.get("status") not in (QUEUED, RUNNING):
+            return False
+        # In esecuzione: vale il processo del claim; in coda: quello che tiene il pool
+        pid = _claim_pid(self.jobs_dir, job_id) or status.get("owner")
+        return pid is not None and not _alive(pid)
+
+    def _fail_stale(self, job_id: str, status: dict) -> dict:
+        status = {
+            **status,
+            "status": ERROR,
+            "phase": "error",
+            "failed_phase": status.get("phase", "queued"),
+            "error": "Elaborazione interrotta: il processo che la eseguiva è terminato. Ricarica il file.",
+            "updated": datetime.now().isoformat(),
+        }
+        _write_status(self.jobs_dir / f"{job_id}.json", status)
+        if self.on_lost:
+            self.on_lost(status.get("report_id", job_id))
+        return status
+
+    def expire_stale(self) -> int:
+        """Segna in errore (e ripulisce) i job senza più un processo che li esegua. Restituisce quanti."""
+        expired = 0
+        for path in self.jobs_dir.glob("*.json"):
+            job_id = path.stem
+            status = _read_status(path)
+            if status is not None and self._stale(job_id, status):
+                self._fail_stale(job_id, status)
+                expired += 1
+        return expired
+
+    def purge(self, max_age_hours: int = 24):
+        """Rimuove stato e claim dei job più vecchi di max_age_hours."""
+        cutoff = time.time() - max_age_hours * 3600
+        for path in self.jobs_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
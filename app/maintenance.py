@@ -0,0 +1,167 @@
+"""
+Attività di manutenzione periodiche (pulizia dei report scaduti, evizione
+della cache, precalcoli) eseguite da un solo processo.
+Ogni worker gunicorn avvia lo stesso scheduler, ma a ogni tick solo chi
+detiene il lock su DATA_DIR/maintenance.lock esegue le attività: se il
+worker leader termina, il lock si libera e al tick successivo lo prende
+un altro. Lo stato (ultima esecuzione, durata, esito) è salvato in
+DATA_DIR/maintenance.json, così l'elezione di un nuovo leader non fa
+ripartire attività già eseguite.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import traceback
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from metrics import MetricsStore, PhaseTimer
+
+
+LOCK_FILE = "maintenance.lock"
+STATE_FILE = "maintenance.json"
+TICK_MINUTES = 5
+FIRST_TICK_SECONDS = 30
+
+
+@dataclass
+class Task:
+    name: str
+    func: Callable[[], Optional[bool]]   # True se resta lavoro: rieseguita al tick successivo
+    interval_hours: float
+
+
+class Maintenance:
+    def __init__(self, data_dir, metrics: Optional[MetricsStore] = None):
+        self.lock_path = Path(data_dir) / LOCK_FILE
+        self.state_path = Path(data_dir) / STATE_FILE
+        self.metrics = metrics
+        self.tasks = {}
+        self._lock_fd = None
+        self._running = threading.Lock()
+        self._scheduler = None
+
+    def add_task(self, name: str, func: Callable[[], Optional[bool]], interval_hours: float):
+        """Le attività vengono eseguite nell'ordine di registrazione."""
+        self.tasks[name] = Task(name, func, interval_hours)
+
+    # ── Elezione del leader ──────────────────────────────────────────────────
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_fd is not None
+
+    def _try_lead(self) -> bool:
+        if self._lock_fd is not None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # lockf (lock POSIX) e non flock: non viene ereditato dai processi
+            # del pool dei job, che altrimenti terrebbero il lock dopo la
+            # terminazione del worker
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._lock_fd = fd
+        return True
+
+    # ── Stato ────────────────────────────────────────────────────────────────
+    def _read_state(self) -> dict:
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_state(self, state: dict):
+        tmp = self.state_path.with_name(f".{self.state_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp, self.state_path)
+
+    @staticmethod
+    def _is_due(task: Task, entry: dict, now: datetime) -> bool:
+        if entry.get("pending") or not entry.get("last_run"):
+            return True
+        return now - datetime.fromisoformat(entry["last_run"]) >= timedelta(hours=task.interval_hours)
+
+    # ── Esecuzione ───────────────────────────────────────────────────────────
+    def tick(self, force: bool = False):
+        """Esegue le attività scadute (tutte con force), solo nel processo leader."""
+        if not self._try_lead() or not self._running.acquire(blocking=False):
+            return
+        try:
+            state = self._read_state()
+            tasks_state = state.setdefault("tasks", {})
+            for task in self.tasks.values():
+                entry = tasks_state.setdefault(task.name, {})
+                if not force and not self._is_due(task, entry, datetime.now()):
+                    continue
+                timer = PhaseTimer()
+                started = datetime.now()
+                error = None
+                with timer.phase(task.name):
+                    try:
+                        pending = bool(task.func())
+                    except Exception as e:
+                        traceback.print_exc()
+                        pending, error = False, f"{type(e).__name__}: {e}"
+                m = timer.phases[task.name]
+                entry.update(last_run=started.isoformat(timespec="seconds"), duration_seconds=m["seconds"],
+                             cpu_seconds=m["cpu_seconds"], status="error" if error else "ok", error=error,
+                             pending=pending, pid=os.getpid())
+                state["leader_pid"] = os.getpid()
+                self._write_state(state)
+                if self.metrics:
+                    self.metrics.record_task(task.name, m["seconds"], ok=error is None)
+        finally:
+            self._running.release()
+
+    def run_as_leader(self, func: Callable[[], object]) -> bool:
+        """
+        Esegue subito func, solo se questo processo è (o diventa) il leader
+        e mai insieme alle attività del tick. True se eseguita.
+        """
+        if not self._try_lead():
+            return False
+        with self._running:
+            func()
+        return True
+
+    def start(self):
+        """Avvia lo scheduler del processo (uno per worker): ogni tick prova a diventare leader."""
+        if self._scheduler is not None:
+            return
+        self._scheduler = BackgroundScheduler()
+        self._scheduler.add_job(self.tick, "interval", minutes=TICK_MINUTES, coalesce=True, max_instances=1,
+                                next_run_time=datetime.now() + timedelta(seconds=FIRST_TICK_SECONDS))
+        self._scheduler.start()
+
+    def status(self) -> dict:
+        state = self._read_state()
+        now = datetime.now()
+        tasks = {}
+        for task in self.tasks.values():
+            entry = dict(state.get("tasks", {}).get(task.name, {}))
+            entry["interval_hours"] = task.interval_hours
+            if entry.get("last_run") and not entry.get("pending"):
+                next_due = datetime.fromisoformat(entry["last_run"]) + timedelta(hours=task.interval_hours)
+                entry["next_due"] = max(next_due, now).isoformat(timespec="seconds")
+            else:
+                # Mai eseguita o con lavoro arretrato: al prossimo tick
+                entry["next_due"] = None
+            tasks[task.name] = entry
+        return {
+            "leader_pid": state.get("leader_pid"),
+            "this_process_is_leader": self.is_leader,
+            "tick_minutes": TICK_MINUTES,
+            "tasks": tasks,
+        }
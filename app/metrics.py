@@ -0,0 +1,207 @@
+"""
+Misure per fase dell'elaborazione (tempo reale, tempo CPU, picco di memoria)
+ed esposizione in formato testo Prometheus.
+Le osservazioni di tutti i processi (worker gunicorn e processi del pool dei
+job) confluiscono in un file SQLite in DATA_DIR: /metrics restituisce
+istogrammi già aggregati, senza un server esterno.
+"""
+
+import resource
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# Estremi superiori dei bucket degli istogrammi (secondi e byte)
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = tuple(mb * 1024 * 1024 for mb in (64, 128, 256, 512, 1024, 2048, 4096))
+INF = float("inf")
+PREFIX = "rvtools"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    metric TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    le     REAL NOT NULL,
+    count  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, labels, le)
+);
+CREATE TABLE IF NOT EXISTS series (
+    metric TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    count  INTEGER NOT NULL DEFAULT 0,
+    sum    REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, labels)
+);
+"""
+
+# metrica -> (tipo, bucket, descrizione)
+METRICS = {
+    "phase_duration_seconds": ("histogram", SECONDS_BUCKETS, "Tempo reale per fase di elaborazione"),
+    "phase_cpu_seconds": ("histogram", SECONDS_BUCKETS, "Tempo CPU per fase di elaborazione"),
+    "phase_peak_rss_bytes": ("histogram", BYTES_BUCKETS, "Picco di memoria residente del processo per fase"),
+    "workbook_bytes": ("histogram", tuple(mb * 1024 * 1024 for mb in (1, 5, 10, 25, 50)),
+                       "Dimensione dei file xlsx elaborati"),
+    "maintenance_duration_seconds": ("histogram", SECONDS_BUCKETS, "Durata delle attività di manutenzione"),
+    "maintenance_errors_total": ("counter", None, "Attività di manutenzione terminate con errore"),
+    "reports_total": ("counter", None, "Report generati"),
+    "vms_total": ("counter", None, "VM elaborate"),
+}
+
+
+# ── Misura delle fasi ────────────────────────────────────────────────────────
+def _reset_peak_rss() -> bool:
+    # Linux: azzera VmHWM, così il picco letto a fine fase riguarda solo la fase
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Altrove solo il massimo dall'avvio del processo
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PhaseTimer:
+    """
+    Raccoglie le misure delle fasi di un'elaborazione:
+    {"fase": {"seconds", "cpu_seconds", "peak_rss_mb"}}.
+    Il picco di memoria è quello del processo: nei processi del pool gira un
+    job alla volta, nei worker web può includere richieste concorrenti.
+    """
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        _reset_peak_rss()
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.phases[name] = {
+                "seconds": round(time.perf_counter() - t0, 4),
+                "cpu_seconds": round(time.process_time() - c0, 4),
+                "peak_rss_mb": round(_peak_rss_bytes() / 1024 / 1024, 1),
+            }
+
+    def add(self, phases: dict):
+        """Unisce misure prese altrove (es. la ricezione dell'upload nel worker web)."""
+        self.phases.update(phases)
+
+
+# ── Archivio condiviso tra processi ──────────────────────────────────────────
+def _labels(labels: dict) -> str:
+    return ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+
+
+def _num(value: float) -> str:
+    # 15 cifre significative: con :g (6 cifre) i bucket in byte e le somme grandi verrebbero arrotondati
+    return f"{value:.15g}"
+
+
+def _le(value: float) -> str:
+    return "+Inf" if value == INF else _num(value)
+
+
+class MetricsStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _observe(conn, metric: str, value: float, labels: dict = None):
+        kind, buckets, _ = METRICS[metric]
+        key = _labels(labels or {})
+        conn.execute(
+            "INSERT INTO series (metric, labels, count, sum) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT (metric, labels) DO UPDATE SET count = count + 1, sum = sum + excluded.sum",
+            (metric, key, value),
+        )
+        if kind == "histogram":
+            # Solo il primo bucket che contiene il valore: i cumulativi si calcolano in lettura
+            le = next((b for b in buckets if value <= b), INF)
+            conn.execute(
+                "INSERT INTO buckets (metric, labels, le, count) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (metric, labels, le) DO UPDATE SET count = count + 1",
+                (metric, key, le),
+            )
+
+    @classmethod
+    def _observe_phases(cls, conn, phases: dict):
+        for name, m in phases.items():
+            labels = {"phase": name}
+            cls._observe(conn, "phase_duration_seconds", m["seconds"], labels)
+            cls._observe(conn, "phase_cpu_seconds", m["cpu_seconds"], labels)
+            cls._observe(conn, "phase_peak_rss_bytes", m["peak_rss_mb"] * 1024 * 1024, labels)
+
+    def record_phases(self, phases: dict):
+        """Registra le misure di un PhaseTimer in un'unica transazione."""
+        with self._connect() as conn:
+            self._observe_phases(conn, phases)
+
+    def record_report(self, meta: dict):
+        """Misure di un report completato (meta.json con la sezione metrics)."""
+        m = meta["metrics"]
+        with self._connect() as conn:
+            self._observe(conn, "reports_total", 1)
+            self._observe(conn, "vms_total", meta["total"])
+            self._observe(conn, "workbook_bytes", m["workbook_bytes"])
+            self._observe_phases(conn, m["phases"])
+
+    def record_task(self, name: str, seconds: float, ok: bool = True):
+        """Esecuzione di un'attività di manutenzione."""
+        with self._connect() as conn:
+            self._observe(conn, "maintenance_duration_seconds", seconds, {"task": name})
+            if not ok:
+                self._observe(conn, "maintenance_errors_total", 1, {"task": name})
+
+    def exposition(self) -> str:
+        """Testo nel formato di esposizione Prometheus 0.0.4."""
+        with self._connect() as conn:
+            series = conn.execute("SELECT metric, labels, count, sum FROM series ORDER BY metric, labels").fetchall()
+            rows = conn.execute("SELECT metric, labels, le, count FROM buckets").fetchall()
+        buckets = {}
+        for metric, labels, le, count in rows:
+            buckets.setdefault((metric, labels), {})[le] = count
+
+        lines = []
+        for metric, (kind, bounds, help_text) in METRICS.items():
+            name = f"{PREFIX}_{metric}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for _, labels, count, total in (s for s in series if s[0] == metric):
+                if kind == "counter":
+                    lines.append(f"{name}{{{labels}}} {_num(total)}" if labels else f"{name} {_num(total)}")
+                    continue
+                sep = "," if labels else ""
+                observed, cumulative = buckets.get((metric, labels), {}), 0
+                for le in bounds + (INF,):
+                    cumulative += observed.get(le, 0)
+                    lines.append(f'{name}_bucket{{{labels}{sep}le="{_le(le)}"}} {cumulative}')
+                suffix = f"{{{labels}}}" if labels else ""
+                lines += [f"{name}_sum{suffix} {_num(total)}", f"{name}_count{suffix} {count}"]
+        return "\n".join(lines) + "\n"
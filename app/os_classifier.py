@@ -0,0 +1,84 @@
+"""
+Classificazione dei Guest OS.
+Ogni stringa OS grezza viene classificata una sola volta in
+(famiglia, versione semplificata) tramite una tabella di regole con regex
+precompilate; il risultato resta in una cache LRU limitata, condivisa da
+parser e aggregazioni.
+"""
+
+import re
+from functools import lru_cache
+from typing import Tuple
+
+FAMILIES = ("windows", "linux", "other")
+CACHE_SIZE = 4096
+
+# ---- Famiglia: prima regola che matcha (sottostringa, case-insensitive) ----
+FAMILY_RULES = (
+    ("windows", ("windows",)),
+    ("linux", ("linux", "ubuntu", "debian", "centos", "red hat", "suse", "photon")),
+)
+
+# Rimuovi (32-bit), (64-bit) etc.
+_ARCH = re.compile(r"\(.*?\d+-bit\)", re.IGNORECASE)
+
+# ---- Windows: (regex, formato) in ordine di priorità ----
+# Microsoft Windows Server 2016 -> Windows Server 2016
+WINDOWS_RULES = (
+    (re.compile(r"server\s+(\d{4}(?:\s+r2)?)"), lambda m: f"Windows Server {m.group(1).upper()}"),
+    (re.compile(r"windows\s+(\d+)"), lambda m: f"Windows {m.group(1)}"),
+)
+
+# ---- Linux: distribuzioni in ordine di priorità, versione cercata dopo il nome ----
+LINUX_DISTROS = tuple(
+    (d, d.title()) for d in ("ubuntu", "red hat", "centos", "debian", "suse", "photon", "oracle linux")
+)
+_VERSION = re.compile(r"(\d+(?:\.\d+)?)")
+
+
+def os_family(os_name: str) -> str:
+    return classify_os(os_name)[0]
+
+
+def _family(os_low: str) -> str:
+    for family, keywords in FAMILY_RULES:
+        if any(k in os_low for k in keywords):
+            return family
+    return "other"
+
+
+def simplify_os_name(os_name: str, family: str) -> str:
+    if not os_name:
+        return "N/D"
+
+    os_low = _ARCH.sub("", os_name).strip().lower()
+
+    if family == "windows":
+        for pattern, fmt in WINDOWS_RULES:
+            match = pattern.search(os_low)
+            if match:
+                return fmt(match)
+        if "windows" in os_low:
+            if "server" in os_low:
+                return "Windows Server (Other)"
+            return "Windows (Other)"
+        return "N/D"
+
+    if family == "linux":
+        for distro, label in LINUX_DISTROS:
+            if distro in os_low:
+                version = _VERSION.search(os_low.partition(distro)[2])
+                if version:
+                    return f"{label} {version.group(1)}"
+                return label
+        return "Linux (Other)"
+
+    return "Other"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def classify_os(os_name: str) -> Tuple[str, str]:
+    """(famiglia, versione semplificata) per una stringa Guest OS grezza."""
+    os_name = os_name or ""
+    family = _family(os_name.lower())
+    return family, simplify_os_name(os_name, family)
@@ -0,0 +1,179 @@
+"""
+Cache del parsing indicizzata per contenuto.
+La chiave è lo SHA-256 del file xlsx caricato: l'inventario colonnare prodotto
+da parser.read_inventory viene salvato in formato binario compresso (.npz)
+e i file xlsx identici sono conservati una sola volta (hard link nelle
+cartelle di upload).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+# Da incrementare quando cambia il formato dell'inventario prodotto dal parser
+CACHE_VERSION = 6
+CHUNK_SIZE = 1024 * 1024
+
+
+def sha256_file(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ── Serializzazione colonnare ────────────────────────────────────────────────
+def _pack_frame(prefix: str, frame: pd.DataFrame, arrays: dict):
+    arrays[f"{prefix}.__columns__"] = np.array(list(frame.columns), dtype=str)
+    for col in frame.columns:
+        values = frame[col]
+        if values.dtype == object:
+            # Stringhe come codici + categorie: niente pickle e molti meno byte
+            codes, cats = pd.factorize(values)
+            arrays[f"{prefix}.{col}.codes"] = codes.astype(np.int32)
+            arrays[f"{prefix}.{col}.cats"] = np.array(list(cats), dtype=str)
+        else:
+            arrays[f"{prefix}.{col}"] = values.to_numpy()
+
+
+def _unpack_frame(prefix: str, npz) -> pd.DataFrame:
+    data = {}
+    for col in npz[f"{prefix}.__columns__"].tolist():
+        if f"{prefix}.{col}.codes" in npz:
+            cats = np.asarray(npz[f"{prefix}.{col}.cats"].tolist() + [""], dtype=object)
+            data[col] = cats[npz[f"{prefix}.{col}.codes"]]
+        else:
+            data[col] = npz[f"{prefix}.{col}"]
+    return pd.DataFrame(data)
+
+
+def save_inventory(path, inventory: dict):
+    arrays = {
+        "sheet_names": np.array(list(inventory["sheet_names"]), dtype=str),
+        # Schema dei fogli (layout, colonne, unità) come stringa JSON: niente pickle
+        "schema": np.array(json.dumps(inventory.get("schema", {}))),
+    }
+    _pack_frame("vms", inventory["vms"], arrays)
+    _pack_frame("hosts", inventory["hosts"], arrays)
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, path)
+
+
+def load_inventory(path) -> dict:
+    with np.load(path, allow_pickle=False) as npz:
+        return {
+            "vms": _unpack_frame("vms", npz),
+            "hosts": _unpack_frame("hosts", npz),
+            "sheet_names": npz["sheet_names"].tolist(),
+            "schema": json.loads(npz["schema"].item()) if "schema" in npz else {},
+        }
+
+
+# ── Cache ────────────────────────────────────────────────────────────────────
+class ParseCache:
+    """
+    Struttura su disco:
+      <root>/inventory/<sha>.v<N>.npz   inventario parsato
+      <root>/blobs/<sha>.xlsx           xlsx originale, condiviso via hard link
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.inventory_dir = self.root / "inventory"
+        self.blobs_dir = self.root / "blobs"
+        self.inventory_dir.mkdir(parents=True, exist_ok=True)
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+
+    def _inventory_path(self, sha: str) -> Path:
+        return self.inventory_dir / f"{sha}.v{CACHE_VERSION}.npz"
+
+    def get(self, sha: str) -> Optional[dict]:
+        path = self._inventory_path(sha)
+        try:
+            inventory = load_inventory(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        # mtime = ultimo utilizzo, per l'eviction LRU
+        os.utime(path)
+        return inventory
+
+    def put(self, sha: str, inventory: dict):
+        save_inventory(self._inventory_path(sha), inventory)
+
+    def link_inventory(self, sha: str, dest):
+        """Collega (hard link, altrimenti copia) l'inventario in cache in dest."""
+        src = self._inventory_path(sha)
+        dest = Path(dest)
+        dest.unlink(missing_ok=True)
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copyfile(src, dest)
+
+    def store_blob(self, sha: str, xlsx_path) -> Path:
+        """
+        Sostituisce xlsx_path con un hard link al blob condiviso,
+        creando il blob se è il primo upload di questo contenuto.
+        """
+        xlsx_path = Path(xlsx_path)
+        blob = self.blobs_dir / f"{sha}.xlsx"
+        if blob.exists():
+            xlsx_path.unlink()
+        else:
+            try:
+                os.link(xlsx_path, blob)
+                return blob
+            except FileExistsError:
+                xlsx_path.unlink()
+            except OSError:
+                # Filesystem senza hard link: il file resta dov'è
+                return xlsx_path
+        try:
+            os.link(blob, xlsx_path)
+        except OSError:
+            shutil.copyfile(blob, xlsx_path)
+        return blob
+
+    def evict(self, max_age_days: int, max_bytes: int):
+        """
+        Elimina gli inventari non usati da più di max_age_days, poi i meno
+        usati finché la cache non rientra in max_bytes. I blob senza più
+        report che li referenziano (un solo link) vengono rimossi.
+        """
+        for blob in self.blobs_dir.glob("*.xlsx"):
+            try:
+                if blob.stat().st_nlink <= 1:
+                    blob.unlink()
+            except FileNotFoundError:
+                pass
+
+        cutoff = time.time() - max_age_days * 86400
+        entries = []
+        for path in self.inventory_dir.glob("*.npz"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            if st.st_mtime < cutoff or not path.name.endswith(f".v{CACHE_VERSION}.npz"):
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -4,9 +4,22 @@ Legge i fogli vInfo e vHost dal file rvtools.xlsx
 e calcola le statistiche per datacenter, host e tipo VM.
 """
 
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
 import pandas as pd
+from collections.abc import Sequence
+from contextlib import nullcontext
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+from typing import Dict, Optional
+
+from aggregation import AggregationCube, empty_summary, totals
+from inventory import VMInventory
+from metrics import PhaseTimer
+from os_classifier import classify_os
+from schema import VINFO_FIELDS, resolve
+from xlsx_reader import XlsxReader
 
 
 @dataclass
@@ -30,263 +43,248 @@ class HostStats:
     name: str
     datacenter: str
     cluster: str
-    num_cpu: int = 0          # CPU fisiche
+    num_cpu: int = 0          # CPU fisiche (socket, "# CPU")
+    num_cores: int = 0        # Core fisici ("# Cores"), 0 se il foglio non li riporta
     cpu_hz: float = 0         # Speed (GHz)
     memory_gb: float = 0      # RAM fisica GB
-    vms_on: List[VMInfo] = field(default_factory=list)
-    vms_off: List[VMInfo] = field(default_factory=list)
+    vms_on: Sequence[VMInfo] = field(default_factory=list)   # VMList nel report
+    vms_off: Sequence[VMInfo] = field(default_factory=list)
 
 
-def _safe_float(val, default=0.0):
-    try:
-        return float(val) if pd.notna(val) else default
-    except (ValueError, TypeError):
-        return default
+# ── Ingestione colonnare ─────────────────────────────────────────────────────
+# Colonne del frame VM: stesso ordine dei campi di VMInfo, più famiglia OS e UUID.
+VM_COLUMNS = [
+    "name", "power_state", "host", "datacenter", "cluster", "num_cpu", "memory_mb",
+    "disk_used_gb", "disk_provisioned_gb", "num_vcpu", "os", "simple_os",
+]
+HOST_COLUMNS = ["name", "datacenter", "cluster", "num_cpu", "num_cores", "memory_gb"]
 
+VINFO_SHEETS = ["vInfo", "vinfo", "VMInfo"]
+VHOST_SHEETS = ["vHost", "vhost", "HostInfo"]
 
-def _safe_int(val, default=0):
-    try:
-        return int(float(val)) if pd.notna(val) else default
-    except (ValueError, TypeError):
-        return default
-
-
-def _safe_str(val, default=""):
-    if pd.isna(val) if not isinstance(val, str) else False:
-        return default
-    return str(val).strip() if val is not None else default
-
-
-import re
-
-def _simplify_os_name(os_name, family):
-    if not os_name:
-        return "N/D"
-    
-    # Rimuovi (32-bit), (64-bit) etc.
-    os_name_clean = re.sub(r"\(.*?\d+-bit\)", "", os_name, flags=re.IGNORECASE).strip()
-    os_name_low = os_name_clean.lower()
-    
-    if family == "windows":
-        # Microsoft Windows Server 2016 -> Windows Server 2016
-        match = re.search(r"server\s+(\d{4}(?:\s+r2)?)", os_name_low)
-        if match:
-            return f"Windows Server {match.group(1).upper()}"
-        
-        match = re.search(r"windows\s+(\d+)", os_name_low)
-        if match:
-            return f"Windows {match.group(1)}"
-        
-        if "windows" in os_name_low:
-            if "server" in os_name_low:
-                return "Windows Server (Other)"
-            return "Windows (Other)"
-        return "N/D"
-
-    elif family == "linux":
-        distros = ["ubuntu", "red hat", "centos", "debian", "suse", "photon", "oracle linux"]
-        for d in distros:
-            if d in os_name_low:
-                # Cerca versione dopo il nome della distro
-                parts = re.split(re.escape(d), os_name_low, maxsplit=1)
-                after = parts[1] if len(parts) > 1 else ""
-                version_match = re.search(r"(\d+(?:\.\d+)?)", after)
-                if version_match:
-                    return f"{d.title()} {version_match.group(1)}"
-                return d.title()
-        
-        return "Linux (Other)"
-
-    return "Other"
-
-
-def vm_summary(vm_list):
-    os_counts = {"windows": 0, "linux": 0, "other": 0}
-    os_vms = {"windows": [], "linux": [], "other": []}
-    os_dist = {"windows": {}, "linux": {}, "other": {}}
-
-    for v in vm_list:
-        os_raw = (v.os or "").lower()
-        family = "other"
-        if "windows" in os_raw:
-            family = "windows"
-        elif any(k in os_raw for k in ["linux", "ubuntu", "debian", "centos", "red hat", "suse", "photon"]):
-            family = "linux"
-        
-        os_counts[family] += 1
-        os_vms[family].append(v)
-        
-        # Simplified OS name for the distribution report
-        simple_os = _simplify_os_name(v.os, family)
-        os_dist[family][simple_os] = os_dist[family].get(simple_os, 0) + 1
-
-    # Ordina i dizionari os_dist per nome OS
-    for fam in os_dist:
-        os_dist[fam] = dict(sorted(os_dist[fam].items()))
+# Colonne accettate per ogni campo di vInfo: vedi schema.py
+COL_MAP = VINFO_FIELDS
 
-    return {
-        "count": len(vm_list),
-        "tot_vcpu": sum(v.num_vcpu for v in vm_list),
-        "tot_vram_gb": round(sum(v.memory_mb for v in vm_list) / 1024, 3),
-        "tot_disk_used_gb": round(sum(v.disk_used_gb for v in vm_list), 3),
-        "tot_disk_prov_gb": round(sum(v.disk_provisioned_gb for v in vm_list), 3),
-        "os_counts": os_counts,
-        "os_vms": os_vms,
-        "os_dist": os_dist,
-    }
+# Senza nome e stato di accensione delle VM il report non ha senso
+REQUIRED_COLUMNS = ("VM", "Powerstate")
 
 
-def parse_rvtools(filepath: str) -> dict:
+# Match case-insensitive
+def find_col(df, candidates):
+    lower_cols = {col.lower().strip(): col for col in df.columns}
+    for c in candidates:
+        if c.lower().strip() in lower_cols:
+            return lower_cols[c.lower().strip()]
+    return None
+
+
+# Conversioni per colonna intera, usate anche dalle sezioni opzionali (sections.py)
+def str_column(df, col, n, default=""):
+    """Colonna di testo: NaN -> default, altrimenti str().strip()."""
+    if not col:
+        return pd.Series([default] * n, index=df.index, dtype=object)
+    s = df[col]
+    out = s.astype(str).str.strip()
+    out[s.isna().to_numpy()] = default
+    return out
+
+
+def float_column(df, col, n):
+    """Colonna numerica: valori non numerici o non finiti -> 0.0."""
+    if not col:
+        return np.zeros(n, dtype=np.float64)
+    vals = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    vals[~np.isfinite(vals)] = 0.0
+    return vals
+
+
+def int_column(df, col, n):
+    """Colonna intera: troncamento verso zero, non numerici -> 0."""
+    return np.trunc(float_column(df, col, n)).astype(np.int64)
+
+
+def _round(values: np.ndarray, digits: int) -> np.ndarray:
+    # round() di Python su ogni valore: np.round moltiplica per 10**digits e può
+    # differire nell'ultima cifra, spostando i totali del report
+    return np.array([round(v, digits) for v in values.tolist()], dtype=np.float64)
+
+
+def vinfo_frame(df_vinfo: pd.DataFrame) -> pd.DataFrame:
     """
-    Legge il file RVTools xlsx e restituisce un dict con tutte le statistiche.
+    Converte il foglio vInfo grezzo nel frame VM normalizzato (una colonna per
+    campo di VMInfo), lavorando per colonne intere invece che per riga.
+    Colonne e unità vengono dallo schema dell'intestazione; il riepilogo
+    dello schema resta in frame.attrs["schema"].
     """
-    xl = pd.ExcelFile(filepath)
-    sheet_names = xl.sheet_names
-
-    # ---- Legge vInfo (VM inventory) ----
-    # Prova nomi comuni del foglio
-    vinfo_sheet = None
-    for name in ["vInfo", "vinfo", "VMInfo"]:
-        if name in sheet_names:
-            vinfo_sheet = name
-            break
-    if vinfo_sheet is None:
-        raise ValueError(f"Foglio vInfo non trovato. Fogli disponibili: {sheet_names}")
-
-    df_vinfo = xl.parse(vinfo_sheet, header=0)
     df_vinfo.columns = [str(c).strip() for c in df_vinfo.columns]
+    n = len(df_vinfo)
+    schema = resolve("vInfo", df_vinfo.columns)
+    cols = schema.columns
+
+    names = str_column(df_vinfo, cols["VM"], n)
+    if cols["Powerstate"]:
+        power = str_column(df_vinfo, cols["Powerstate"], n).str.lower()
+    else:
+        power = pd.Series(["poweredoff"] * n, index=df_vinfo.index, dtype=object)
+    cpu = int_column(df_vinfo, cols["CPUs"], n)
+    os_names = str_column(df_vinfo, cols["OS"], n)
+
+    # Memoria in MiB e dischi in GB: una conversione per colonna
+    units = {}
+    converted = {}
+    for key in ("Memory", "Disk gb", "In Use MB"):
+        values = float_column(df_vinfo, cols[key], n)
+        if cols[key]:
+            values, units[key] = schema.convert(key, values)
+        converted[key] = values
+
+    frame = pd.DataFrame({
+        "name": names.to_numpy(dtype=object),
+        "power_state": power.to_numpy(dtype=object),
+        "host": str_column(df_vinfo, cols["Host"], n).to_numpy(dtype=object),
+        "datacenter": str_column(df_vinfo, cols["Datacenter"], n).to_numpy(dtype=object),
+        "cluster": str_column(df_vinfo, cols["Cluster"], n).to_numpy(dtype=object),
+        "num_cpu": cpu,
+        "memory_mb": converted["Memory"],
+        "disk_used_gb": _round(converted["In Use MB"], 3),
+        "disk_provisioned_gb": _round(converted["Disk gb"], 3),
+        "num_vcpu": cpu,
+        "os": os_names.to_numpy(dtype=object),
+        # Identità stabile della VM per il confronto tra export (vuota se il foglio non la ha)
+        "uuid": str_column(df_vinfo, cols["UUID"], n).str.lower().to_numpy(dtype=object),
+    })
+    frame = frame[frame["name"] != ""].reset_index(drop=True)
+
+    # Famiglia e versione semplificata: classificate una volta per ogni stringa OS distinta
+    codes, uniques = pd.factorize(frame["os"])
+    classified = [classify_os(o) for o in uniques]
+    families = [fam for fam, _ in classified]
+    simple = [simple_os for _, simple_os in classified]
+    frame["simple_os"] = np.asarray(simple, dtype=object)[codes] if len(uniques) else []
+    frame["os_family"] = np.asarray(families, dtype=object)[codes] if len(uniques) else []
+    frame.attrs["schema"] = schema.describe(units)
+    return frame
+
+
+def vhost_frame(df_vhost: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Converte il foglio vHost grezzo nel frame host normalizzato (schema in frame.attrs["schema"])."""
+    if df_vhost is None:
+        return pd.DataFrame({c: [] for c in HOST_COLUMNS})
+    df_vhost.columns = [str(c).strip() for c in df_vhost.columns]
+    n = len(df_vhost)
+    schema = resolve("vHost", df_vhost.columns)
+    cols = schema.columns
+    units = {}
+    hmem = float_column(df_vhost, cols["Memory"], n)
+    if cols["Memory"]:
+        hmem, units["Memory"] = schema.convert("Memory", hmem)
+    frame = pd.DataFrame({
+        "name": str_column(df_vhost, cols["Host"], n).to_numpy(dtype=object),
+        "datacenter": str_column(df_vhost, cols["Datacenter"], n).to_numpy(dtype=object),
+        "cluster": str_column(df_vhost, cols["Cluster"], n).to_numpy(dtype=object),
+        "num_cpu": int_column(df_vhost, cols["CPUs"], n),
+        "num_cores": int_column(df_vhost, cols["Cores"], n),
+        "memory_gb": _round(hmem, 2),
+    })
+    frame = frame[frame["name"] != ""].reset_index(drop=True)
+    frame.attrs["schema"] = schema.describe(units)
+    return frame
+
+
+def check_workbook(filepath: str) -> dict:
+    """
+    Verifica rapida prima del parsing: legge solo la directory dello zip,
+    l'elenco dei fogli e l'intestazione di vInfo. Solleva ValueError se il
+    file non è un workbook xlsx o non è un export RVTools utilizzabile.
+    """
+    try:
+        with XlsxReader(filepath) as xl:
+            vinfo_sheet = xl.find_sheet(VINFO_SHEETS)
+            if vinfo_sheet is None:
+                raise ValueError(f"Foglio vInfo non trovato. Fogli disponibili: {xl.sheet_names}")
+            header = [str(h).strip() for h in xl.read_header(vinfo_sheet) if h is not None]
+            vhost_sheet = xl.find_sheet(VHOST_SHEETS)
+            sheet_names = xl.sheet_names
+    except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+        raise ValueError(f"Il file non è un workbook Excel valido ({e})") from None
+
+    schema = resolve("vInfo", header)
+    missing = [key for key in REQUIRED_COLUMNS if key in schema.missing]
+    if missing:
+        raise ValueError(f"Colonne obbligatorie mancanti nel foglio {vinfo_sheet}: {', '.join(missing)}")
+    return {"vinfo": vinfo_sheet, "vhost": vhost_sheet, "sheet_names": sheet_names, "layout": schema.layout,
+            "missing": schema.missing}
+
+
+def read_inventory(filepath: str, timer: Optional[PhaseTimer] = None) -> dict:
+    """
+    Legge i fogli vInfo e vHost e restituisce l'inventario normalizzato
+    in forma colonnare: {"vms": DataFrame, "hosts": DataFrame, "sheet_names": [...], "schema": {...}}.
+    Con timer misura separatamente lettura dei fogli e normalizzazione.
+    """
+    phase = timer.phase if timer else (lambda name: nullcontext())
+    with phase("sheet_read"), XlsxReader(filepath) as xl:
+        sheet_names = xl.sheet_names
 
-    # ---- Mappa le colonne RVTools standard ----
-    COL_MAP = {
-        "VM": ["VM", "Name", "VM Name"],
-        "Powerstate": ["Powerstate", "Power State", "State"],
-        "Host": ["Host", "ESX Host", "ESXi Host"],
-        "Datacenter": ["Datacenter", "DC"],
-        "Cluster": ["Cluster"],
-        "CPUs": ["CPUs", "CPU", "vCPUs", "Num CPUs"],
-        "Memory": ["Memory", "Memory MB", "RAM MB", "Memory (MB)", "Memory MiB"],
-        "Disk gb": ["Provisioned MiB", "Disk MiB", "Disk GB", "Total disk (GB)", "Provisioned MB", "Disk (GB)"],
-        "In Use MB": ["In Use MiB", "In Use MB", "Used Space MB", "Used disk (MB)", "Disk usage (MB)"],
-        "OS": ["OS according to the VMware Tools", "OS", "Guest OS", "OS according to the configuration file"],
-    }
+        # ---- Legge vInfo (VM inventory) ----
+        # Prova nomi comuni del foglio
+        vinfo_sheet = xl.find_sheet(VINFO_SHEETS)
+        if vinfo_sheet is None:
+            raise ValueError(f"Foglio vInfo non trovato. Fogli disponibili: {sheet_names}")
+
+        # ---- Legge vHost (host fisici) ----
+        vhost_sheet = xl.find_sheet(VHOST_SHEETS)
 
-    # Match case-insensitive
-    def find_col(df, candidates):
-        lower_cols = {col.lower().strip(): col for col in df.columns}
-        for c in candidates:
-            if c.lower().strip() in lower_cols:
-                return lower_cols[c.lower().strip()]
-        return None
-
-    col_name = find_col(df_vinfo, COL_MAP["VM"])
-    col_power = find_col(df_vinfo, COL_MAP["Powerstate"])
-    col_host = find_col(df_vinfo, COL_MAP["Host"])
-    col_dc = find_col(df_vinfo, COL_MAP["Datacenter"])
-    col_cluster = find_col(df_vinfo, COL_MAP["Cluster"])
-    col_cpu = find_col(df_vinfo, COL_MAP["CPUs"])
-    col_mem = find_col(df_vinfo, COL_MAP["Memory"])
-    col_disk_prov = find_col(df_vinfo, COL_MAP["Disk gb"])
-    col_disk_used = find_col(df_vinfo, COL_MAP["In Use MB"])
-    col_os = find_col(df_vinfo, COL_MAP["OS"])
-
-    vms: List[VMInfo] = []
-    for _, row in df_vinfo.iterrows():
-        name = _safe_str(row.get(col_name, "")) if col_name else ""
-        if not name:
-            continue
-        power = _safe_str(row.get(col_power, "poweredOff")) if col_power else "poweredOff"
-        host = _safe_str(row.get(col_host, "")) if col_host else ""
-        dc = _safe_str(row.get(col_dc, "")) if col_dc else ""
-        cluster = _safe_str(row.get(col_cluster, "")) if col_cluster else ""
-        cpu = _safe_int(row.get(col_cpu, 0)) if col_cpu else 0
-        mem_mb = _safe_float(row.get(col_mem, 0)) if col_mem else 0.0
-        
-        # Disk: converti MiB/MB in GB se necessario
-        disk_prov_raw = _safe_float(row.get(col_disk_prov, 0)) if col_disk_prov else 0.0
-        disk_used_raw = _safe_float(row.get(col_disk_used, 0)) if col_disk_used else 0.0
-        
-        # Heuristic: se il valore è > 10000 o la colonna contiene MiB/MB, dividi per 1024
-        def to_gb(val, col_name):
-            if not col_name: return val
-            if "mib" in col_name.lower() or "mb" in col_name.lower() or val > 10000:
-                return val / 1024
-            return val
-
-        disk_prov_gb = to_gb(disk_prov_raw, col_disk_prov)
-        disk_used_gb = to_gb(disk_used_raw, col_disk_used)
-        
-        os_name = _safe_str(row.get(col_os, "")) if col_os else ""
-
-        vms.append(VMInfo(
-            name=name,
-            power_state=power.lower(),
-            host=host,
-            datacenter=dc,
-            cluster=cluster,
-            num_cpu=cpu,
-            memory_mb=mem_mb,
-            disk_used_gb=round(disk_used_gb, 3),
-            disk_provisioned_gb=round(disk_prov_gb, 3),
-            num_vcpu=cpu,
-            os=os_name,
-            simple_os=_simplify_os_name(os_name, "windows" if "windows" in os_name.lower() else ("linux" if any(k in os_name.lower() for k in ["linux", "ubuntu", "debian", "centos", "red hat", "suse", "photon"]) else "other"))
-        ))
-
-    # ---- Legge vHost (host fisici) ----
-    vhost_sheet = None
-    for name in ["vHost", "vhost", "HostInfo"]:
-        if name in sheet_names:
-            vhost_sheet = name
-            break
+        # Solo i due fogli usati: gli altri non vengono nemmeno decompressi
+        frames = xl.read_sheets([vinfo_sheet] + ([vhost_sheet] if vhost_sheet else []))
 
+    with phase("vinfo_parse"):
+        vms = vinfo_frame(frames[vinfo_sheet])
+        hosts = vhost_frame(frames.get(vhost_sheet))
+
+    # Layout riconosciuto, colonne e unità di ogni foglio (meta.json del report)
+    schema = {sheet: frame.attrs.pop("schema") for sheet, frame in (("vInfo", vms), ("vHost", hosts))
+              if "schema" in frame.attrs}
+    return {"vms": vms, "hosts": hosts, "sheet_names": sheet_names, "schema": schema}
+
+
+def summarize_inventory(inventory: dict) -> dict:
+    """
+    Calcola tutte le statistiche del report a partire dall'inventario colonnare.
+    Tutti i riepiloghi derivano da un unico cubo di aggregazione.
+    """
+    vms = inventory["vms"]
+    # Le liste di VM del report sono posizioni nell'inventario compatto
+    store = VMInventory(vms)
+    cube = AggregationCube(vms)
+    wrap = store.rows
+
+    # ---- Host da vHost (a parità di nome vince l'ultima riga) ----
     host_stats: Dict[str, HostStats] = {}
-    if vhost_sheet:
-        df_vhost = xl.parse(vhost_sheet, header=0)
-        df_vhost.columns = [str(c).strip() for c in df_vhost.columns]
-        col_hname = find_col(df_vhost, ["Host", "Name"])
-        col_hdc = find_col(df_vhost, ["Datacenter", "DC"])
-        col_hcluster = find_col(df_vhost, ["Cluster"])
-        col_hcpu = find_col(df_vhost, ["# CPU", "CPUs", "Num CPUs", "CPU"])
-        col_hmem = find_col(df_vhost, ["# Memory", "Memory GB", "Memory MB", "RAM"])
-        for _, row in df_vhost.iterrows():
-            hname = _safe_str(row.get(col_hname, "")) if col_hname else ""
-            if not hname:
-                continue
-            hdc = _safe_str(row.get(col_hdc, "")) if col_hdc else ""
-            hcluster = _safe_str(row.get(col_hcluster, "")) if col_hcluster else ""
-            hcpu = _safe_int(row.get(col_hcpu, 0)) if col_hcpu else 0
-            hmem_raw = _safe_float(row.get(col_hmem, 0)) if col_hmem else 0.0
-            hmem_gb = hmem_raw / 1024 if hmem_raw > 1000 else hmem_raw
-            host_stats[hname] = HostStats(
-                name=hname,
-                datacenter=hdc,
-                cluster=hcluster,
-                num_cpu=hcpu,
-                memory_gb=round(hmem_gb, 2),
-            )
+    for name, dc, cluster, cpu, cores, mem in inventory["hosts"][HOST_COLUMNS].itertuples(index=False):
+        host_stats[name] = HostStats(name=name, datacenter=dc, cluster=cluster,
+                                     num_cpu=int(cpu), num_cores=int(cores), memory_gb=float(mem))
 
     # ---- Associa VM agli host ----
-    for vm in vms:
-        if vm.host not in host_stats:
-            host_stats[vm.host] = HostStats(
-                name=vm.host,
-                datacenter=vm.datacenter,
-                cluster=vm.cluster,
-            )
-        hs = host_stats[vm.host]
-        if not hs.datacenter and vm.datacenter:
-            hs.datacenter = vm.datacenter
-        if vm.power_state == "poweredon":
-            hs.vms_on.append(vm)
-        else:
-            hs.vms_off.append(vm)
+    dcs = vms["datacenter"].to_numpy()
+    clusters = vms["cluster"].to_numpy()
+    for (host,), g in cube.rollup(("host",), labelled=False).items():
+        pos = g["positions"]
+        if host not in host_stats:
+            host_stats[host] = HostStats(name=host, datacenter=dcs[pos[0]], cluster=clusters[pos[0]])
+        hs = host_stats[host]
+        if not hs.datacenter:
+            non_empty = dcs[pos][dcs[pos] != ""]
+            if len(non_empty):
+                hs.datacenter = non_empty[0]
+    for (host, power), g in cube.rollup(("host", "power"), labelled=False).items():
+        setattr(host_stats[host], f"vms_{power}", wrap(g["positions"]))
 
     # ---- Calcola summary globale ----
-    vms_on = [v for v in vms if v.power_state == "poweredon"]
-    vms_off = [v for v in vms if v.power_state != "poweredon"]
-
-    summary_on = vm_summary(vms_on)
-    summary_off = vm_summary(vms_off)
+    by_power = {power: g["positions"] for (power,), g in cube.rollup(("power",)).items()}
+    no_vms = np.empty(0, dtype=np.int64)
+    summary_on = cube.summary(wrap, where={"power": "on"})
+    summary_off = cube.summary(wrap, where={"power": "off"})
     summary_total = {
         "count": summary_on["count"] + summary_off["count"],
         "tot_vcpu": summary_on["tot_vcpu"] + summary_off["tot_vcpu"],
@@ -296,31 +294,42 @@ def parse_rvtools(filepath: str) -> dict:
     }
 
     # ---- Raggruppa per datacenter ----
-    datacenters: Dict[str, dict] = {}
-    for vm in vms:
-        dc = vm.datacenter or "N/D"
-        if dc not in datacenters:
-            datacenters[dc] = {"vms_on": [], "vms_off": []}
-        if vm.power_state == "poweredon":
-            datacenters[dc]["vms_on"].append(vm)
-        else:
-            datacenters[dc]["vms_off"].append(vm)
-
+    by_dc = cube.summaries(("datacenter", "power"), wrap)
     dc_summaries = {}
-    for dc, data in datacenters.items():
-        dc_summaries[dc] = {
-            "on": vm_summary(data["vms_on"]),
-            "off": vm_summary(data["vms_off"]),
-        }
+    for dc, _ in by_dc:
+        if dc not in dc_summaries:
+            dc_summaries[dc] = {
+                "on": by_dc.get((dc, "on")) or empty_summary(wrap),
+                "off": by_dc.get((dc, "off")) or empty_summary(wrap),
+            }
+
+    # ---- VM per datacenter + host e relativi totali ----
+    vms_by_dc = {"on": {}, "off": {}}
+    host_totals = {"on": {}, "off": {}}
+    for (dc, host, power), g in cube.rollup(("datacenter", "host", "power")).items():
+        vms_by_dc[power].setdefault(dc, {})[host] = wrap(g["positions"])
+        host_totals[power].setdefault(dc, {})[host] = totals(g)
 
     return {
-        "vms_on": vms_on,
-        "vms_off": vms_off,
+        "vms_on": wrap(by_power.get("on", no_vms)),
+        "vms_off": wrap(by_power.get("off", no_vms)),
         "summary_on": summary_on,
         "summary_off": summary_off,
         "summary_total": summary_total,
         "host_stats": host_stats,
         "datacenters": dc_summaries,
-        "all_vms": vms,
-        "sheet_names": sheet_names,
+        "vms_on_by_dc": vms_by_dc["on"],
+        "vms_off_by_dc": vms_by_dc["off"],
+        "host_totals_on": host_totals["on"],
+        "host_totals_off": host_totals["off"],
+        "cube": cube,
+        "all_vms": wrap(None),
+        "sheet_names": inventory["sheet_names"],
     }
+
+
+def parse_rvtools(filepath: str) -> dict:
+    """
+    Legge il file RVTools xlsx e restituisce un dict con tutte le statistiche.
+    """
+    return summarize_inventory(read_inventory(filepath))
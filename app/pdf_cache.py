@@ -0,0 +1,143 @@
+"""
+PDF dei report generati una sola volta e conservati accanto a report.html.
+La chiave copre il contenuto del report e il branding (colori, nome azienda,
+logo): cambiando le impostazioni il PDF viene rigenerato alla richiesta
+successiva. Le richieste concorrenti per lo stesso report condividono un
+unico rendering grazie a un lock su file.
+Se il report ha le parti di stampa (cartella print/), ciascuna viene
+impaginata in un processo separato e i risultati uniti in un solo PDF;
+altrimenti si impagina report.html per intero. Dentro un processo di un
+pool (job dell'upload, bulk_ingest -j) le parti si impaginano in serie:
+il parallelismo è già quello del pool.
+"""
+
+import fcntl
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Optional
+
+from weasyprint import HTML
+
+from metrics import PhaseTimer
+from pdf_merge import detach, merge
+from report_builder import PRINT_DIR
+
+
+BRANDING_KEYS = ("primary_color", "accent_color", "company_name", "logo_url")
+LOGO_FILES = ("img/custom_logo.png", "logoVG.png", "logo.svg")
+# Processi per l'impaginazione parallela delle parti del report (0 = uno per core);
+# solo nei processi che non appartengono già a un pool
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def branding_fingerprint(settings: dict, static_dir) -> dict:
+    fp = {k: settings.get(k, "") for k in BRANDING_KEYS}
+    for name in LOGO_FILES:
+        path = Path(static_dir) / name
+        if path.exists():
+            st = path.stat()
+            fp[name] = [st.st_size, st.st_mtime_ns]
+    return fp
+
+
+def _print_parts(report_folder: Path) -> list:
+    return sorted((report_folder / PRINT_DIR).glob("*.html"))
+
+
+def pdf_key(report_folder, settings: dict, static_dir) -> str:
+    h = hashlib.sha256()
+    report_folder = Path(report_folder)
+    for path in [report_folder / "report.html"] + _print_parts(report_folder):
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+    h.update(json.dumps(branding_fingerprint(settings, static_dir), sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _render(report_folder: Path, target: Path, base_dir):
+    html_content = (report_folder / "report.html").read_text(encoding="utf-8")
+
+    # Per WeasyPrint, i percorsi che iniziano con / vengono cercati alla radice del filesystem.
+    # Trasformiamo i percorsi /static/ in static/ (relativi alla base_url)
+    html_content = html_content.replace('src="/static/', 'src="static/')
+    html_content = html_content.replace('href="/static/', 'href="static/')
+
+    # Per WeasyPrint, dobbiamo specificare la base_url per caricare immagini e font locali
+    # Usiamo il percorso assoluto della cartella app
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    HTML(string=html_content, base_url=str(base_dir)).write_pdf(str(tmp))
+    os.replace(tmp, target)
+
+
+def _render_part(path: str, base_dir: str) -> dict:
+    """Eseguita nei processi del pool: impagina una parte e ne restituisce gli oggetti PDF."""
+    captured = {}
+    # Il PDF scritto qui viene scartato: serve solo il documento pydyf passato al finisher
+    HTML(filename=path, base_url=base_dir).write_pdf(
+        io.BytesIO(), uncompressed_pdf=True, finisher=lambda document, pdf: captured.update(part=detach(pdf)))
+    return captured["part"]
+
+
+def _part_workers(parts: int) -> int:
+    # Un pool annidato in ogni processo dei pool moltiplicherebbe i processi WeasyPrint
+    if multiprocessing.parent_process() is not None:
+        return 1
+    return min(PDF_WORKERS, parts)
+
+
+def _render_parts(paths: list, target: Path, base_dir):
+    """Impagina le parti (in parallelo se possibile) e le unisce in un unico PDF con le pagine numerate."""
+    workers = _part_workers(len(paths))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Le parti più grandi per prime, così il pool resta occupato fino alla fine
+            futures = {path: pool.submit(_render_part, str(path), str(base_dir))
+                       for path in sorted(paths, key=lambda p: p.stat().st_size, reverse=True)}
+            parts = [futures[path].result() for path in paths]
+    else:
+        parts = [_render_part(str(path), str(base_dir)) for path in paths]
+
+    pdf = merge(parts)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        pdf.write(f, compress=True)
+    os.replace(tmp, target)
+
+
+def get_pdf(report_folder, settings: dict, base_dir, static_dir, timer: Optional[PhaseTimer] = None) -> tuple:
+    """
+    Restituisce (percorso del PDF, chiave), generandolo solo se manca
+    per il contenuto e il branding correnti. Con timer misura il rendering
+    (fase "pdf"), se avviene.
+    """
+    report_folder = Path(report_folder)
+    key = pdf_key(report_folder, settings, static_dir)
+    target = report_folder / f"report-{key[:16]}.pdf"
+    if target.exists():
+        return target, key
+
+    with open(report_folder / ".pdf.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Un'altra richiesta potrebbe averlo generato mentre aspettavamo il lock
+            if not target.exists():
+                parts = _print_parts(report_folder)
+                with timer.phase("pdf") if timer else nullcontext():
+                    if parts:
+                        _render_parts(parts, target, base_dir)
+                    else:
+                        # Report generati prima delle parti di stampa
+                        _render(report_folder, target, base_dir)
+                for stale in report_folder.glob("report-*.pdf"):
+                    if stale != target:
+                        stale.unlink(missing_ok=True)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return target, key
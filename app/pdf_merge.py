@@ -0,0 +1,152 @@
+"""
+Unione dei PDF delle parti del report, impaginate in processi separati.
+Ogni parte è il documento pydyf prodotto da WeasyPrint (raccolto con il
+finisher di write_pdf) reso serializzabile nel processo che l'ha generato;
+qui gli oggetti delle parti vengono rinumerati in un unico documento e a
+ogni pagina si aggiunge "Pagina N di M" calcolato sul documento intero.
+"""
+
+import re
+
+import pydyf
+
+
+REFERENCE = re.compile(rb"(\d+) 0 R")
+# Delimitatori del contenuto in Stream.data
+STREAM_START, STREAM_END = b"\nstream\n", b"\nendstream"
+PAGE_LABEL = "Pagina {page} di {pages}"
+# Come il margine @bottom-right di report.html: 7.5pt, grigio, allineato a destra
+PAGE_FONT = "PageNumber"
+PAGE_FONT_SIZE = 7.5
+PAGE_COLOR = (0.392, 0.455, 0.545)
+PAGE_RIGHT_MM = 8
+PAGE_BASELINE_MM = 8
+MM = 72 / 25.4
+# Larghezze Helvetica (millesimi di em) dei caratteri usati nell'etichetta
+HELVETICA_WIDTHS = {"P": 667, "i": 222, " ": 278, **{c: 556 for c in "agnd0123456789"}}
+
+
+def _stream_content(stream: pydyf.Stream) -> bytes:
+    """
+    Contenuto non compresso dello stream, con gli elementi non bytes (immagini
+    lazy, numeri) già risolti: si ricava dalla serializzazione pubblica di
+    pydyf, togliendo dizionario e delimitatori stream/endstream.
+    """
+    data = pydyf.Stream(stream.stream).data
+    start = data.index(STREAM_START) + len(STREAM_START)
+    return data[start:-len(STREAM_END)]
+
+
+def detach(pdf: pydyf.PDF) -> dict:
+    """
+    Oggetti e pagine di pdf senza legami con le strutture di WeasyPrint
+    (font Pango, immagini lazy): il risultato si può passare tra processi.
+    Il contenuto degli stream viene serializzato; quelli scritti senza
+    compressione (uncompressed_pdf) e senza un filtro proprio verranno
+    compressi nel documento finale.
+    """
+    objects = {}
+    skip = {pdf.pages.number, pdf.info.number, pdf.catalog.number}
+    for obj in pdf.objects[1:]:
+        if obj.number in skip:
+            continue
+        if isinstance(obj, pydyf.Stream):
+            content = _stream_content(obj)
+            plain = pydyf.Stream([content], dict(obj.extra), obj.compress or "Filter" not in obj.extra)
+            plain.number = obj.number
+            obj = plain
+        objects[obj.number] = obj
+    return {
+        "version": pdf.version,
+        "objects": objects,
+        "pages": [int(n) for n in pdf.pages["Kids"][::3]],
+        "info": dict(pdf.info),
+        "lang": pdf.catalog.get("Lang"),
+        # Riferimenti agli oggetti di struttura, sostituiti da quelli del documento unito
+        "aliases": {pdf.pages.number: "pages", pdf.info.number: "info", pdf.catalog.number: "catalog"},
+    }
+
+
+def _renumber(value, mapping: dict):
+    if isinstance(value, bytes):
+        match = REFERENCE.fullmatch(value)
+        return f"{mapping[int(match.group(1))]} 0 R".encode() if match else value
+    if isinstance(value, pydyf.Dictionary):
+        for key, item in value.items():
+            value[key] = _renumber(item, mapping)
+    elif isinstance(value, pydyf.Array):
+        value[:] = [_renumber(item, mapping) for item in value]
+    elif isinstance(value, pydyf.Stream):
+        value.extra = {key: _renumber(item, mapping) for key, item in value.extra.items()}
+    return value
+
+
+def _resolve(pdf: pydyf.PDF, value):
+    if isinstance(value, bytes):
+        match = REFERENCE.fullmatch(value)
+        if match:
+            return pdf.objects[int(match.group(1))]
+    return value
+
+
+def _page_label_stream(page: pydyf.Dictionary, number: int, total: int) -> pydyf.Stream:
+    _, lower, right, _ = (float(v) for v in page["MediaBox"])
+    label = PAGE_LABEL.format(page=number, pages=total)
+    width = sum(HELVETICA_WIDTHS.get(c, 556) for c in label) * PAGE_FONT_SIZE / 1000
+    x = right - PAGE_RIGHT_MM * MM - width
+    y = lower + PAGE_BASELINE_MM * MM
+    stream = pydyf.Stream()
+    # Il contenuto della pagina può lasciare trasformazioni attive: si parte dallo stato salvato
+    stream.pop_state()
+    stream.begin_text()
+    stream.set_font_size(PAGE_FONT, PAGE_FONT_SIZE)
+    stream.set_color_rgb(*PAGE_COLOR)
+    stream.move_text_to(round(x, 2), round(y, 2))
+    stream.show_text_string(label)
+    stream.end_text()
+    return stream
+
+
+def merge(parts: list) -> pydyf.PDF:
+    """Unisce le parti (risultati di detach) nell'ordine dato, numerando le pagine."""
+    pdf = pydyf.PDF(max((p["version"] for p in parts), default=b"1.7"))
+    if parts:
+        # Metadati (titolo, autore, producer) e lingua della prima parte
+        pdf.info.update(parts[0]["info"])
+        if parts[0]["lang"] is not None:
+            pdf.catalog["Lang"] = parts[0]["lang"]
+    font = pydyf.Dictionary({
+        "Type": "/Font", "Subtype": "/Type1", "BaseFont": "/Helvetica", "Encoding": "/WinAnsiEncoding",
+    })
+    pdf.add_object(font)
+    save_state = pydyf.Stream()
+    save_state.push_state()
+    pdf.add_object(save_state)
+
+    pages = []
+    for part in parts:
+        mapping = {number: getattr(pdf, name).number for number, name in part["aliases"].items()}
+        page_numbers = set(part["pages"])
+        # Prima gli altri oggetti, poi le pagine nell'ordine della parte (add_page numera in coda)
+        order = [n for n in part["objects"] if n not in page_numbers] + part["pages"]
+        mapping.update({number: len(pdf.objects) + i for i, number in enumerate(order)})
+        for number in order:
+            obj = _renumber(part["objects"][number], mapping)
+            if number not in page_numbers:
+                pdf.add_object(obj)
+                continue
+            pdf.add_page(obj)
+            pages.append(obj)
+            # Font dell'etichetta nelle risorse della pagina (condivise nella parte)
+            resources = _resolve(pdf, obj["Resources"])
+            fonts = _resolve(pdf, resources.get("Font"))
+            if isinstance(fonts, pydyf.Dictionary):
+                fonts[PAGE_FONT] = font.reference
+            else:
+                resources["Font"] = pydyf.Dictionary({PAGE_FONT: font.reference})
+
+    for number, page in enumerate(pages, start=1):
+        label = _page_label_stream(page, number, len(pages))
+        pdf.add_object(label)
+        page["Contents"] = pydyf.Array([save_state.reference, page["Contents"], label.reference])
+    return pdf
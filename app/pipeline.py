@@ -0,0 +1,150 @@
+"""
+Pipeline di elaborazione di un upload: parsing (con cache), aggregazione,
+generazione dell'HTML e dei metadati del report.
+Non dipende da Flask, così può girare nei processi del pool dei job.
+"""
+
+import json
+import os
+import shutil
+import traceback
+from pathlib import Path
+from typing import Callable, Optional
+
+from catalog import Catalog
+from fleet import report_rollup
+from metrics import MetricsStore, PhaseTimer
+from parser import read_inventory, summarize_inventory
+from parse_cache import ParseCache, sha256_file
+from pdf_cache import get_pdf
+from report_builder import write_print_parts, write_report
+from search_index import SearchIndex
+from vm_index import INDEX_FILE, INVENTORY_FILE, build_vm_index
+
+
+def _write_meta(report_folder: Path, meta: dict):
+    tmp = report_folder / f".meta.json.{os.getpid()}.tmp"
+    with open(tmp, "w") as mf:
+        json.dump(meta, mf)
+    os.replace(tmp, report_folder / "meta.json")
+
+
+def generate_report(report_id: str, xlsx_path: str, filename: str, upload_folder: str,
+                    report_folder: str, cache_dir: str, settings: dict, created: str,
+                    custom_title: str = "", custom_date: Optional[str] = None,
+                    progress: Optional[Callable[[str, int], None]] = None,
+                    base_dir: Optional[str] = None, static_dir: Optional[str] = None,
+                    catalog_path: Optional[str] = None, metrics_path: Optional[str] = None,
+                    timings: Optional[dict] = None, sha256: Optional[str] = None,
+                    search_path: Optional[str] = None) -> dict:
+    """
+    Elabora il file xlsx già salvato e scrive report.html e meta.json
+    nella cartella del report. Restituisce i metadati.
+    Con base_dir e static_dir genera anche il PDF, dopo aver segnalato
+    il report come pronto. Con catalog_path aggiorna il catalogo dei report.
+    Le misure di ogni fase (più quelle già prese in timings, es. la ricezione
+    dell'upload) finiscono in meta.json e, con metrics_path, nelle metriche.
+    Con search_path le VM del report entrano nell'indice di ricerca.
+    sha256, se già calcolato durante la ricezione, evita di rileggere il file.
+    """
+    progress = progress or (lambda phase, pct: None)
+    upload_folder, report_folder = Path(upload_folder), Path(report_folder)
+    cache = ParseCache(cache_dir)
+    timer = PhaseTimer()
+    timer.add(timings or {})
+
+    # Qualunque errore, in ogni fase, non lascia report parziali né righe nel catalogo o nell'indice
+    try:
+        # Analizza (riusa l'inventario se lo stesso file è già stato caricato)
+        progress("parsing", 10)
+        sha = sha256
+        if sha is None:
+            with timer.phase("hash"):
+                sha = sha256_file(xlsx_path)
+        with timer.phase("cache_load"):
+            inventory = cache.get(sha)
+        cache_hit = inventory is not None
+        if not cache_hit:
+            inventory = read_inventory(str(xlsx_path), timer=timer)
+            with timer.phase("cache_store"):
+                cache.put(sha, inventory)
+        progress("summarizing", 50)
+        with timer.phase("summarize"):
+            data = summarize_inventory(inventory)
+        cache.store_blob(sha, xlsx_path)
+
+        # Inventario e indice per l'API /report/<id>/vms
+        progress("indexing", 60)
+        with timer.phase("index"):
+            cache.link_inventory(sha, report_folder / INVENTORY_FILE)
+            build_vm_index(inventory["vms"], report_folder / INDEX_FILE)
+
+        # Genera HTML
+        progress("rendering", 70)
+        with timer.phase("render"):
+            write_report(
+                report_folder / "report.html",
+                data, report_id, filename,
+                custom=settings,
+                custom_title=custom_title,
+                custom_date=custom_date,
+                inline_tables=False,
+                precompress=True,
+                bytecode_cache_dir=str(Path(cache_dir) / "jinja"),
+            )
+        with timer.phase("render_print"):
+            write_print_parts(report_folder, data, report_id, filename, custom=settings, custom_title=custom_title,
+                              custom_date=custom_date, bytecode_cache_dir=str(Path(cache_dir) / "jinja"))
+
+        # Salva metadati, catalogo e indice di ricerca
+        progress("saving", 90)
+        meta = {
+            "id": report_id,
+            "filename": filename,
+            "sha256": sha,
+            "created": created,
+            "custom_title": custom_title,
+            "custom_date": custom_date,
+            "vms_on": data["summary_on"]["count"],
+            "vms_off": data["summary_off"]["count"],
+            "total": data["summary_total"]["count"],
+            # Totali per la dashboard della flotta, copiati nel catalogo
+            "rollup": report_rollup(inventory),
+            # Layout riconosciuto, colonne e unità dei fogli; layout None se sconosciuto
+            "schema": inventory.get("schema", {}),
+            "metrics": {
+                "workbook_bytes": os.path.getsize(xlsx_path),
+                "sheets": len(inventory["sheet_names"]),
+                "vms": len(inventory["vms"]),
+                "hosts": len(data["host_stats"]),
+                "cache_hit": cache_hit,
+                "phases": timer.phases,
+            },
+        }
+        _write_meta(report_folder, meta)
+        if catalog_path:
+            Catalog(catalog_path).put(meta)
+        if search_path:
+            with timer.phase("search_index"):
+                SearchIndex(search_path).add(meta, inventory["vms"])
+        progress("done", 100)
+
+        if base_dir and static_dir:
+            try:
+                get_pdf(report_folder, settings, base_dir, static_dir, timer=timer)
+            except Exception:
+                # Il PDF verrà generato alla prima richiesta
+                traceback.print_exc()
+            else:
+                _write_meta(report_folder, meta)
+        if metrics_path:
+            MetricsStore(metrics_path).record_report(meta)
+        return meta
+    except Exception:
+        shutil.rmtree(upload_folder, ignore_errors=True)
+        shutil.rmtree(report_folder, ignore_errors=True)
+        if catalog_path:
+            Catalog(catalog_path).delete(report_id)
+        if search_path:
+            SearchIndex(search_path).delete(report_id)
+        raise
@@ -1,58 +1,79 @@
 """
 Genera il report HTML dalle statistiche estratte dal parser RVTools.
+L'Environment Jinja è unico per processo; con una cartella di bytecode cache
+il template compilato è condiviso anche tra i worker gunicorn.
 """
 
+from contextlib import ExitStack
 from datetime import datetime
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from functools import lru_cache
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+from pathlib import Path
+from typing import Optional
+import brotli
+import gzip
 import os
-import json
+import shutil
+
+from sections import available_sections
 
 
 TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates")
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 9
+WRITE_BUFFER = 64 * 1024
+# Content-Encoding -> suffisso della copia precompressa, in ordine di preferenza
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Parti del report per il PDF (report_print.html), una per file
+PRINT_DIR = "print"
 
 
-def build_report(data: dict, report_id: str, filename: str, custom: dict = None, custom_title: str = "", custom_date: str = "") -> str:
-    """
-    Genera l'HTML del report e lo restituisce come stringa.
-    """
-    env = Environment(
-        loader=FileSystemLoader(TEMPLATES_DIR),
-        autoescape=select_autoescape(["html", "xml"])
-    )
+class _BrotliWriter:
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
 
-    def fmt_gb(val):
-        if val is None:
-            return "0"
-        # Round to nearest integer and use dot for thousands
-        s = f"{int(round(val)):,}"
-        return s.replace(",", ".")
+    def write(self, data: bytes):
+        self.fileobj.write(self.compressor.process(data))
 
-    def fmt_int(val):
-        if val is None:
-            return "0"
-        s = f"{int(round(val)):,}"
-        return s.replace(",", ".")
+    def close(self):
+        self.fileobj.write(self.compressor.finish())
 
-    env.filters["fmt_gb"] = fmt_gb
-    env.filters["fmt_int"] = fmt_int
 
-    template = env.get_template("report.html")
+def fmt_gb(val):
+    if val is None:
+        return "0"
+    # Round to nearest integer and use dot for thousands
+    s = f"{int(round(val)):,}"
+    return s.replace(",", ".")
 
-    # Raggruppa VM spente per datacenter + host
-    vms_off_by_dc: dict = {}
-    for vm in data["vms_off"]:
-        dc = vm.datacenter or "N/D"
-        host = vm.host or "N/D"
-        vms_off_by_dc.setdefault(dc, {}).setdefault(host, []).append(vm)
 
-    # Raggruppa VM accese per datacenter + host
-    vms_on_by_dc: dict = {}
-    for vm in data["vms_on"]:
-        dc = vm.datacenter or "N/D"
-        host = vm.host or "N/D"
-        vms_on_by_dc.setdefault(dc, {}).setdefault(host, []).append(vm)
+def fmt_int(val):
+    if val is None:
+        return "0"
+    s = f"{int(round(val)):,}"
+    return s.replace(",", ".")
+
+
+@lru_cache(maxsize=None)
+def get_environment(bytecode_cache_dir: Optional[str] = None) -> Environment:
+    bytecode_cache = None
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=select_autoescape(["html", "xml"]),
+        bytecode_cache=bytecode_cache,
+    )
+    env.filters["fmt_gb"] = fmt_gb
+    env.filters["fmt_int"] = fmt_int
+    return env
+
 
-    rendered = template.render(
+def _context(data: dict, report_id: str, filename: str, custom: dict, custom_title: str, custom_date: str,
+             inline_tables: bool) -> dict:
+    return dict(
         report_id=report_id,
         filename=filename,
         summary_on=data["summary_on"],
@@ -62,10 +83,108 @@ def build_report(data: dict, report_id: str, filename: str, custom: dict = None,
         host_stats=data["host_stats"],
         vms_on=data["vms_on"],
         vms_off=data["vms_off"],
-        vms_off_by_dc=vms_off_by_dc,
-        vms_on_by_dc=vms_on_by_dc,
+        # Raggruppamenti per datacenter + host già calcolati dal cubo di aggregazione
+        vms_off_by_dc=data["vms_off_by_dc"],
+        vms_on_by_dc=data["vms_on_by_dc"],
+        host_totals_on=data["host_totals_on"],
+        host_totals_off=data["host_totals_off"],
         custom=custom or {},
         generation_date=custom_date or datetime.now().strftime("%d/%m/%Y %H:%M"),
         report_title=custom_title,
+        inline_tables=inline_tables,
+        # Sezioni dei fogli opzionali, caricate dal browser solo se aperte
+        extra_sections=available_sections(data.get("sheet_names", [])),
     )
-    return rendered
+
+
+def build_report(data: dict, report_id: str, filename: str, custom: dict = None, custom_title: str = "", custom_date: str = "",
+                 inline_tables: bool = True) -> str:
+    """
+    Genera l'HTML del report e lo restituisce come stringa.
+    Con inline_tables=False le tabelle con l'elenco delle VM non vengono
+    incluse e il browser le carica su richiesta da /report/<id>/vms.
+    """
+    template = get_environment().get_template("report.html")
+    return template.render(**_context(data, report_id, filename, custom, custom_title, custom_date, inline_tables))
+
+
+def write_report(path, data: dict, report_id: str, filename: str, custom: dict = None, custom_title: str = "",
+                 custom_date: str = "", inline_tables: bool = True, precompress: bool = False,
+                 bytecode_cache_dir: Optional[str] = None):
+    """
+    Come build_report, ma scrive l'HTML direttamente in path man mano che il
+    template lo produce, senza tenere in memoria il documento intero.
+    Con precompress=True scrive nello stesso passaggio anche le copie
+    compresse path + ".br" e path + ".gz".
+    """
+    path = Path(path)
+    template = get_environment(bytecode_cache_dir).get_template("report.html")
+    context = _context(data, report_id, filename, custom, custom_title, custom_date, inline_tables)
+
+    targets = [path] + [path.with_name(path.name + suffix) for _, suffix in ENCODINGS]
+    tmps = [t.with_name(f".{t.name}.{os.getpid()}.tmp") for t in targets]
+    if not precompress:
+        targets, tmps = targets[:1], tmps[:1]
+    try:
+        with ExitStack() as stack:
+            sinks = [stack.enter_context(open(tmp, "wb")) for tmp in tmps]
+            if precompress:
+                html, br, gz = sinks
+                br = _BrotliWriter(br)
+                stack.callback(br.close)
+                gz = stack.enter_context(
+                    gzip.GzipFile(filename=path.name, mode="wb", fileobj=gz, compresslevel=GZIP_LEVEL, mtime=0))
+                sinks = [html, br, gz]
+
+            # I frammenti prodotti dal template sono piccoli: si scrivono a blocchi
+            buffer, size = [], 0
+            for chunk in template.generate(**context):
+                buffer.append(chunk)
+                size += len(chunk)
+                if size >= WRITE_BUFFER:
+                    block = "".join(buffer).encode("utf-8")
+                    for sink in sinks:
+                        sink.write(block)
+                    buffer, size = [], 0
+            block = "".join(buffer).encode("utf-8")
+            for sink in sinks:
+                sink.write(block)
+    except BaseException:
+        for tmp in tmps:
+            tmp.unlink(missing_ok=True)
+        raise
+
+    # Le copie compresse prima dell'originale: chi vede il nuovo report.html le trova già aggiornate
+    for tmp, target in reversed(list(zip(tmps, targets))):
+        os.replace(tmp, target)
+    if not precompress:
+        for _, suffix in ENCODINGS:
+            path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+
+def write_print_parts(folder, data: dict, report_id: str, filename: str, custom: dict = None, custom_title: str = "",
+                      custom_date: str = "", bytecode_cache_dir: Optional[str] = None) -> list:
+    """
+    Scrive in folder/print le parti del report da stampare (riepilogo e un
+    documento per datacenter), che il PDF impagina in parallelo.
+    Restituisce i percorsi nell'ordine del report.
+    """
+    template = get_environment(bytecode_cache_dir).get_template("report_print.html")
+    context = _context(data, report_id, filename, custom, custom_title, custom_date, inline_tables=False)
+    parts = [("riepilogo", {"kind": "summary"})]
+    for i, dc_name in enumerate(data["datacenters"]):
+        parts.append(("datacenter", {"kind": "datacenter", "name": dc_name, "first": i == 0}))
+
+    folder = Path(folder) / PRINT_DIR
+    tmp_folder = folder.with_name(f".{folder.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_folder, ignore_errors=True)
+    tmp_folder.mkdir(parents=True)
+    paths = []
+    for i, (name, part) in enumerate(parts):
+        path = tmp_folder / f"{i:03d}-{name}.html"
+        path.write_text(template.render(**context, part=part), encoding="utf-8")
+        paths.append(folder / path.name)
+    # Sostituzione in blocco: chi genera il PDF non vede mai parti di versioni diverse
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(tmp_folder, folder)
+    return paths
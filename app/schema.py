@@ -0,0 +1,185 @@
+"""
+Registro degli schemi dei fogli vInfo e vHost.
+L'intestazione di un foglio viene ridotta a un'impronta; per ogni impronta
+la corrispondenza campo -> colonna e le unità dichiarate nei nomi delle
+colonne si calcolano una sola volta e restano in cache.
+Le unità si decidono per colonna, mai per valore: dal nome della colonna se
+la dichiara (MiB/MB, GiB/GB), dal layout RVTools riconosciuto per le colonne
+che non la dichiarano ("Memory", "# Memory": sempre MiB); solo per i layout
+sconosciuti dalla mediana dei valori positivi dell'intera colonna.
+La conversione è un'unica operazione vettoriale.
+Le intestazioni che non corrispondono a un layout RVTools noto hanno layout
+None; i campi mancanti sono segnalati separando quelli facoltativi.
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+
+import numpy as np
+
+
+# ---- Colonne accettate per ogni campo (match case-insensitive) ----
+VINFO_FIELDS = {
+    "VM": ["VM", "Name", "VM Name"],
+    "Powerstate": ["Powerstate", "Power State", "State"],
+    "Host": ["Host", "ESX Host", "ESXi Host"],
+    "Datacenter": ["Datacenter", "DC"],
+    "Cluster": ["Cluster"],
+    "CPUs": ["CPUs", "CPU", "vCPUs", "Num CPUs"],
+    "Memory": ["Memory", "Memory MB", "RAM MB", "Memory (MB)", "Memory MiB"],
+    "Disk gb": ["Provisioned MiB", "Disk MiB", "Disk GB", "Total disk (GB)", "Provisioned MB", "Disk (GB)"],
+    "In Use MB": ["In Use MiB", "In Use MB", "Used Space MB", "Used disk (MB)", "Disk usage (MB)"],
+    "OS": ["OS according to the VMware Tools", "OS", "Guest OS", "OS according to the configuration file"],
+    "UUID": ["VM UUID", "UUID", "Instance UUID"],
+}
+VHOST_FIELDS = {
+    "Host": ["Host", "Name"],
+    "Datacenter": ["Datacenter", "DC"],
+    "Cluster": ["Cluster"],
+    "CPUs": ["# CPU", "CPUs", "Num CPUs", "CPU"],
+    # Core fisici totali dell'host ("# CPU" conta i socket)
+    "Cores": ["# Cores", "Cores", "Num Cores", "CPU Cores", "# CPU Cores"],
+    "Memory": ["# Memory", "Memory GB", "Memory MB", "RAM"],
+}
+
+# ---- Campi facoltativi: la loro assenza non impoverisce il report ----
+# (UUID serve solo al diff; datacenter e cluster degli host si ricavano dalle VM,
+# senza core la pCPU del what-if ricade sui socket)
+OPTIONAL_FIELDS = {
+    "vInfo": ("UUID",),
+    "vHost": ("Datacenter", "Cluster", "Cores"),
+}
+
+# ---- Campi con unità: (unità del frame normalizzato, soglia per dedurla) ----
+# Senza unità nell'intestazione né layout noto la colonna è in MiB se la mediana
+# dei valori positivi supera la soglia, altrimenti in GB. Le soglie non scendono
+# sotto quella del parser originale per gli host (> 1000: MiB).
+VINFO_UNITS = {
+    "Memory": ("MiB", 1000),
+    "Disk gb": ("GB", 10000),
+    "In Use MB": ("GB", 10000),
+}
+VHOST_UNITS = {
+    "Memory": ("GB", 1000),
+}
+
+# ---- Layout noti: campo -> intestazioni usate da quella versione di RVTools ----
+KNOWN_LAYOUTS = {
+    "vInfo": {
+        "RVTools 4.x": {
+            "VM": ["VM"], "Powerstate": ["Powerstate"], "Host": ["Host"], "Datacenter": ["Datacenter"],
+            "Cluster": ["Cluster"], "CPUs": ["CPUs"], "Memory": ["Memory"], "Disk gb": ["Provisioned MiB"],
+            "In Use MB": ["In Use MiB"],
+            "OS": ["OS according to the VMware Tools", "OS according to the configuration file"],
+        },
+        "RVTools 3.x": {
+            "VM": ["VM"], "Powerstate": ["Powerstate"], "Host": ["Host"], "Datacenter": ["Datacenter"],
+            "Cluster": ["Cluster"], "CPUs": ["CPUs"], "Memory": ["Memory"], "Disk gb": ["Provisioned MB"],
+            "In Use MB": ["In Use MB"],
+            "OS": ["OS according to the VMware Tools", "OS according to the configuration file", "OS"],
+        },
+    },
+    "vHost": {
+        "RVTools 3.x/4.x": {
+            "Host": ["Host"], "Datacenter": ["Datacenter"], "Cluster": ["Cluster"], "CPUs": ["# CPU"],
+            "Cores": ["# Cores"], "Memory": ["# Memory"],
+        },
+    },
+}
+
+# ---- Unità delle intestazioni RVTools che non la dichiarano nel nome ----
+# Valgono solo se l'intestazione corrisponde a un layout noto
+LAYOUT_UNITS = {
+    "vInfo": {"memory": "MiB"},
+    "vHost": {"# memory": "MiB"},
+}
+
+SHEETS = {"vInfo": (VINFO_FIELDS, VINFO_UNITS), "vHost": (VHOST_FIELDS, VHOST_UNITS)}
+MIB_UNIT = re.compile(r"\b(mib|mb)\b")
+GB_UNIT = re.compile(r"\b(gib|gb)\b")
+# Divisore per passare dall'unità della colonna a quella del frame (potenze di due: esatte)
+DIVISORS = {("MiB", "GB"): 1024, ("GB", "MiB"): 1 / 1024}
+
+
+def fingerprint(header) -> str:
+    """Impronta dell'intestazione: colonne normalizzate, nell'ordine del foglio."""
+    normalized = "\x1f".join(str(h).strip().lower() for h in header)
+    return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+
+
+def _header_unit(column: str):
+    name = column.lower()
+    if MIB_UNIT.search(name):
+        return "MiB"
+    if GB_UNIT.search(name):
+        return "GB"
+    return None
+
+
+class SheetSchema:
+    """Corrispondenza campo -> colonna, unità dichiarate e layout di un'intestazione."""
+
+    def __init__(self, kind: str, header: tuple):
+        fields, units = SHEETS[kind]
+        # Una sola mappa per tutte le ricerche; a parità di nome vale l'ultima colonna
+        lower = {h.lower().strip(): h for h in header}
+        self.kind = kind
+        self.fingerprint = fingerprint(header)
+        self.columns = {
+            key: next((lower[c.lower()] for c in candidates if c.lower() in lower), None)
+            for key, candidates in fields.items()
+        }
+        absent = [key for key, col in self.columns.items() if col is None]
+        self.missing = [key for key in absent if key not in OPTIONAL_FIELDS[kind]]
+        self.missing_optional = [key for key in absent if key in OPTIONAL_FIELDS[kind]]
+        self.layout = next((name for name, layout in KNOWN_LAYOUTS[kind].items() if self._matches(layout)), None)
+        fixed = LAYOUT_UNITS[kind] if self.layout else {}
+        self.declared = {
+            key: _header_unit(self.columns[key]) or fixed.get(self.columns[key].lower())
+            for key in units if self.columns[key]
+        }
+
+    def _matches(self, layout: dict) -> bool:
+        return all(
+            self.columns[key] is not None and self.columns[key].lower() in {h.lower() for h in headers}
+            for key, headers in layout.items()
+        )
+
+    def unit(self, key: str, values: np.ndarray) -> str:
+        """Unità della colonna del campo: dichiarata (nome o layout noto) o dedotta dai valori."""
+        target, threshold = SHEETS[self.kind][1][key]
+        if self.declared.get(key):
+            return self.declared[key]
+        positive = values[values > 0]
+        if not len(positive):
+            return target
+        return "MiB" if np.median(positive) > threshold else "GB"
+
+    def convert(self, key: str, values: np.ndarray) -> tuple:
+        """(valori nell'unità del frame, unità della colonna)."""
+        unit = self.unit(key, values)
+        divisor = DIVISORS.get((unit, SHEETS[self.kind][1][key][0]))
+        return (values / divisor if divisor else values), unit
+
+    def describe(self, units: dict) -> dict:
+        """Riepilogo per meta.json: layout riconosciuto, colonne usate, unità e campi mancanti (obbligatori e facoltativi)."""
+        return {
+            "fingerprint": self.fingerprint,
+            "layout": self.layout,
+            "columns": {key: col for key, col in self.columns.items() if col},
+            "units": units,
+            "inferred": sorted(key for key in units if not self.declared.get(key)),
+            "missing": self.missing,
+            "missing_optional": self.missing_optional,
+        }
+
+
+@lru_cache(maxsize=64)
+def _resolve(kind: str, header: tuple) -> SheetSchema:
+    return SheetSchema(kind, header)
+
+
+def resolve(kind: str, header) -> SheetSchema:
+    """Schema di un'intestazione di vInfo o vHost, calcolato una volta per impronta."""
+    return _resolve(kind, tuple(str(h).strip() for h in header))
@@ -0,0 +1,318 @@
+"""
+Indice di ricerca su tutti i report conservati (SQLite, DATA_DIR/search.sqlite3).
+Ogni valore distinto di nome VM, host, cluster, datacenter e sistema operativo
+(grezzo e semplificato) è un termine, indicizzato per sottostringa con FTS5
+(tokenizer trigram); per ogni termine le postings dicono in quali report
+compare e con quante VM, e la tabella vms tiene le righe di ogni report come
+id di termini, per rispondere a "su quale host era la VM X a marzo".
+Un report viene indicizzato quando diventa pronto e rimosso insieme ai suoi
+file; i termini che non compaiono più in nessun report vengono eliminati.
+"""
+
+import re
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from fleet import estate_name
+
+
+# Campi indicizzati: nome del campo -> colonna del frame VM
+FIELDS = {
+    "vm": "name",
+    "host": "host",
+    "cluster": "cluster",
+    "datacenter": "datacenter",
+    "os": "os",
+    "simple_os": "simple_os",
+}
+MODES = ("substring", "prefix")
+# Sotto i 3 caratteri il trigram non si applica: scansione dei soli termini
+MIN_TRIGRAM = 3
+MAX_TERMS = 500
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 2000
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    key       INTEGER PRIMARY KEY,
+    report_id TEXT NOT NULL UNIQUE,
+    created   TEXT NOT NULL,
+    estate    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_created ON reports (created);
+CREATE TABLE IF NOT EXISTS terms (
+    id    INTEGER PRIMARY KEY,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    UNIQUE (field, value)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS terms_fts USING fts5(
+    value, content='terms', content_rowid='id', tokenize='trigram'
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term   INTEGER NOT NULL,
+    report INTEGER NOT NULL,
+    vms    INTEGER NOT NULL,
+    PRIMARY KEY (term, report)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_report ON postings (report);
+CREATE TABLE IF NOT EXISTS vms (
+    report     INTEGER NOT NULL,
+    vm         INTEGER NOT NULL,
+    host       INTEGER,
+    cluster    INTEGER,
+    datacenter INTEGER,
+    os         INTEGER,
+    simple_os  INTEGER,
+    powered_on INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS vms_report ON vms (report, vm);
+"""
+
+
+def parse_query(args) -> dict:
+    """Parametri di /search validati; ValueError se non validi."""
+    q = args.get("q", "").strip()
+    if not q:
+        raise ValueError("Parametro q obbligatorio")
+    field = args.get("field", "") or None
+    if field is not None and field not in FIELDS:
+        raise ValueError(f"Campo non supportato: {field}")
+    mode = args.get("mode", "substring")
+    if mode not in MODES:
+        raise ValueError(f"Modalità non supportata: {mode}")
+    since, until = args.get("since", "") or None, args.get("until", "") or None
+    for value in (since, until):
+        if value is not None and not DATE_RE.match(value):
+            raise ValueError(f"Data non valida (AAAA-MM-GG): {value}")
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("limit deve essere un intero") from None
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit deve essere tra 1 e {MAX_LIMIT}")
+    return {"q": q, "field": field, "mode": mode, "since": since, "until": until, "limit": limit}
+
+
+def _placeholders(values) -> str:
+    return ", ".join("?" for _ in values)
+
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Una connessione per operazione, come il catalogo
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ── Scrittura ────────────────────────────────────────────────────────────
+    def add(self, meta: dict, vms: pd.DataFrame):
+        """Indicizza (o reindicizza) le VM di un report pronto a partire dal suo meta.json."""
+        with self._connect() as conn:
+            self._remove(conn, meta["id"])
+            key = conn.execute(
+                "INSERT INTO reports (report_id, created, estate) VALUES (?, ?, ?)",
+                (meta["id"], meta["created"], estate_name(meta)),
+            ).lastrowid
+            # I termini nuovi hanno id oltre il massimo attuale: solo quelli vanno in FTS
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM terms").fetchone()[0]
+            columns = {}
+            for field, column in FIELDS.items():
+                codes, uniques = pd.factorize(vms[column].to_numpy(dtype=object))
+                values = [str(v) for v in uniques]
+                conn.executemany("INSERT OR IGNORE INTO terms (field, value) VALUES (?, ?)",
+                                 ((field, v) for v in values if v))
+                ids = self._term_ids(conn, field, values)
+                term_ids = np.array([ids.get(v, -1) for v in values] + [-1], dtype=np.int64)
+                columns[field] = term_ids[codes]
+                # Postings: numero di VM del report per ogni termine
+                counts = np.bincount(codes[codes >= 0], minlength=len(values))
+                conn.executemany("INSERT INTO postings (term, report, vms) VALUES (?, ?, ?)",
+                                 ((int(term_ids[i]), key, int(counts[i])) for i in range(len(values))
+                                  if term_ids[i] >= 0))
+            conn.execute("INSERT INTO terms_fts (rowid, value) SELECT id, value FROM terms WHERE id > ?", (last_id,))
+
+            on = (vms["power_state"].to_numpy() == "poweredon").astype(np.int64)
+            rows = np.column_stack([np.full(len(vms), key, dtype=np.int64), *columns.values(), on])
+            conn.executemany(
+                "INSERT INTO vms (report, vm, host, cluster, datacenter, os, simple_os, powered_on) "
+                "VALUES (?, ?, NULLIF(?, -1), NULLIF(?, -1), NULLIF(?, -1), NULLIF(?, -1), NULLIF(?, -1), ?)",
+                rows.tolist(),
+            )
+
+    @staticmethod
+    def _term_ids(conn, field: str, values: list) -> dict:
+        ids = {}
+        # A blocchi: limite sul numero di parametri di SQLite
+        for start in range(0, len(values), 500):
+            chunk = [v for v in values[start:start + 500] if v]
+            if chunk:
+                ids.update(conn.execute(
+                    f"SELECT value, id FROM terms WHERE field = ? AND value IN ({_placeholders(chunk)})",
+                    (field, *chunk),
+                ).fetchall())
+        return ids
+
+    def delete(self, report_id: str):
+        """Rimuove un report dall'indice, con i termini rimasti senza report."""
+        with self._connect() as conn:
+            self._remove(conn, report_id)
+
+    @staticmethod
+    def _remove(conn, report_id: str):
+        row = conn.execute("SELECT key FROM reports WHERE report_id = ?", (report_id,)).fetchone()
+        if row is None:
+            return
+        key = row["key"]
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS orphans (id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM orphans")
+        conn.execute("INSERT INTO orphans SELECT term FROM postings WHERE report = ?", (key,))
+        conn.execute("DELETE FROM postings WHERE report = ?", (key,))
+        conn.execute("DELETE FROM vms WHERE report = ?", (key,))
+        conn.execute("DELETE FROM reports WHERE key = ?", (key,))
+        conn.execute("DELETE FROM orphans WHERE id IN (SELECT term FROM postings WHERE term IN orphans)")
+        # Tabella FTS con contenuto esterno: la cancellazione vuole il valore indicizzato
+        conn.execute("INSERT INTO terms_fts (terms_fts, rowid, value) "
+                     "SELECT 'delete', id, value FROM terms WHERE id IN orphans")
+        conn.execute("DELETE FROM terms WHERE id IN orphans")
+
+    def indexed(self) -> set:
+        """Id dei report presenti nell'indice."""
+        with self._connect() as conn:
+            return {r["report_id"] for r in conn.execute("SELECT report_id FROM reports")}
+
+    # ── Ricerca ──────────────────────────────────────────────────────────────
+    def _match_terms(self, conn, q: str, field: Optional[str], mode: str) -> tuple:
+        needle = q.lower()
+        if len(q) >= MIN_TRIGRAM:
+            # Frase FTS5: con il trigram corrisponde a qualunque sottostringa
+            rows = conn.execute(
+                "SELECT t.id, t.field, t.value FROM terms_fts f JOIN terms t ON t.id = f.rowid "
+                "WHERE terms_fts MATCH ?",
+                ('"' + q.replace('"', '""') + '"',),
+            )
+        else:
+            rows = conn.execute("SELECT id, field, value FROM terms WHERE instr(lower(value), ?) > 0", (needle,))
+        terms = {}
+        for row in rows:
+            if field and row["field"] != field:
+                continue
+            if mode == "prefix" and not row["value"].lower().startswith(needle):
+                continue
+            if len(terms) == MAX_TERMS:
+                return terms, True
+            terms[row["id"]] = (row["field"], row["value"])
+        return terms, False
+
+    def search(self, q: str, field: Optional[str] = None, mode: str = "substring", since: Optional[str] = None,
+               until: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> dict:
+        """
+        Termini che corrispondono a q e, per ognuno e per ambiente, prima e
+        ultima presenza (present False: assente dall'ultimo report
+        dell'ambiente); poi le VM corrispondenti, dal report più recente, al
+        massimo limit. since/until (AAAA-MM-GG) limitano i report per data.
+        """
+        where, params = [], []
+        if since:
+            where.append("r.created >= ?")
+            params.append(since)
+        if until:
+            # until incluso: tutto il giorno
+            where.append("r.created < ?")
+            params.append(until + "\x7f")
+        dates = (" AND " + " AND ".join(where)) if where else ""
+
+        with self._connect() as conn:
+            terms, truncated = self._match_terms(conn, q, field, mode)
+            ids = list(terms)
+            latest = {r["estate"]: r["created"] for r in conn.execute(
+                "SELECT estate, MAX(created) AS created FROM reports GROUP BY estate")}
+            matches, report_keys = [], []
+            if ids:
+                for row in conn.execute(
+                    "SELECT p.term, r.estate, COUNT(*) AS reports, SUM(p.vms) AS vms, MIN(r.created) AS first_seen, "
+                    "MAX(r.created || ' ' || r.report_id) AS last "
+                    f"FROM postings p JOIN reports r ON r.key = p.report WHERE p.term IN ({_placeholders(ids)}){dates} "
+                    "GROUP BY p.term, r.estate",
+                    (*ids, *params),
+                ):
+                    last_seen, last_report = row["last"].rsplit(" ", 1)
+                    term_field, value = terms[row["term"]]
+                    matches.append({
+                        "field": term_field,
+                        "value": value,
+                        "estate": row["estate"],
+                        "reports": row["reports"],
+                        "vms": row["vms"],
+                        "first_seen": row["first_seen"],
+                        "last_seen": last_seen,
+                        "last_report_id": last_report,
+                        "present": last_seen == latest[row["estate"]],
+                    })
+                report_keys = conn.execute(
+                    f"SELECT DISTINCT r.key, r.report_id, r.created, r.estate FROM postings p "
+                    f"JOIN reports r ON r.key = p.report WHERE p.term IN ({_placeholders(ids)}){dates} "
+                    "ORDER BY r.created DESC",
+                    (*ids, *params),
+                ).fetchall()
+            hits = self._hits(conn, terms, report_keys, limit)
+
+        matches.sort(key=lambda m: (m["field"], m["value"].lower(), m["estate"].lower()))
+        return {
+            "q": q, "field": field, "mode": mode, "since": since, "until": until,
+            "matches": matches,
+            "terms_truncated": truncated,
+            "reports": len(report_keys),
+            "hits": hits,
+            "hits_truncated": len(hits) == limit,
+        }
+
+    @staticmethod
+    def _hits(conn, terms: dict, reports: list, limit: int) -> list:
+        """Righe VM dei report (dal più recente) che contengono uno dei termini."""
+        by_field = {}
+        for term_id, (field, _) in terms.items():
+            by_field.setdefault(field, []).append(term_id)
+        hits = []
+        for report in reports:
+            if len(hits) >= limit:
+                break
+            # Per il nome VM l'indice (report, vm); per gli altri campi le righe del solo report
+            cond = " OR ".join(f"v.{field} IN ({_placeholders(ids)})" for field, ids in by_field.items())
+            rows = conn.execute(
+                "SELECT tv.value AS name, th.value AS host, tc.value AS cluster, td.value AS datacenter, "
+                "tos.value AS os, ts.value AS simple_os, v.powered_on FROM vms v "
+                "JOIN terms tv ON tv.id = v.vm "
+                "LEFT JOIN terms th ON th.id = v.host LEFT JOIN terms tc ON tc.id = v.cluster "
+                "LEFT JOIN terms td ON td.id = v.datacenter LEFT JOIN terms tos ON tos.id = v.os "
+                "LEFT JOIN terms ts ON ts.id = v.simple_os "
+                f"WHERE v.report = ? AND ({cond}) ORDER BY tv.value LIMIT ?",
+                (report["key"], *(i for ids in by_field.values() for i in ids), limit - len(hits)),
+            )
+            for row in rows:
+                hits.append({
+                    "report_id": report["report_id"],
+                    "created": report["created"],
+                    "estate": report["estate"],
+                    **{k: row[k] or "" for k in ("name", "host", "cluster", "datacenter", "os", "simple_os")},
+                    "power_state": "poweredon" if row["powered_on"] else "poweredoff",
+                })
+        return hits
@@ -0,0 +1,250 @@
+"""
+Sezioni opzionali del report alimentate dai fogli vSnapshot, vPartition e
+vDisk. Questi fogli, spesso i più voluminosi dell'export, non vengono letti
+durante l'upload: ogni sezione legge il proprio foglio solo alla prima
+richiesta e salva il risultato in JSON nella cartella del report.
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aggregation import EMPTY_LABEL
+from parser import find_col, float_column, str_column
+from xlsx_reader import XlsxReader
+
+
+SECTIONS_VERSION = 1
+SECTIONS_DIR = "sections"
+# Elementi mostrati nelle liste delle sezioni (i totali restano completi)
+LIST_LIMIT = 100
+# Sotto questa percentuale di spazio libero una partizione è segnalata
+LOW_FREE_PCT = 10
+# Fasce di età degli snapshot, in giorni
+SNAPSHOT_AGE_BUCKETS = ((7, "< 7 giorni"), (30, "7-30 giorni"), (90, "30-90 giorni"), (None, "> 90 giorni"))
+
+COMMON_COLS = {
+    "VM": ["VM", "Name", "VM Name"],
+    "Datacenter": ["Datacenter", "DC"],
+    "Cluster": ["Cluster"],
+    "Host": ["Host", "ESX Host", "ESXi Host"],
+}
+SNAPSHOT_COLS = {
+    "Name": ["Name", "Snapshot", "Snapshot Name"],
+    "Date": ["Date / time", "Date/time", "Date", "Created"],
+    "Size": ["Size MiB (total)", "Size MB (total)", "Size MiB (vmsn)", "Size MB (vmsn)", "Size MiB"],
+    "Description": ["Description"],
+}
+PARTITION_COLS = {
+    "Disk": ["Disk", "Partition", "Path"],
+    "Capacity": ["Capacity MiB", "Capacity MB"],
+    "Consumed": ["Consumed MiB", "Consumed MB"],
+    "Free": ["Free MiB", "Free MB"],
+}
+DISK_COLS = {
+    "Disk": ["Disk", "Label"],
+    "Capacity": ["Capacity MiB", "Capacity MB"],
+    "Thin": ["Thin"],
+    "Mode": ["Disk Mode", "Mode"],
+}
+
+
+def _columns(df: pd.DataFrame, spec: dict) -> dict:
+    return {key: find_col(df, candidates) for key, candidates in {**COMMON_COLS, **spec}.items()}
+
+
+def _base_frame(df: pd.DataFrame, cols: dict) -> pd.DataFrame:
+    n = len(df)
+    label = lambda key: str_column(df, cols[key], n).replace("", EMPTY_LABEL).to_numpy(dtype=object)
+    return pd.DataFrame({
+        "vm": str_column(df, cols["VM"], n).to_numpy(dtype=object),
+        "datacenter": label("Datacenter"),
+        "host": label("Host"),
+    })
+
+
+def _gb(df: pd.DataFrame, col, n) -> np.ndarray:
+    return float_column(df, col, n) / 1024
+
+
+def _records(frame: pd.DataFrame) -> list:
+    return json.loads(frame.round(2).to_json(orient="records", date_format="iso"))
+
+
+def _dates(values: pd.Series) -> pd.Series:
+    """Date di Excel: numeri seriali (celle data) oppure testo."""
+    numeric = pd.to_numeric(values, errors="coerce")
+    serial = pd.to_datetime(numeric, unit="D", origin="1899-12-30", errors="coerce")
+    text = pd.to_datetime(values.where(numeric.isna()).astype(str), errors="coerce", format="mixed")
+    return serial.fillna(text)
+
+
+# ── Calcolo delle sezioni ────────────────────────────────────────────────────
+def snapshots_section(df: pd.DataFrame, reference: datetime) -> dict:
+    df.columns = [str(c).strip() for c in df.columns]
+    cols, n = _columns(df, SNAPSHOT_COLS), len(df)
+    snaps = _base_frame(df, cols).assign(
+        name=str_column(df, cols["Name"], n).to_numpy(dtype=object),
+        description=str_column(df, cols["Description"], n).to_numpy(dtype=object),
+        size_gb=_gb(df, cols["Size"], n),
+        date=_dates(df[cols["Date"]]).to_numpy() if cols["Date"] else pd.NaT,
+    )
+    snaps = snaps[snaps["vm"] != ""].reset_index(drop=True)
+    age = (pd.Timestamp(reference) - snaps["date"]).dt.days
+    snaps["age_days"] = age.astype("Int64")
+
+    buckets, lower = [], -np.inf
+    for upper, label in SNAPSHOT_AGE_BUCKETS:
+        upper_value = np.inf if upper is None else upper
+        sel = snaps[(age >= lower) & (age < upper_value)]
+        buckets.append({"label": label, "count": len(sel), "size_gb": round(float(sel["size_gb"].sum()), 2)})
+        lower = upper_value
+
+    by_dc = snaps.groupby("datacenter", sort=True).agg(count=("vm", "size"), vms=("vm", "nunique"),
+                                                        size_gb=("size_gb", "sum")).reset_index()
+    largest = snaps.sort_values("size_gb", ascending=False, kind="stable").head(LIST_LIMIT)
+    oldest = snaps.dropna(subset=["date"]).sort_values("date", kind="stable").head(LIST_LIMIT)
+    dated = snaps["date"].dropna()
+    return {
+        "summary": {
+            "count": len(snaps),
+            "vms": int(snaps["vm"].nunique()),
+            "size_gb": round(float(snaps["size_gb"].sum()), 2),
+            "oldest": dated.min().isoformat() if len(dated) else None,
+            "undated": int(snaps["date"].isna().sum()),
+        },
+        "age_buckets": buckets,
+        "datacenters": _records(by_dc),
+        "largest": _records(largest),
+        "oldest": _records(oldest),
+    }
+
+
+def partitions_section(df: pd.DataFrame, reference: datetime = None) -> dict:
+    df.columns = [str(c).strip() for c in df.columns]
+    cols, n = _columns(df, PARTITION_COLS), len(df)
+    capacity = _gb(df, cols["Capacity"], n)
+    consumed = _gb(df, cols["Consumed"], n)
+    # Spazio libero dal foglio se presente, altrimenti per differenza
+    free = _gb(df, cols["Free"], n) if cols["Free"] else np.maximum(capacity - consumed, 0)
+    parts = _base_frame(df, cols).assign(
+        disk=str_column(df, cols["Disk"], n).to_numpy(dtype=object),
+        capacity_gb=capacity, consumed_gb=consumed, free_gb=free,
+    )
+    parts = parts[parts["vm"] != ""].reset_index(drop=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        parts["free_pct"] = np.where(parts["capacity_gb"] > 0, parts["free_gb"] / parts["capacity_gb"] * 100, np.nan)
+
+    low = parts[parts["free_pct"] < LOW_FREE_PCT].sort_values("free_pct", kind="stable")
+    by_dc = parts.groupby("datacenter", sort=True).agg(
+        partitions=("vm", "size"), vms=("vm", "nunique"), capacity_gb=("capacity_gb", "sum"),
+        consumed_gb=("consumed_gb", "sum"), free_gb=("free_gb", "sum"),
+    ).reset_index()
+    total_capacity = float(parts["capacity_gb"].sum())
+    return {
+        "summary": {
+            "partitions": len(parts),
+            "vms": int(parts["vm"].nunique()),
+            "capacity_gb": round(total_capacity, 2),
+            "consumed_gb": round(float(parts["consumed_gb"].sum()), 2),
+            "free_gb": round(float(parts["free_gb"].sum()), 2),
+            "used_pct": round(float(parts["consumed_gb"].sum()) / total_capacity * 100, 1) if total_capacity else 0,
+            "low_free": len(low),
+            "low_free_pct": LOW_FREE_PCT,
+        },
+        "datacenters": _records(by_dc),
+        "low_free": _records(low.head(LIST_LIMIT)),
+    }
+
+
+def disks_section(df: pd.DataFrame, reference: datetime = None) -> dict:
+    df.columns = [str(c).strip() for c in df.columns]
+    cols, n = _columns(df, DISK_COLS), len(df)
+    thin = str_column(df, cols["Thin"], n).str.lower().isin(["true", "1", "yes"]).to_numpy()
+    disks = _base_frame(df, cols).assign(
+        disk=str_column(df, cols["Disk"], n).to_numpy(dtype=object),
+        capacity_gb=_gb(df, cols["Capacity"], n),
+        thin=thin,
+        mode=str_column(df, cols["Mode"], n, default="").replace("", EMPTY_LABEL).to_numpy(dtype=object),
+    )
+    disks = disks[disks["vm"] != ""].reset_index(drop=True)
+    disks["thin_gb"] = np.where(disks["thin"], disks["capacity_gb"], 0.0)
+
+    by_dc = disks.groupby("datacenter", sort=True).agg(
+        disks=("vm", "size"), vms=("vm", "nunique"), capacity_gb=("capacity_gb", "sum"), thin_gb=("thin_gb", "sum"),
+    ).reset_index()
+    modes = disks.groupby("mode", sort=True).agg(disks=("vm", "size"), capacity_gb=("capacity_gb", "sum")).reset_index()
+    by_vm = disks.groupby(["vm", "datacenter", "host"], sort=False).agg(
+        disks=("disk", "size"), capacity_gb=("capacity_gb", "sum"),
+    ).reset_index().sort_values("capacity_gb", ascending=False, kind="stable")
+    return {
+        "summary": {
+            "disks": len(disks),
+            "vms": int(disks["vm"].nunique()),
+            "capacity_gb": round(float(disks["capacity_gb"].sum()), 2),
+            "thin": int(disks["thin"].sum()),
+            "thin_gb": round(float(disks["thin_gb"].sum()), 2),
+        },
+        "datacenters": _records(by_dc),
+        "modes": _records(modes),
+        "largest_vms": _records(by_vm.head(LIST_LIMIT)),
+    }
+
+
+# nome -> (fogli accettati, titolo, funzione di calcolo)
+SECTIONS = {
+    "snapshots": (["vSnapshot", "vsnapshot"], "Snapshot", snapshots_section),
+    "partitions": (["vPartition", "vpartition"], "Partizioni (spazio nel guest)", partitions_section),
+    "disks": (["vDisk", "vdisk"], "Dischi virtuali", disks_section),
+}
+
+
+def available_sections(sheet_names) -> list:
+    """(nome, titolo, foglio) delle sezioni per cui l'export contiene il foglio."""
+    names = set(sheet_names)
+    out = []
+    for key, (sheets, title, _) in SECTIONS.items():
+        sheet = next((s for s in sheets if s in names), None)
+        if sheet:
+            out.append((key, title, sheet))
+    return out
+
+
+def get_section(name: str, report_folder, upload_folder) -> dict:
+    """
+    Dati della sezione, calcolati alla prima richiesta leggendo solo il foglio
+    necessario e poi letti dal JSON salvato. KeyError se la sezione non
+    esiste, FileNotFoundError se il report, il file o il foglio mancano.
+    """
+    sheets, _, compute = SECTIONS[name]
+    report_folder = Path(report_folder)
+    path = report_folder / SECTIONS_DIR / f"{name}.v{SECTIONS_VERSION}.json"
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    xlsx = next((f for f in Path(upload_folder).glob("*.xlsx")), None)
+    if xlsx is None:
+        raise FileNotFoundError(f"File xlsx non disponibile per {report_folder.name}")
+    with XlsxReader(str(xlsx)) as xl:
+        sheet = xl.find_sheet(sheets)
+        if sheet is None:
+            raise FileNotFoundError(f"Foglio {sheets[0]} non presente nell'export")
+        df = xl.read_sheet(sheet)
+    # Età degli snapshot rispetto al momento del caricamento, non della richiesta
+    ts_file = report_folder / "timestamp.txt"
+    reference = datetime.fromisoformat(ts_file.read_text().strip()) if ts_file.exists() else datetime.now()
+    result = {"version": SECTIONS_VERSION, "sheet": sheet, "rows": len(df), **compute(df, reference)}
+
+    path.parent.mkdir(exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(result, f)
+    os.replace(tmp, path)
+    return result
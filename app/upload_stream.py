@@ -0,0 +1,76 @@
+"""
+Ricezione degli upload xlsx in streaming.
+Il parser multipart di Werkzeug scrive i blocchi del file man mano che
+arrivano in un file temporaneo nella cartella degli upload, calcolandone
+nello stesso passaggio lo SHA-256: niente copia in memoria o in /tmp, niente
+seconda lettura per l'hash. Il file viene poi spostato (rename) nella
+cartella del report, oppure eliminato a fine richiesta se rifiutato.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from flask import Request
+
+
+PART_PREFIX = ".upload-"
+PART_SUFFIX = ".part"
+
+
+class HashingFile:
+    def __init__(self, directory):
+        fd, path = tempfile.mkstemp(dir=directory, prefix=PART_PREFIX, suffix=PART_SUFFIX)
+        self.path = Path(path)
+        self.size = 0
+        self.committed = False
+        self._file = os.fdopen(fd, "w+b")
+        self._sha = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self._sha.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self) -> str:
+        return self._sha.hexdigest()
+
+    def __getattr__(self, name):
+        # read, readline, seek, tell, flush... come il file sottostante
+        return getattr(self._file, name)
+
+    def commit(self, dest) -> Path:
+        """Chiude il file e lo sposta in dest (stesso filesystem: nessuna copia)."""
+        self._file.close()
+        os.replace(self.path, dest)
+        self.committed = True
+        return Path(dest)
+
+    def close(self):
+        self._file.close()
+        if not self.committed:
+            self.path.unlink(missing_ok=True)
+
+
+class StreamingRequest(Request):
+    """Request di Flask che riceve i file .xlsx direttamente in upload_dir."""
+
+    upload_dir = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_dir and filename and filename.lower().endswith(".xlsx"):
+            return HashingFile(self.upload_dir)
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+def purge_parts(directory, max_age_hours: int = 24):
+    """Rimuove i file parziali rimasti da processi interrotti durante un upload."""
+    cutoff = time.time() - max_age_hours * 3600
+    for path in Path(directory).glob(f"{PART_PREFIX}*{PART_SUFFIX}"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass
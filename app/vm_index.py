@@ -0,0 +1,125 @@
+"""
+Indice delle VM di un report per l'API paginata /report/<id>/vms.
+L'inventario colonnare (inventory.npz) viene collegato nella cartella del
+report al momento dell'ingestione, insieme alle permutazioni di ordinamento
+precalcolate (vm_index.npz); filtri, ordinamento e paginazione avvengono
+sul server con operazioni vettoriali.
+"""
+
+import math
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aggregation import EMPTY_LABEL
+from parse_cache import load_inventory
+
+
+INVENTORY_FILE = "inventory.npz"
+INDEX_FILE = "vm_index.npz"
+
+SORT_KEYS = (
+    "name", "power_state", "host", "datacenter", "cluster", "num_vcpu", "memory_mb",
+    "disk_used_gb", "disk_provisioned_gb", "os", "simple_os",
+)
+DEFAULT_PER_PAGE = 100
+MAX_PER_PAGE = 1000
+
+
+def build_vm_index(vms: pd.DataFrame, path):
+    """Salva una permutazione stabile per ogni chiave di ordinamento."""
+    arrays = {}
+    for key in SORT_KEYS:
+        values = vms[key]
+        if values.dtype == object:
+            # Come il filtro sort di Jinja: confronto case-insensitive
+            values = values.astype(str).str.lower()
+        arrays[key] = np.argsort(values.to_numpy(), kind="stable").astype(np.int32)
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+class VMIndex:
+    def __init__(self, report_folder: Path):
+        vms = load_inventory(report_folder / INVENTORY_FILE)["vms"]
+        with np.load(report_folder / INDEX_FILE, allow_pickle=False) as npz:
+            self.orders = {key: npz[key] for key in SORT_KEYS}
+        self.vms = vms
+        self.on = vms["power_state"].to_numpy() == "poweredon"
+        self.dc_labels = np.where(vms["datacenter"].to_numpy() == "", EMPTY_LABEL, vms["datacenter"].to_numpy())
+        self.host_labels = np.where(vms["host"].to_numpy() == "", EMPTY_LABEL, vms["host"].to_numpy())
+
+    def query(self, dc=None, host=None, power=None, simple_os=None, family=None, q=None,
+              sort="name", page=1, per_page=DEFAULT_PER_PAGE) -> dict:
+        vms = self.vms
+        mask = np.ones(len(vms), dtype=bool)
+        if dc:
+            mask &= self.dc_labels == dc
+        if host:
+            mask &= self.host_labels == host
+        if power == "on":
+            mask &= self.on
+        elif power == "off":
+            mask &= ~self.on
+        if family:
+            mask &= vms["os_family"].to_numpy() == family
+        if simple_os:
+            mask &= vms["simple_os"].to_numpy() == simple_os
+        if q:
+            mask &= vms["name"].str.contains(q, case=False, regex=False).to_numpy()
+
+        descending = sort.startswith("-")
+        key = sort.lstrip("-")
+        if key not in self.orders:
+            raise ValueError(f"Ordinamento non supportato: {key}")
+        order = self.orders[key]
+        selected = order[mask[order]]
+        if descending:
+            selected = selected[::-1]
+
+        per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+        total = len(selected)
+        pages = max(1, math.ceil(total / per_page))
+        page = max(1, min(int(page), pages))
+        rows = vms.iloc[selected[(page - 1) * per_page: page * per_page]]
+
+        return {
+            "total": total,
+            "page": page,
+            "pages": pages,
+            "per_page": per_page,
+            "items": [
+                {
+                    "name": r.name,
+                    "power_state": r.power_state,
+                    "host": r.host,
+                    "datacenter": r.datacenter,
+                    "cluster": r.cluster,
+                    "num_vcpu": int(r.num_vcpu),
+                    "vram_gb": round(r.memory_mb / 1024, 2),
+                    "disk_used_gb": float(r.disk_used_gb),
+                    "disk_provisioned_gb": float(r.disk_provisioned_gb),
+                    "os": r.os,
+                    "simple_os": r.simple_os,
+                    "os_family": r.os_family,
+                }
+                for r in rows.itertuples(index=False)
+            ],
+        }
+
+
+@lru_cache(maxsize=8)
+def _load(report_folder: str, mtime_ns: int) -> VMIndex:
+    return VMIndex(Path(report_folder))
+
+
+def get_vm_index(report_folder) -> VMIndex:
+    """Indice del report, tenuto in memoria finché il file non cambia."""
+    report_folder = Path(report_folder)
+    return _load(str(report_folder), (report_folder / INDEX_FILE).stat().st_mtime_ns)
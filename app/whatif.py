@@ -0,0 +1,249 @@
+"""
+Simulazione di consolidamento e capacità sugli host del report.
+Le VM di ogni cluster vengono ridistribuite sugli host dello stesso cluster
+con first-fit decreasing su vCPU e vRAM, dati un rapporto di overcommit
+vCPU:pCPU, un rapporto sulla RAM e un numero di host tenuti di riserva
+(N+1, N+2...): il risultato dice quanti host servono e quanti si possono
+liberare.
+La capacità CPU di un host sono i suoi core fisici ("# Cores"); solo se il
+foglio vHost non li riporta si usano i socket ("# CPU"), che la
+sottostimano: il risultato indica quanti host sono stati contati così.
+Le VM di dimensione identica sono collocate insieme: per ogni taglia il
+first-fit è una somma cumulativa sulle capacità residue degli host, e un
+passo elabora la taglia di pari rango di tutti i cluster con operazioni
+vettoriali. I cicli sono quindi tanti quante le taglie distinte di un
+cluster, non quante le VM.
+"""
+
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aggregation import EMPTY_LABEL
+from diff import load_report_inventory
+from vm_index import INVENTORY_FILE
+
+
+DEFAULTS = {"cpu_ratio": 4.0, "mem_ratio": 1.0, "reserve": 1, "include_off": False}
+MAX_CPU_RATIO = 64
+MAX_MEM_RATIO = 4
+MAX_RESERVE = 8
+# Tolleranza sugli arrotondamenti della vRAM (GB) nel calcolo dei posti liberi
+EPSILON = 1e-9
+
+
+def parse_params(args) -> dict:
+    """Parametri della simulazione da un dizionario di stringhe (query string). ValueError se non validi."""
+    try:
+        cpu_ratio = float(args.get("cpu_ratio", DEFAULTS["cpu_ratio"]))
+        mem_ratio = float(args.get("mem_ratio", DEFAULTS["mem_ratio"]))
+        reserve = int(args.get("reserve", DEFAULTS["reserve"]))
+    except (TypeError, ValueError):
+        raise ValueError("Parametri numerici non validi") from None
+    if not 0 < cpu_ratio <= MAX_CPU_RATIO:
+        raise ValueError(f"Rapporto vCPU:pCPU fuori intervallo (0, {MAX_CPU_RATIO}]")
+    if not 0 < mem_ratio <= MAX_MEM_RATIO:
+        raise ValueError(f"Rapporto vRAM:RAM fuori intervallo (0, {MAX_MEM_RATIO}]")
+    if not 0 <= reserve <= MAX_RESERVE:
+        raise ValueError(f"Host di riserva fuori intervallo [0, {MAX_RESERVE}]")
+    include_off = str(args.get("include_off", "")).lower() in ("1", "true", "on", "yes")
+    return {"cpu_ratio": cpu_ratio, "mem_ratio": mem_ratio, "reserve": reserve, "include_off": include_off}
+
+
+class WhatIf:
+    def __init__(self, inventory: dict):
+        vms = inventory["vms"]
+        hosts = inventory["hosts"].drop_duplicates("name", keep="last").reset_index(drop=True)
+        # Come HostStats: datacenter e cluster mancanti in vHost presi dalla prima VM dell'host
+        first = vms.drop_duplicates("host").set_index("host")
+        host_dc, host_cluster = (
+            hosts[col].where(hosts[col] != "", hosts["name"].map(first[col])).fillna("").to_numpy(dtype=object)
+            for col in ("datacenter", "cluster")
+        )
+        label = lambda values: np.where(values == "", EMPTY_LABEL, values)
+        dcs = np.concatenate([label(vms["datacenter"].to_numpy(dtype=object)), label(host_dc)])
+        clusters = np.concatenate([label(vms["cluster"].to_numpy(dtype=object)), label(host_cluster)])
+        codes, groups = pd.factorize(pd.MultiIndex.from_arrays([dcs, clusters]))
+        self.groups = list(groups)
+        self.vm_group, self.host_group = codes[:len(vms)], codes[len(vms):]
+
+        self.vm_vcpu = vms["num_vcpu"].to_numpy(dtype=np.float64)
+        self.vm_mem = vms["memory_mb"].to_numpy(dtype=np.float64) / 1024
+        self.vm_on = vms["power_state"].to_numpy() == "poweredon"
+        # pCPU = core fisici; socket solo per gli host senza core (o inventari salvati prima della colonna)
+        cores = hosts["num_cores"].to_numpy(dtype=np.float64) if "num_cores" in hosts else np.zeros(len(hosts))
+        self.host_from_sockets = cores <= 0
+        self.host_cpu = np.where(self.host_from_sockets, hosts["num_cpu"].to_numpy(dtype=np.float64), cores)
+        self.host_mem = hosts["memory_gb"].to_numpy(dtype=np.float64)
+
+    def simulate(self, cpu_ratio=DEFAULTS["cpu_ratio"], mem_ratio=DEFAULTS["mem_ratio"],
+                 reserve=DEFAULTS["reserve"], include_off=DEFAULTS["include_off"]) -> dict:
+        n_groups = len(self.groups)
+        sel = np.ones(len(self.vm_on), dtype=bool) if include_off else self.vm_on
+
+        # Host con CPU e RAM note, dal più capiente: i primi `reserve` di ogni cluster restano liberi
+        known = (self.host_cpu > 0) & (self.host_mem > 0)
+        h_group = self.host_group[known]
+        h_sockets = self.host_from_sockets[known]
+        h_cpu, h_mem = self.host_cpu[known] * cpu_ratio, self.host_mem[known] * mem_ratio
+        order = np.lexsort((-h_cpu, -h_mem, h_group))
+        h_group, h_cpu, h_mem, h_sockets = h_group[order], h_cpu[order], h_mem[order], h_sockets[order]
+        h_count = np.bincount(h_group, minlength=n_groups)
+        h_rank = np.arange(len(h_group)) - np.repeat(np.cumsum(h_count) - h_count, h_count)
+        reserved = np.minimum(h_count, reserve)
+        packable = h_rank >= reserve
+        slot = (h_rank - reserve)[packable]
+
+        width = max(int((h_count - reserved).max(initial=0)), 1)
+        rem_cpu = np.zeros((n_groups, width))
+        rem_mem = np.zeros((n_groups, width))
+        valid = np.zeros((n_groups, width), dtype=bool)
+        rem_cpu[h_group[packable], slot] = h_cpu[packable]
+        rem_mem[h_group[packable], slot] = h_mem[packable]
+        valid[h_group[packable], slot] = True
+        cap_cpu, cap_mem = rem_cpu.copy(), rem_mem.copy()
+
+        # Taglie distinte per cluster, in ordine decrescente di quota sulla capacità media di un host
+        sizes = pd.DataFrame({"group": self.vm_group[sel], "vcpu": self.vm_vcpu[sel], "mem": self.vm_mem[sel]}) \
+            .groupby(["group", "vcpu", "mem"], sort=False).size().rename("count").reset_index()
+        packable_hosts = np.maximum(valid.sum(axis=1), 1)
+        avg_cpu = np.where(valid.any(axis=1), cap_cpu.sum(axis=1) / packable_hosts, 1)
+        avg_mem = np.where(valid.any(axis=1), cap_mem.sum(axis=1) / packable_hosts, 1)
+        g = sizes["group"].to_numpy()
+        share = np.maximum(sizes["vcpu"].to_numpy() / avg_cpu[g], sizes["mem"].to_numpy() / avg_mem[g])
+        # A parità di quota prima la RAM, poi le vCPU: l'ordine non dipende da quello delle righe
+        sizes = sizes.iloc[np.lexsort((-sizes["vcpu"].to_numpy(), -sizes["mem"].to_numpy(), -share, g))] \
+            .reset_index(drop=True)
+        rank = sizes.groupby("group", sort=False).cumcount().to_numpy()
+        g = sizes["group"].to_numpy()
+
+        depth = int(rank.max(initial=-1)) + 1
+        need = np.zeros((n_groups, depth))
+        need_cpu = np.zeros((n_groups, depth))
+        need_mem = np.zeros((n_groups, depth))
+        need[g, rank] = sizes["count"].to_numpy()
+        need_cpu[g, rank] = sizes["vcpu"].to_numpy()
+        need_mem[g, rank] = sizes["mem"].to_numpy()
+        placed = np.zeros((n_groups, depth))
+        used = np.zeros((n_groups, width), dtype=bool)
+
+        for r in range(depth):
+            rows = np.flatnonzero(need[:, r] > 0)
+            count = need[rows, r][:, None]
+            cpu, mem = need_cpu[rows, r][:, None], need_mem[rows, r][:, None]
+            free_cpu, free_mem = rem_cpu[rows], rem_mem[rows]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                fit_cpu = np.where(cpu > 0, np.floor(free_cpu / cpu + EPSILON), np.inf)
+                fit_mem = np.where(mem > 0, np.floor(free_mem / mem + EPSILON), np.inf)
+            fit = np.where(valid[rows], np.clip(np.minimum(fit_cpu, fit_mem), 0, count), 0)
+            # First-fit di `count` VM uguali: ogni host si riempie prima di passare al successivo
+            take = np.clip(count - (np.cumsum(fit, axis=1) - fit), 0, fit)
+            rem_cpu[rows] = free_cpu - take * cpu
+            rem_mem[rows] = free_mem - take * mem
+            used[rows] |= take > 0
+            placed[rows, r] = take.sum(axis=1)
+
+        state = {
+            "sel": sel, "h_group": h_group, "h_count": h_count, "h_sockets": h_sockets, "h_cpu": h_cpu, "h_mem": h_mem, "reserved": reserved,
+            "cap_cpu": cap_cpu, "cap_mem": cap_mem, "used": used,
+            "need": need, "need_cpu": need_cpu, "need_mem": need_mem, "placed": placed,
+        }
+        params = {"cpu_ratio": cpu_ratio, "mem_ratio": mem_ratio, "reserve": reserve, "include_off": include_off}
+        return self._result(state, params)
+
+    def _result(self, s: dict, params: dict) -> dict:
+        n_groups = len(self.groups)
+        total = lambda values: np.bincount(self.vm_group[s["sel"]], weights=values[s["sel"]], minlength=n_groups)
+        unplaced = s["need"] - s["placed"]
+        used_hosts = s["used"].sum(axis=1)
+        unplaced_vms = unplaced.sum(axis=1)
+        # Gli host di riserva servono solo ai cluster con VM collocate
+        needed = np.where(used_hosts > 0, used_hosts + s["reserved"], 0)
+        needed = np.where(unplaced_vms > 0, s["h_count"], needed)
+        pcpu = np.bincount(s["h_group"], weights=s["h_cpu"], minlength=n_groups) / params["cpu_ratio"]
+        pram = np.bincount(s["h_group"], weights=s["h_mem"], minlength=n_groups) / params["mem_ratio"]
+        used_cpu = np.where(s["used"], s["cap_cpu"], 0).sum(axis=1)
+        used_mem = np.where(s["used"], s["cap_mem"], 0).sum(axis=1)
+        placed_cpu = (s["placed"] * s["need_cpu"]).sum(axis=1)
+        placed_mem = (s["placed"] * s["need_mem"]).sum(axis=1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frame = pd.DataFrame({
+                "datacenter": [dc for dc, _ in self.groups],
+                "cluster": [cluster for _, cluster in self.groups],
+                "hosts": np.bincount(self.host_group, minlength=n_groups),
+                "hosts_known": s["h_count"],
+                # Host la cui pCPU sono i socket perché mancano i core
+                "hosts_pcpu_sockets": np.bincount(s["h_group"], weights=s["h_sockets"], minlength=n_groups),
+                "vms": np.bincount(self.vm_group[s["sel"]], minlength=n_groups),
+                "vcpu": total(self.vm_vcpu),
+                "vram_gb": total(self.vm_mem),
+                "pcpu": pcpu,
+                "pram_gb": pram,
+                "vcpu_per_pcpu": np.where(pcpu > 0, total(self.vm_vcpu) / pcpu, np.nan),
+                "hosts_needed": needed,
+                "reserve": s["reserved"],
+                "unplaced_vms": unplaced_vms,
+                "unplaced_vcpu": (unplaced * s["need_cpu"]).sum(axis=1),
+                "unplaced_vram_gb": (unplaced * s["need_mem"]).sum(axis=1),
+                "cpu_util_pct": np.where(used_cpu > 0, placed_cpu / used_cpu * 100, np.nan),
+                "mem_util_pct": np.where(used_mem > 0, placed_mem / used_mem * 100, np.nan),
+            })
+        frame["hosts_freed"] = np.where(frame["unplaced_vms"] > 0, 0, frame["hosts_known"] - frame["hosts_needed"])
+        int_cols = ["hosts", "hosts_known", "hosts_pcpu_sockets", "vms", "vcpu", "hosts_needed", "reserve", "unplaced_vms", "unplaced_vcpu",
+                    "hosts_freed"]
+        frame = frame[(frame["vms"] > 0) | (frame["hosts"] > 0)].astype({c: np.int64 for c in int_cols})
+        frame = frame.sort_values(["datacenter", "cluster"], kind="stable").reset_index(drop=True)
+
+        pcpu_total = float(frame["pcpu"].sum())
+        summary = {
+            "clusters": len(frame),
+            "hosts": int(frame["hosts"].sum()),
+            "hosts_known": int(frame["hosts_known"].sum()),
+            "hosts_pcpu_sockets": int(frame["hosts_pcpu_sockets"].sum()),
+            "pcpu_basis": _pcpu_basis(frame),
+            "vms": int(frame["vms"].sum()),
+            "vcpu": int(frame["vcpu"].sum()),
+            "vram_gb": round(float(frame["vram_gb"].sum()), 2),
+            "pcpu": round(pcpu_total, 2),
+            "pram_gb": round(float(frame["pram_gb"].sum()), 2),
+            "vcpu_per_pcpu": round(float(frame["vcpu"].sum()) / pcpu_total, 2) if pcpu_total else None,
+            "hosts_needed": int(frame["hosts_needed"].sum()),
+            "hosts_freed": int(frame["hosts_freed"].sum()),
+            "unplaced_vms": int(frame["unplaced_vms"].sum()),
+            "clusters_over_capacity": int((frame["unplaced_vms"] > 0).sum()),
+        }
+        return {"params": params, "summary": summary, "clusters": _records(frame)}
+
+
+def _pcpu_basis(frame: pd.DataFrame) -> str:
+    """"cores", "sockets" (nessun host con i core) o "mixed"."""
+    sockets, known = int(frame["hosts_pcpu_sockets"].sum()), int(frame["hosts_known"].sum())
+    if not sockets:
+        return "cores"
+    return "sockets" if sockets == known else "mixed"
+
+
+def _records(frame: pd.DataFrame) -> list:
+    # NaN (rapporti senza capacità nota) -> null nel JSON
+    return [{k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items()}
+            for row in frame.round(2).to_dict(orient="records")]
+
+
+@lru_cache(maxsize=8)
+def _load(report_folder: str, upload_folder: str, mtime_ns: int) -> WhatIf:
+    return WhatIf(load_report_inventory(report_folder, upload_folder))
+
+
+def get_whatif(report_folder, upload_folder) -> WhatIf:
+    """
+    Simulatore del report, tenuto in memoria finché l'inventario non cambia.
+    FileNotFoundError se mancano sia l'inventario sia il file xlsx.
+    """
+    path = Path(report_folder) / INVENTORY_FILE
+    if not path.exists():
+        # Report precedenti all'inventario colonnare: viene ricostruito dall'xlsx
+        load_report_inventory(report_folder, upload_folder)
+    return _load(str(report_folder), str(upload_folder), path.stat().st_mtime_ns)
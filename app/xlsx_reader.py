@@ -0,0 +1,254 @@
+"""
+Lettore XLSX in streaming.
+Apre lo zip del workbook, ricava l'elenco dei fogli dall'indice (workbook.xml)
+e legge riga per riga solo le parti XML dei fogli richiesti, senza caricare
+in memoria gli altri fogli (vDisk, vPartition, vNetwork, ...).
+"""
+
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+# Transitional e Strict OOXML
+MAIN_NS = (
+    "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "http://purl.oclc.org/ooxml/spreadsheetml/main",
+)
+
+
+def _tags(name: str) -> frozenset:
+    return frozenset(f"{{{ns}}}{name}" for ns in MAIN_NS) | {name}
+
+
+ROW, CELL, VALUE, INLINE, TEXT, RUN, SI, SHEET_DATA, SST = (
+    _tags(n) for n in ("row", "c", "v", "is", "t", "r", "si", "sheetData", "sst")
+)
+
+_COL_CACHE: Dict[str, int] = {}
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _col_index(ref: str) -> int:
+    """'A1' -> 0, 'AB12' -> 27."""
+    letters = ref.rstrip("0123456789")
+    idx = _COL_CACHE.get(letters)
+    if idx is None:
+        idx = 0
+        for ch in letters:
+            idx = idx * 26 + (ord(ch) - 64)
+        idx = _COL_CACHE[letters] = idx - 1
+    return idx
+
+
+def _cast_number(text: str):
+    # Stessa regola di openpyxl: intero se non ci sono decimali né esponente
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+
+def _iter_elements(f, tags: frozenset, parent_tags: frozenset) -> Iterator:
+    """
+    Elementi completi con tag in tags, staccati dal genitore (parent_tags)
+    dopo l'uso: clear() da solo lascerebbe gli elementi vuoti appesi alla
+    radice, e la memoria crescerebbe con il numero di righe.
+    """
+    parent = None
+    for event, elem in ET.iterparse(f, events=("start", "end")):
+        if event == "start":
+            if elem.tag in parent_tags:
+                parent = elem
+            continue
+        if elem.tag in tags:
+            yield elem
+            elem.clear()
+            if parent is not None:
+                parent.remove(elem)
+
+
+def _text_of(elem) -> str:
+    """Concatena i nodi <t> di un <si>/<is>, ignorando la fonetica (<rPh>)."""
+    parts = []
+    for child in elem:
+        if child.tag in TEXT:
+            parts.append(child.text or "")
+        elif child.tag in RUN:
+            for t in child:
+                if t.tag in TEXT:
+                    parts.append(t.text or "")
+    return "".join(parts)
+
+
+class XlsxReader:
+    """
+    Accesso in sola lettura ai fogli di un file .xlsx.
+    Le shared strings vengono risolte solo per gli indici effettivamente
+    usati dai fogli letti.
+    """
+
+    def __init__(self, filepath: str):
+        self.zf = zipfile.ZipFile(filepath)
+        self._sheet_paths = self._read_index()
+        self.sheet_names: List[str] = list(self._sheet_paths)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.zf.close()
+
+    def _read_index(self) -> Dict[str, str]:
+        rels = {}
+        with self.zf.open("xl/_rels/workbook.xml.rels") as f:
+            for rel in ET.parse(f).getroot():
+                target = rel.get("Target", "")
+                if target.startswith("/"):
+                    target = target.lstrip("/")
+                else:
+                    target = posixpath.normpath(posixpath.join("xl", target))
+                rels[rel.get("Id")] = target
+
+        sheets = {}
+        with self.zf.open("xl/workbook.xml") as f:
+            for elem in ET.parse(f).getroot().iter():
+                if _local(elem.tag) == "sheet":
+                    rid = elem.get(f"{{{REL_NS}}}id") or elem.get("id")
+                    if rid in rels:
+                        sheets[elem.get("name")] = rels[rid]
+        return sheets
+
+    def find_sheet(self, candidates: List[str]) -> Optional[str]:
+        return next((name for name in candidates if name in self._sheet_paths), None)
+
+    # ── Lettura righe ────────────────────────────────────────────────────────
+    def iter_rows(self, sheet_name: str, shared_refs: Optional[list] = None) -> Iterator[list]:
+        """
+        Genera le righe del foglio come liste di valori (None per le celle vuote).
+        Le celle con shared string restano None e la loro posizione
+        (riga, colonna, indice) viene aggiunta a shared_refs.
+        """
+        path = self._sheet_paths[sheet_name]
+        with self.zf.open(path) as f:
+            row_idx = 0
+            for elem in _iter_elements(f, ROW, SHEET_DATA):
+                values: list = []
+                for c in elem:
+                    if c.tag not in CELL:
+                        continue
+                    ref = c.get("r")
+                    col = _col_index(ref) if ref else len(values)
+                    if col > len(values):
+                        values.extend([None] * (col - len(values)))
+                    ctype = c.get("t")
+                    val = None
+                    if ctype == "inlineStr":
+                        for child in c:
+                            if child.tag in INLINE:
+                                val = _text_of(child)
+                    else:
+                        v = None
+                        for child in c:
+                            if child.tag in VALUE:
+                                v = child.text
+                        if v is not None:
+                            if ctype == "s":
+                                if shared_refs is not None:
+                                    shared_refs.append((row_idx, col, int(v)))
+                            elif ctype == "str":
+                                val = v
+                            elif ctype == "b":
+                                val = v == "1"
+                            elif ctype == "d":
+                                # Data ISO 8601: resta testo (le colonne lette sono numeri o stringhe)
+                                val = v
+                            elif ctype != "e":
+                                val = _cast_number(v)
+                    values.append(val)
+
+                yield values
+                row_idx += 1
+
+    def _shared_strings(self, needed: set) -> Dict[int, str]:
+        """Legge in streaming sharedStrings.xml tenendo solo gli indici richiesti."""
+        if not needed or "xl/sharedStrings.xml" not in self.zf.namelist():
+            return {}
+        out = {}
+        last = max(needed)
+        idx = 0
+        with self.zf.open("xl/sharedStrings.xml") as f:
+            for elem in _iter_elements(f, SI, SST):
+                if idx in needed:
+                    out[idx] = _text_of(elem)
+                idx += 1
+                if idx > last:
+                    break
+        return out
+
+    def read_sheets(self, sheet_names: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        Legge i fogli indicati (prima riga = intestazione, come header=0 di pandas)
+        con un solo passaggio sulle shared strings.
+        """
+        raw = {}
+        refs_by_sheet = {}
+        needed = set()
+        for name in sheet_names:
+            refs: list = []
+            raw[name] = list(self.iter_rows(name, refs))
+            refs_by_sheet[name] = refs
+            needed.update(i for _, _, i in refs)
+
+        strings = self._shared_strings(needed)
+        frames = {}
+        for name, rows in raw.items():
+            for r, c, i in refs_by_sheet[name]:
+                rows[r][c] = strings.get(i)
+            frames[name] = _to_frame(rows)
+        return frames
+
+    def read_header(self, sheet_name: str) -> list:
+        """Solo la prima riga del foglio: il resto dell'XML non viene letto."""
+        refs: list = []
+        header = next(self.iter_rows(sheet_name, refs), [])
+        strings = self._shared_strings({i for _, _, i in refs})
+        for _, c, i in refs:
+            header[c] = strings.get(i)
+        return header
+
+    def read_sheet(self, sheet_name: str) -> pd.DataFrame:
+        return self.read_sheets([sheet_name])[sheet_name]
+
+
+def _to_frame(rows: List[list]) -> pd.DataFrame:
+    if not rows:
+        return pd.DataFrame()
+    header, body = rows[0], rows[1:]
+    width = max([len(header)] + [len(r) for r in body])
+
+    # Nomi colonna come pandas: "Unnamed: N" per i vuoti, ".1", ".2" per i duplicati
+    columns, seen = [], {}
+    for i in range(width):
+        h = header[i] if i < len(header) else None
+        col = f"Unnamed: {i}" if h is None or h == "" else str(h)
+        if col in seen:
+            seen[col] += 1
+            col = f"{col}.{seen[col]}"
+        else:
+            seen[col] = 0
+        columns.append(col)
+
+    for r in body:
+        if len(r) < width:
+            r.extend([None] * (width - len(r)))
+    return pd.DataFrame(body, columns=columns)
@@ -0,0 +1,199 @@
+"""
+Generatore di workbook sintetici in formato RVTools per i benchmark.
+Scrive i fogli vInfo e vHost con le varianti di intestazione accettate da
+schema.py (VINFO_FIELDS, VHOST_FIELDS), un mix realistico di Guest OS e, a richiesta, fogli
+aggiuntivi voluminosi (vDisk, vPartition, vNetwork, vSnapshot) che il parser
+deve saltare.
+
+Uso: python bench/generate_workbook.py out.xlsx --vms 50000 --hosts 120 --datacenters 4
+"""
+
+import argparse
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook
+
+
+# Intestazioni vInfo: RVTools 4.x e varianti più vecchie o esportate a mano
+VINFO_VARIANTS = {
+    "rvtools4": {
+        "name": "VM", "power": "Powerstate", "cpu": "CPUs", "memory": "Memory",
+        "provisioned": "Provisioned MiB", "in_use": "In Use MiB", "datacenter": "Datacenter",
+        "cluster": "Cluster", "host": "Host", "os_config": "OS according to the configuration file",
+        "os_tools": "OS according to the VMware Tools", "uuid": "VM UUID",
+    },
+    "legacy": {
+        "name": "Name", "power": "Power State", "cpu": "Num CPUs", "memory": "Memory MB",
+        "provisioned": "Provisioned MB", "in_use": "In Use MB", "datacenter": "DC",
+        "cluster": "Cluster", "host": "ESX Host", "os_config": "Guest OS", "uuid": "UUID",
+    },
+    "gb": {
+        "name": "VM Name", "power": "State", "cpu": "vCPUs", "memory": "Memory (MB)",
+        "provisioned": "Disk GB", "in_use": "Used disk (MB)", "datacenter": "Datacenter",
+        "cluster": "Cluster", "host": "ESXi Host", "os_config": "OS",
+    },
+}
+VHOST_VARIANTS = {
+    "rvtools4": {"host": "Host", "datacenter": "Datacenter", "cluster": "Cluster", "cpu": "# CPU", "cores": "# Cores",
+                 "memory": "# Memory"},
+    "legacy": {"host": "Name", "datacenter": "DC", "cluster": "Cluster", "cpu": "CPUs", "cores": "Cores",
+               "memory": "Memory MB"},
+    "gb": {"host": "Host", "datacenter": "Datacenter", "cluster": "Cluster", "cpu": "Num CPUs", "cores": "Num Cores",
+           "memory": "Memory GB"},
+}
+# Colonne di contorno presenti nei veri export (non lette dal parser)
+VINFO_FILLER = ["Config status", "DNS Name", "Connection state", "Guest state", "Heartbeat",
+                "Consolidation Needed", "PowerOn", "Suspend time", "Creation date", "CBT", "NICs", "Disks",
+                "Annotation", "Folder", "Path", "VI SDK Server", "VI SDK UUID"]
+
+# (Guest OS secondo la configurazione, peso)
+GUEST_OS_MIX = [
+    ("Microsoft Windows Server 2019 (64-bit)", 22),
+    ("Microsoft Windows Server 2016 (64-bit)", 16),
+    ("Microsoft Windows Server 2022 (64-bit)", 12),
+    ("Microsoft Windows Server 2012 R2 (64-bit)", 6),
+    ("Microsoft Windows Server 2008 R2 (64-bit)", 2),
+    ("Microsoft Windows 10 (64-bit)", 4),
+    ("Red Hat Enterprise Linux 8 (64-bit)", 8),
+    ("Red Hat Enterprise Linux 9 (64-bit)", 4),
+    ("Red Hat Enterprise Linux 7 (64-bit)", 3),
+    ("Ubuntu Linux (64-bit)", 7),
+    ("CentOS 7 (64-bit)", 4),
+    ("Debian GNU/Linux 11 (64-bit)", 3),
+    ("SUSE Linux Enterprise 15 (64-bit)", 2),
+    ("Oracle Linux 8 (64-bit)", 2),
+    ("VMware Photon OS (64-bit)", 1),
+    ("Other 3.x or later Linux (64-bit)", 2),
+    ("FreeBSD 13 (64-bit)", 1),
+    ("Other (64-bit)", 1),
+]
+# Versioni più dettagliate riportate dai VMware Tools
+TOOLS_OS = {
+    "Red Hat Enterprise Linux 8 (64-bit)": "Red Hat Enterprise Linux 8.8 (Ootpa)",
+    "Red Hat Enterprise Linux 9 (64-bit)": "Red Hat Enterprise Linux 9.2 (Plow)",
+    "Ubuntu Linux (64-bit)": "Ubuntu 22.04.3 LTS",
+    "Debian GNU/Linux 11 (64-bit)": "Debian GNU/Linux 11 (bullseye)",
+}
+POWER_MIX = [("poweredOn", 78), ("poweredOff", 20), ("suspended", 2)]
+CPU_MIX = [(1, 10), (2, 35), (4, 30), (8, 17), (16, 6), (32, 2)]
+MEMORY_MIX = [(2048, 15), (4096, 30), (8192, 30), (16384, 15), (32768, 7), (65536, 3)]
+EXTRA_SHEETS = ("vDisk", "vPartition", "vNetwork", "vSnapshot")
+EXTRA_COLUMNS = {
+    "vDisk": ["Disk", "Capacity MiB", "Thin", "Disk Mode", "Path"],
+    "vPartition": ["Disk", "Capacity MiB", "Consumed MiB", "Free MiB", "Free %"],
+    "vNetwork": ["NIC label", "Network", "IPv4 Address"],
+    "vSnapshot": ["Name", "Description", "Date / time", "Size MiB (vmsn)", "Size MiB (total)"],
+}
+
+
+def _weighted(rng, mix, k):
+    values, weights = zip(*mix)
+    return rng.choices(values, weights=weights, k=k)
+
+
+def generate(path, vms=10000, hosts=40, datacenters=2, clusters_per_dc=3, variant="rvtools4",
+             extra_sheets=False, seed=0):
+    rng = random.Random(seed)
+    cols = VINFO_VARIANTS[variant]
+    hcols = VHOST_VARIANTS[variant]
+    mib = "MiB" in cols["provisioned"] or "MB" in cols["provisioned"]
+
+    # Topologia: host distribuiti sui datacenter, cluster per datacenter
+    topology = []
+    for h in range(hosts):
+        dc = f"DC-{h % datacenters + 1:02d}"
+        cluster = f"{dc}-CL{(h // datacenters) % clusters_per_dc + 1}"
+        topology.append((f"esx{h + 1:04d}.{dc.lower()}.example.local", dc, cluster))
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("vInfo")
+    header = [cols["name"], cols["power"], "Template", cols["cpu"], cols["memory"], cols["provisioned"],
+              cols["in_use"], cols["datacenter"], cols["cluster"], cols["host"], cols["os_config"]]
+    if "os_tools" in cols:
+        header.append(cols["os_tools"])
+    if "uuid" in cols:
+        header.append(cols["uuid"])
+    header += VINFO_FILLER
+    ws.append(header)
+
+    guest_os = _weighted(rng, GUEST_OS_MIX, vms)
+    power = _weighted(rng, POWER_MIX, vms)
+    cpus = _weighted(rng, CPU_MIX, vms)
+    memory = _weighted(rng, MEMORY_MIX, vms)
+    for i in range(vms):
+        host, dc, cluster = topology[rng.randrange(hosts)]
+        provisioned_gb = rng.choice([40, 60, 80, 100, 150, 250, 500, 1000, 2000]) * rng.uniform(1, 1.5)
+        used_gb = provisioned_gb * rng.uniform(0.1, 0.95)
+        on = power[i] == "poweredOn"
+        row = [f"vm-{dc.lower()}-{i:06d}", power[i], False, cpus[i], memory[i],
+               round(provisioned_gb * 1024 if mib else provisioned_gb, 2),
+               round(used_gb * 1024, 2), dc, cluster, host, guest_os[i]]
+        if "os_tools" in cols:
+            row.append(TOOLS_OS.get(guest_os[i], guest_os[i]) if on else "")
+        if "uuid" in cols:
+            row.append(str(uuid.UUID(int=rng.getrandbits(128))))
+        row += ["green", f"vm{i}.example.local", "connected", "running" if on else "notRunning", "green",
+                False, "2023-01-01 00:00", "", "2021-06-01 12:00", True, 1, rng.randint(1, 4),
+                "", f"/{dc}/vm", f"[ds-{rng.randrange(50):02d}] vm{i}/vm{i}.vmx", "vcenter.example.local",
+                "00000000-0000-0000-0000-000000000000"]
+        ws.append(row)
+
+    ws = wb.create_sheet("vHost")
+    ws.append([hcols["host"], hcols["datacenter"], hcols["cluster"], hcols["cpu"], hcols["cores"], hcols["memory"]])
+    for host, dc, cluster in topology:
+        mem_gb = rng.choice([256, 384, 512, 768, 960])
+        # "# CPU" sono i socket, "# Cores" i core fisici totali
+        sockets = rng.choice([2, 4])
+        cores = sockets * rng.choice([12, 16, 24, 32])
+        ws.append([host, dc, cluster, sockets, cores, mem_gb if hcols["memory"] == "Memory GB" else mem_gb * 1024])
+
+    if extra_sheets:
+        # Circa 3 righe per VM (uno snapshot ogni 4 VM), come negli export di ambienti reali
+        reference = datetime(2024, 6, 1)
+        for sheet in EXTRA_SHEETS:
+            ws = wb.create_sheet(sheet)
+            ws.append(["VM", "Powerstate"] + EXTRA_COLUMNS[sheet] + ["Datacenter", "Cluster", "Host"])
+            rows = vms // 4 if sheet == "vSnapshot" else vms * 3
+            for i in range(rows):
+                vm = i * 4 if sheet == "vSnapshot" else i // 3
+                host, dc, cluster = topology[vm % hosts]
+                capacity = rng.randint(10, 2000) * 1024
+                if sheet == "vDisk":
+                    extra = [f"Hard disk {i % 3 + 1}", capacity, rng.random() < 0.7,
+                             rng.choice(["persistent", "persistent", "independent_persistent"]),
+                             f"[ds-{i % 50:02d}] vm{vm}/vm{vm}_{i % 3}.vmdk"]
+                elif sheet == "vPartition":
+                    consumed = int(capacity * rng.uniform(0.2, 0.99))
+                    extra = [["C:\\", "D:\\", "/var"][i % 3], capacity, consumed, capacity - consumed,
+                             round((capacity - consumed) / capacity * 100)]
+                elif sheet == "vSnapshot":
+                    vmsn = rng.randint(0, 64)
+                    extra = [f"snap-{i}", "x" * rng.randint(0, 40), reference - timedelta(days=rng.randint(0, 400)),
+                             vmsn, vmsn + rng.randint(100, 80000)]
+                else:
+                    extra = [f"Network adapter {i % 3 + 1}", f"VLAN{rng.randint(1, 400)}",
+                             f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"]
+                ws.append([f"vm-{dc.lower()}-{vm:06d}", "poweredOn"] + extra + [dc, cluster, host])
+    wb.save(path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Genera un workbook RVTools sintetico.")
+    ap.add_argument("output", help="file .xlsx da creare")
+    ap.add_argument("--vms", type=int, default=10000, help="numero di VM (1k-200k)")
+    ap.add_argument("--hosts", type=int, default=40)
+    ap.add_argument("--datacenters", type=int, default=2)
+    ap.add_argument("--clusters", type=int, default=3, help="cluster per datacenter")
+    ap.add_argument("--variant", choices=sorted(VINFO_VARIANTS), default="rvtools4",
+                    help="variante delle intestazioni di colonna")
+    ap.add_argument("--extra-sheets", action="store_true", help=f"aggiunge i fogli {', '.join(EXTRA_SHEETS)}")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    generate(args.output, vms=args.vms, hosts=args.hosts, datacenters=args.datacenters,
+             clusters_per_dc=args.clusters, variant=args.variant, extra_sheets=args.extra_sheets, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
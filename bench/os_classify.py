@@ -0,0 +1,64 @@
+"""
+Microbenchmark della classificazione Guest OS.
+Confronta la classificazione per singola VM senza cache (come avveniva per
+ogni VM sia nel parser sia in ogni riepilogo del report) con classify_os memoizzato.
+
+Uso: python bench/os_classify.py [numero_vm]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from os_classifier import classify_os  # noqa: E402
+
+GUEST_OS = [
+    "Microsoft Windows Server 2016 (64-bit)",
+    "Microsoft Windows Server 2019 (64-bit)",
+    "Microsoft Windows Server 2022 (64-bit)",
+    "Microsoft Windows Server 2012 R2 (64-bit)",
+    "Microsoft Windows 10 (64-bit)",
+    "Ubuntu Linux (64-bit)",
+    "Ubuntu 22.04.3 LTS",
+    "Red Hat Enterprise Linux 8 (64-bit)",
+    "Red Hat Enterprise Linux 9.2",
+    "CentOS 7 (64-bit)",
+    "Debian GNU/Linux 11 (64-bit)",
+    "SUSE Linux Enterprise 15 (64-bit)",
+    "VMware Photon OS (64-bit)",
+    "Oracle Linux 8 (64-bit)",
+    "Other 3.x or later Linux (64-bit)",
+    "FreeBSD 12 (64-bit)",
+    "",
+]
+
+
+def main(n_vms: int, passes: int = 2):
+    random.seed(0)
+    os_names = [random.choice(GUEST_OS) for _ in range(n_vms)]
+    uncached = classify_os.__wrapped__
+
+    t0 = time.perf_counter()
+    for _ in range(passes):
+        for name in os_names:
+            uncached(name)
+    t_uncached = time.perf_counter() - t0
+
+    classify_os.cache_clear()
+    t0 = time.perf_counter()
+    for _ in range(passes):
+        for name in os_names:
+            classify_os(name)
+    t_cached = time.perf_counter() - t0
+
+    print(f"VM: {n_vms}  passaggi: {passes}  OS distinti: {len(set(os_names))}")
+    print(f"senza cache: {t_uncached * 1000:8.1f} ms")
+    print(f"con cache:   {t_cached * 1000:8.1f} ms   ({classify_os.cache_info()})")
+    print(f"speedup:     {t_uncached / t_cached:8.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,228 @@
+"""
+Benchmark per fasi della pipeline di elaborazione di un export RVTools.
+Misura separatamente apertura del workbook, lettura dei fogli, parsing di
+vInfo/vHost, normalizzazione OS, aggregazione, simulazione di
+consolidamento, rendering HTML e PDF; per ogni fase riporta tempo (mediana
+su più ripetizioni), tempo CPU, picco di memoria allocata (tracemalloc, in
+un passaggio dedicato) e RSS massimo.
+Il risultato è JSON, confrontabile con un'esecuzione precedente.
+
+Uso:
+    python bench/run_bench.py workbook.xlsx --repeat 3 -o risultati.json
+    python bench/run_bench.py --generate 50000 --compare baseline.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from os_classifier import classify_os  # noqa: E402
+from parser import VHOST_SHEETS, VINFO_SHEETS, summarize_inventory, vhost_frame, vinfo_frame  # noqa: E402
+from report_builder import build_report, write_print_parts, write_report  # noqa: E402
+from whatif import WhatIf  # noqa: E402
+from xlsx_reader import XlsxReader  # noqa: E402
+
+PHASES = ("workbook_open", "sheet_read", "vinfo_parse", "os_normalize", "aggregation", "whatif", "render",
+          "render_print", "render_inline", "pdf")
+
+
+def _max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Recorder:
+    def __init__(self, profile_memory: bool):
+        self.profile_memory = profile_memory
+        self.results = {}
+
+    def run(self, phase: str, fn):
+        gc.collect()
+        if self.profile_memory:
+            tracemalloc.start()
+        t0, c0 = time.perf_counter(), time.process_time()
+        value = fn()
+        wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+        entry = {"seconds": wall, "cpu_seconds": cpu, "max_rss_mb": round(_max_rss_mb(), 1)}
+        if self.profile_memory:
+            entry["peak_alloc_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+            tracemalloc.stop()
+        self.results[phase] = entry
+        return value
+
+
+def _os_normalize(os_names: pd.Series):
+    # Stesso schema di vinfo_frame: una classificazione per stringa distinta
+    classify_os.cache_clear()
+    codes, uniques = pd.factorize(os_names)
+    classified = [classify_os(o) for o in uniques] or [("other", "N/D")]
+    families = np.asarray([fam for fam, _ in classified], dtype=object)[codes]
+    simple = np.asarray([simple_os for _, simple_os in classified], dtype=object)[codes]
+    return families, simple
+
+
+def run_once(workbook: str, out_dir: Path, rec: Recorder, with_pdf: bool, inline: bool) -> dict:
+    xl = rec.run("workbook_open", lambda: XlsxReader(workbook))
+    try:
+        vinfo, vhost = xl.find_sheet(VINFO_SHEETS), xl.find_sheet(VHOST_SHEETS)
+        frames = rec.run("sheet_read", lambda: xl.read_sheets([vinfo] + ([vhost] if vhost else [])))
+        sheet_names = xl.sheet_names
+    finally:
+        xl.close()
+
+    # vinfo_parse comprende anche la normalizzazione OS, misurata a parte in os_normalize
+    classify_os.cache_clear()
+    inventory = rec.run("vinfo_parse", lambda: {
+        "vms": vinfo_frame(frames[vinfo]),
+        "hosts": vhost_frame(frames.get(vhost)),
+        "sheet_names": sheet_names,
+    })
+    rec.run("os_normalize", lambda: _os_normalize(inventory["vms"]["os"]))
+    data = rec.run("aggregation", lambda: summarize_inventory(inventory))
+    rec.run("whatif", lambda: WhatIf(inventory).simulate())
+
+    # Rendering come nella pipeline (tabelle VM caricate dal browser, copie compresse)
+    report_folder = out_dir / "report"
+    report_folder.mkdir(exist_ok=True)
+    rec.run("render", lambda: write_report(report_folder / "report.html", data, "bench", Path(workbook).name,
+                                            custom={}, inline_tables=False, precompress=True))
+    rec.run("render_print", lambda: write_print_parts(report_folder, data, "bench", Path(workbook).name, custom={}))
+    if inline:
+        rec.run("render_inline", lambda: build_report(data, "bench", Path(workbook).name, custom={}))
+    if with_pdf:
+        try:
+            from pdf_cache import get_pdf
+        except (ImportError, OSError) as e:
+            rec.results["pdf"] = {"skipped": f"WeasyPrint non disponibile: {type(e).__name__}"}
+        else:
+            for stale in report_folder.glob("report-*.pdf"):
+                stale.unlink()
+            rec.run("pdf", lambda: get_pdf(report_folder, {}, APP_DIR, APP_DIR / "static"))
+    return {"vms": len(inventory["vms"]), "hosts": len(inventory["hosts"])}
+
+
+def benchmark(workbook: str, repeat: int, with_pdf: bool, inline: bool) -> dict:
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="rvbench") as tmp:
+        for _ in range(repeat):
+            rec = Recorder(profile_memory=False)
+            counts = run_once(workbook, Path(tmp), rec, with_pdf, inline)
+            runs.append(rec.results)
+        # Passaggio separato per la memoria: tracemalloc rallenta l'esecuzione
+        mem = Recorder(profile_memory=True)
+        run_once(workbook, Path(tmp), mem, with_pdf, inline)
+
+    phases = {}
+    for phase in PHASES:
+        timed = [r[phase] for r in runs if phase in r and "seconds" in r[phase]]
+        if not timed:
+            if phase in runs[0]:
+                phases[phase] = runs[0][phase]
+            continue
+        seconds = [t["seconds"] for t in timed]
+        phases[phase] = {
+            "seconds": round(statistics.median(seconds), 4),
+            "min_seconds": round(min(seconds), 4),
+            "cpu_seconds": round(statistics.median(t["cpu_seconds"] for t in timed), 4),
+            "peak_alloc_mb": mem.results.get(phase, {}).get("peak_alloc_mb"),
+            "max_rss_mb": max(t["max_rss_mb"] for t in timed),
+        }
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "workbook": os.path.basename(workbook),
+            "workbook_mb": round(os.path.getsize(workbook) / 1024 / 1024, 2),
+            "repeat": repeat,
+            **counts,
+        },
+        "phases": phases,
+        # Totale del percorso di produzione (render_inline è solo di confronto)
+        "total_seconds": round(sum(p.get("seconds", 0) for name, p in phases.items() if name != "render_inline"), 4),
+    }
+
+
+def compare(result: dict, baseline: dict, threshold: float, min_seconds: float = 0.05) -> bool:
+    """
+    Stampa il confronto fase per fase; False se una fase rallenta oltre la
+    soglia. Le fasi più brevi di min_seconds sono solo rumore e non contano.
+    """
+    ok = True
+    print(f"{'fase':<15}{'base [s]':>11}{'ora [s]':>11}{'rapporto':>10}", file=sys.stderr)
+    for phase in PHASES:
+        cur, base = result["phases"].get(phase, {}), baseline.get("phases", {}).get(phase, {})
+        if "seconds" not in cur or "seconds" not in base:
+            continue
+        ratio = cur["seconds"] / base["seconds"] if base["seconds"] else float("inf")
+        flag = ""
+        if ratio > threshold and max(cur["seconds"], base["seconds"]) >= min_seconds:
+            ok, flag = False, "  <-- regressione"
+        print(f"{phase:<15}{base['seconds']:>11.3f}{cur['seconds']:>11.3f}{ratio:>9.2f}x{flag}", file=sys.stderr)
+    return ok
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark per fasi della pipeline RVTools.")
+    ap.add_argument("workbook", nargs="?", help="file .xlsx da elaborare")
+    ap.add_argument("--generate", type=int, metavar="VM", help="genera un workbook sintetico con VM macchine")
+    ap.add_argument("--extra-sheets", action="store_true", help="con --generate: aggiunge fogli voluminosi")
+    ap.add_argument("--repeat", type=int, default=3, help="ripetizioni per la mediana dei tempi")
+    ap.add_argument("--no-pdf", action="store_true", help="salta la generazione del PDF")
+    ap.add_argument("--inline", action="store_true", help="misura anche il report con le tabelle VM incluse")
+    ap.add_argument("-o", "--output", help="file JSON dei risultati (default: stdout)")
+    ap.add_argument("--compare", metavar="JSON", help="risultati precedenti con cui confrontarsi")
+    ap.add_argument("--threshold", type=float, default=1.2, help="rapporto oltre il quale una fase è una regressione")
+    args = ap.parse_args()
+    if not args.workbook and not args.generate:
+        ap.error("specificare un workbook oppure --generate")
+
+    with tempfile.TemporaryDirectory(prefix="rvbench-wb") as tmp:
+        workbook = args.workbook
+        if args.generate:
+            from generate_workbook import generate
+            workbook = os.path.join(tmp, f"synthetic-{args.generate}.xlsx")
+            generate(workbook, vms=args.generate, hosts=max(4, args.generate // 40),
+                     datacenters=max(1, args.generate // 25000 + 1), extra_sheets=args.extra_sheets)
+        result = benchmark(workbook, max(1, args.repeat), not args.no_pdf, args.inline)
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            return 0 if compare(result, json.load(f), args.threshold) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+Configurazione comune dei test: i moduli dell'app si importano dalla cartella
+app/ (come fa gunicorn) e i workbook di prova si scrivono con openpyxl.
+"""
+
+import sys
+from pathlib import Path
+
+import openpyxl
+import pytest
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+VINFO_HEADER = ["VM", "Powerstate", "CPUs", "Memory", "Provisioned MiB", "In Use MiB", "Host", "Datacenter",
+                "Cluster", "OS according to the VMware Tools", "VM UUID"]
+VHOST_HEADER = ["Host", "Datacenter", "Cluster", "# CPU", "# Cores", "# Memory"]
+
+
+def write_workbook(path, vinfo_rows=(), vinfo_header=VINFO_HEADER, vhost_rows=None, vhost_header=VHOST_HEADER):
+    """Scrive un workbook in formato RVTools con i fogli vInfo e (se dato) vHost."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "vInfo"
+    ws.append(list(vinfo_header))
+    for row in vinfo_rows:
+        ws.append(list(row))
+    if vhost_rows is not None:
+        hs = wb.create_sheet("vHost")
+        hs.append(list(vhost_header))
+        for row in vhost_rows:
+            hs.append(list(row))
+    wb.save(path)
+    return str(path)
+
+
+def pdf_available() -> bool:
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    """Fabbrica di workbook nella cartella temporanea del test."""
+    def make(name="rvtools.xlsx", **kwargs):
+        return write_workbook(tmp_path / name, **kwargs)
+    return make
@@ -0,0 +1,36 @@
+from aggregation import AggregationCube
+from parser import check_workbook, parse_rvtools, read_inventory
+
+
+def test_headers_only_sheet_gives_zero_totals(workbook):
+    path = workbook()
+    assert check_workbook(path)["vinfo"] == "vInfo"
+
+    data = parse_rvtools(path)
+    assert data["summary_total"] == {
+        "count": 0, "tot_vcpu": 0, "tot_vram_gb": 0.0, "tot_disk_used_gb": 0.0, "tot_disk_prov_gb": 0.0,
+    }
+    assert data["summary_on"]["count"] == data["summary_off"]["count"] == 0
+    assert data["datacenters"] == {}
+    assert data["host_stats"] == {}
+
+
+def test_empty_cube_has_no_cells(workbook):
+    cube = AggregationCube(read_inventory(workbook())["vms"])
+    assert len(cube.cells) == 0
+    assert cube.rollup(("host",)) == {}
+
+
+def test_cube_rollup_matches_frame(workbook):
+    rows = [
+        ("a", "poweredOn", 2, 4096, 102400, 51200, "h1", "DC1", "C1", "Microsoft Windows Server 2019 (64-bit)", "u1"),
+        ("b", "poweredOff", 4, 8192, 204800, 10240, "h1", "DC1", "C1", "Ubuntu Linux (64-bit)", "u2"),
+        ("c", "poweredOn", 1, 2048, 10240, 1024, "h2", "DC2", "C2", "Ubuntu Linux (64-bit)", "u3"),
+    ]
+    data = parse_rvtools(workbook(vinfo_rows=rows))
+    assert data["summary_on"]["count"] == 2
+    assert data["summary_on"]["tot_vcpu"] == 3
+    assert data["summary_total"]["tot_vram_gb"] == 14.0
+    assert data["summary_total"]["tot_disk_prov_gb"] == 310.0
+    assert set(data["datacenters"]) == {"DC1", "DC2"}
+    assert data["datacenters"]["DC1"]["off"]["os_counts"]["linux"] == 1
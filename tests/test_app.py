@@ -0,0 +1,112 @@
+import gzip
+import hashlib
+import importlib
+import os
+import shutil
+
+import pytest
+
+from conftest import pdf_available, write_workbook
+
+if not pdf_available():
+    # app importa pdf_cache, che richiede WeasyPrint
+    pytest.skip("WeasyPrint non disponibile", allow_module_level=True)
+
+ROWS = [("vm1", "poweredOn", 2, 4096, 102400, 51200, "h1", "DC1", "C1", "Ubuntu Linux (64-bit)", "u1")]
+
+
+@pytest.fixture(scope="module")
+def webapp(tmp_path_factory):
+    os.environ["DATA_DIR"] = str(tmp_path_factory.mktemp("data"))
+    os.environ["PDF_PRERENDER"] = "0"
+    # Lo scheduler di manutenzione gira in un thread daemon: il primo tick arriva dopo la fine dei test
+    return importlib.import_module("app")
+
+
+@pytest.fixture
+def client(webapp):
+    return webapp.app.test_client()
+
+
+def _upload(client, path, name="rvtools.xlsx"):
+    with open(path, "rb") as f:
+        return client.post("/upload", data={"file": (f, name)}, content_type="multipart/form-data",
+                           headers={"Accept": "application/json"})
+
+
+def test_failed_submit_removes_the_report(webapp, client, tmp_path, monkeypatch):
+    def broken(job_id, params):
+        raise OSError("fork failed")
+    monkeypatch.setattr(webapp.job_queue, "submit", broken)
+    before = set(os.listdir(webapp.UPLOADS_DIR)), set(os.listdir(webapp.REPORTS_DIR))
+
+    response = _upload(client, write_workbook(tmp_path / "rvtools.xlsx", ROWS))
+    assert response.status_code == 500
+    assert (set(os.listdir(webapp.UPLOADS_DIR)), set(os.listdir(webapp.REPORTS_DIR))) == before
+    assert webapp.catalog.is_empty()
+
+
+def test_invalid_workbook_is_rejected_before_queueing(webapp, client, tmp_path):
+    path = tmp_path / "rotto.xlsx"
+    path.write_bytes(b"non sono uno zip")
+    before = set(os.listdir(webapp.UPLOADS_DIR))
+
+    response = _upload(client, path)
+    assert response.status_code == 400
+    assert "non è un workbook Excel valido" in response.get_json()["error"]
+    # Né cartelle del report né file parziali dell'upload
+    assert set(os.listdir(webapp.UPLOADS_DIR)) == before
+
+
+def test_non_xlsx_upload_is_rejected(client, tmp_path):
+    path = tmp_path / "inventario.csv"
+    path.write_text("VM,Powerstate\n")
+    response = _upload(client, path, name="inventario.csv")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Carica un file .xlsx valido."}
+
+
+@pytest.fixture
+def report(webapp):
+    folder = webapp.REPORTS_DIR / "etagtest"
+    folder.mkdir(exist_ok=True)
+    html = folder / "report.html"
+    html.write_text("<html>report</html>")
+    (folder / "report.html.gz").write_bytes(gzip.compress(html.read_bytes()))
+    yield html
+    shutil.rmtree(folder)
+
+
+def test_report_etag_follows_content(webapp, report):
+    etag = webapp.report_etag(report)
+    assert etag == hashlib.sha256(report.read_bytes()).hexdigest()
+    report.write_text("<html>report aggiornato</html>")
+    assert webapp.report_etag(report) != etag
+
+
+def test_view_report_conditional_get(webapp, client, report):
+    first = client.get("/report/etagtest")
+    assert first.status_code == 200
+    assert first.headers["ETag"] == f'"{webapp.report_etag(report)}"'
+    assert "no-cache" in first.headers["Cache-Control"] and "Accept-Encoding" in first.headers["Vary"]
+
+    again = client.get("/report/etagtest", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.data == b""
+
+    report.write_text("<html>report aggiornato</html>")
+    changed = client.get("/report/etagtest", headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200 and changed.data == b"<html>report aggiornato</html>"
+
+
+def test_view_report_precompressed_copy_has_its_own_etag(webapp, client, report):
+    plain = client.get("/report/etagtest")
+    compressed = client.get("/report/etagtest", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers["ETag"] == f'"{webapp.report_etag(report)}-gzip"'
+    assert client.get("/report/etagtest", headers={"Accept-Encoding": "gzip",
+                                                   "If-None-Match": plain.headers["ETag"]}).status_code == 200
+
+
+def test_unknown_report_is_404(client):
+    assert client.get("/report/nonesiste").status_code == 404
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+from conftest import pdf_available
+
+if not pdf_available():
+    # bulk_ingest usa la pipeline dell'upload, che importa pdf_cache
+    pytest.skip("WeasyPrint non disponibile", allow_module_level=True)
+
+import bulk_ingest
+from catalog import READY, Catalog
+
+ROWS = [("vm1", "poweredOn", 2, 4096, 102400, 51200, "h1", "DC1", "C1", "Ubuntu Linux (64-bit)", "u1"),
+        ("vm2", "poweredOff", 1, 2048, 51200, 25600, "h1", "DC1", "C1", "Ubuntu Linux (64-bit)", "u2")]
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "data"
+    monkeypatch.setattr(bulk_ingest, "DATA_DIR", directory)
+    return directory
+
+
+@pytest.fixture
+def sources(tmp_path, workbook):
+    folder = tmp_path / "export"
+    (folder / "2025").mkdir(parents=True)
+    workbook(name="export/a.xlsx", vinfo_rows=ROWS)
+    workbook(name="export/2025/b.xlsx", vinfo_rows=ROWS[:1])
+    (folder / "rotto.xlsx").write_bytes(b"non sono uno zip")
+    (folder / "~$a.xlsx").write_bytes(b"lock di Excel")
+    (folder / "note.txt").write_text("ciao")
+    return folder
+
+
+def _state(data_dir) -> list:
+    with open(data_dir / bulk_ingest.STATE_FILE) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_find_files(sources):
+    names = lambda files: [os.path.relpath(f, sources) for f in files]
+    assert names(bulk_ingest.find_files([str(sources)])) == ["a.xlsx", "rotto.xlsx"]
+    assert names(bulk_ingest.find_files([str(sources)], recursive=True)) == ["2025/b.xlsx", "a.xlsx", "rotto.xlsx"]
+    # Pattern glob e sorgenti ripetute: ogni file una volta sola
+    assert names(bulk_ingest.find_files([str(sources / "*.xlsx"), str(sources / "a.xlsx")])) == ["a.xlsx", "rotto.xlsx"]
+
+
+def test_ingest_and_resume(sources, data_dir, capsys):
+    assert bulk_ingest.main([str(sources), "-r", "-j", "2"]) == 1
+    entries = {os.path.basename(e["source"]): e for e in _state(data_dir)}
+    assert {name: e["status"] for name, e in entries.items()} == {"a.xlsx": "done", "b.xlsx": "done",
+                                                                  "rotto.xlsx": "error"}
+    assert entries["a.xlsx"]["vms"] == 2
+    catalog = Catalog(data_dir / "catalog.sqlite3")
+    for name in ("a.xlsx", "b.xlsx"):
+        report_id = entries[name]["report_id"]
+        assert catalog.get(report_id)["status"] == READY
+        assert (data_dir / "reports" / report_id / "report.html").exists()
+    # Il file in errore non lascia cartelle
+    assert len(os.listdir(data_dir / "reports")) == 2
+
+    # Alla ripresa i file importati si saltano e quelli in errore si ritentano
+    capsys.readouterr()
+    assert bulk_ingest.main([str(sources), "-r", "-j", "1"]) == 1
+    assert "3 file trovati, 2 già importati, 1 da elaborare" in capsys.readouterr().out
+    assert [os.path.basename(e["source"]) for e in _state(data_dir)][3:] == ["rotto.xlsx"]
+
+
+def test_truncated_state_line_is_ignored(tmp_path):
+    path = tmp_path / "state.jsonl"
+    entry = {"source": "/x/a.xlsx", "size": 10, "mtime_ns": 5, "status": "done"}
+    path.write_text(json.dumps(entry) + "\n" + '{"source": "/x/b.xl')
+    assert bulk_ingest.load_state(path) == {("/x/a.xlsx", 10, 5): entry}
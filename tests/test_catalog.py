@@ -0,0 +1,59 @@
+from catalog import PENDING, READY, Catalog
+
+
+def _meta(report_id, created, filename="rvtools.xlsx", title="", rollup=True):
+    meta = {"id": report_id, "filename": filename, "sha256": "0" * 64, "created": created, "custom_title": title,
+            "custom_date": None, "vms_on": 3, "vms_off": 1, "total": 4}
+    if rollup:
+        meta["rollup"] = {"vms": 4, "vms_on": 3, "hosts": 2, "vcpu": 10, "vram_gb": 12.5}
+    return meta
+
+
+def test_pending_then_ready(tmp_path):
+    catalog = Catalog(tmp_path / "catalog.sqlite3")
+    assert catalog.is_empty()
+    catalog.add_pending("r1", "rvtools.xlsx", "2026-01-01T10:00:00", "Sede")
+    assert catalog.get("r1")["status"] == PENDING
+    # I report in elaborazione non compaiono nell'elenco
+    assert catalog.search() == ([], 0)
+
+    catalog.put(_meta("r1", "2026-01-01T10:00:00", title="Sede"))
+    row = catalog.get("r1")
+    assert row["status"] == READY
+    assert (row["custom_title"], row["total"]) == ("Sede", 4)
+    assert [r["id"] for r in catalog.ready()] == ["r1"]
+
+
+def test_search_orders_and_escapes(tmp_path):
+    catalog = Catalog(tmp_path / "catalog.sqlite3")
+    catalog.put(_meta("r1", "2026-01-01T10:00:00", filename="sede_nord.xlsx"))
+    catalog.put(_meta("r2", "2026-02-01T10:00:00", filename="sede-sud.xlsx"))
+    catalog.put(_meta("r3", "2026-03-01T10:00:00", filename="altro.xlsx", title="Sede centrale"))
+
+    rows, total = catalog.search()
+    assert total == 3
+    assert [r["id"] for r in rows] == ["r3", "r2", "r1"]
+    # "_" è letterale, non il jolly di LIKE
+    assert [r["id"] for r in catalog.search("sede_")[0]] == ["r1"]
+    assert [r["id"] for r in catalog.search("centrale")[0]] == ["r3"]
+    rows, total = catalog.search(page=2, per_page=2)
+    assert ([r["id"] for r in rows], total) == (["r1"], 3)
+
+
+def test_rollups_expiry_and_delete(tmp_path):
+    catalog = Catalog(tmp_path / "catalog.sqlite3")
+    catalog.put(_meta("r1", "2026-01-01T10:00:00"))
+    catalog.put(_meta("r2", "2026-02-01T10:00:00", rollup=False))
+    catalog.add_pending("r3", "rvtools.xlsx", "2025-12-01T10:00:00")
+
+    assert [r["id"] for r in catalog.rollups()] == ["r1"]
+    assert catalog.rollups()[0]["vram_gb"] == 12.5
+    assert catalog.missing_rollups() == ["r2"]
+    catalog.put_rollup("r2", {"vms": 1})
+    assert catalog.missing_rollups() == []
+    # Scadono anche i report mai completati, dal più vecchio
+    assert catalog.expired("2026-01-15") == ["r3", "r1"]
+
+    catalog.delete("r1")
+    assert catalog.get("r1") is None
+    assert [r["id"] for r in catalog.rollups()] == ["r2"]
@@ -0,0 +1,69 @@
+from diff import compute_diff
+from parser import read_inventory
+
+
+def _vm(name, uuid, power="poweredOn", cpus=2, memory=4096, provisioned=102400, in_use=51200, host="h1", dc="DC1"):
+    return (name, power, cpus, memory, provisioned, in_use, host, dc, "C1", "Ubuntu Linux (64-bit)", uuid)
+
+
+def _vms(workbook, name, rows, header=None):
+    kwargs = {"vinfo_header": header} if header else {}
+    return read_inventory(workbook(name, vinfo_rows=rows, **kwargs))["vms"]
+
+
+def test_changes_by_uuid(workbook):
+    base = _vms(workbook, "base.xlsx", [
+        _vm("web", "U1"), _vm("db", "U2"), _vm("old", "U3"), _vm("batch", "U4", power="poweredOff"),
+    ])
+    target = _vms(workbook, "target.xlsx", [
+        # Rinominata: con l'UUID resta la stessa VM
+        _vm("web-01", "U1", host="h2"),
+        _vm("db", "U2", cpus=4, memory=8192, in_use=61440),
+        _vm("batch", "U4"),
+        _vm("new", "U5", dc="DC2", host="h9"),
+    ])
+    diff = compute_diff(base, target)
+
+    assert diff["key"] == "uuid"
+    s = diff["summary"]
+    assert (s["base_count"], s["target_count"]) == (4, 4)
+    assert (s["added"], s["removed"], s["moved"], s["resized"]) == (1, 1, 1, 1)
+    assert (s["powered_on"], s["powered_off"], s["disk_changed"]) == (1, 0, 1)
+    assert s["delta_num_vcpu"] == 2
+    assert s["delta_vram_gb"] == 4.0
+    assert s["delta_disk_used_gb"] == 10.0
+
+    changes = diff["changes"]
+    assert [v["name"] for v in changes["added"]] == ["new"]
+    assert [v["name"] for v in changes["removed"]] == ["old"]
+    assert changes["moved"] == [{"name": "web-01", "from_datacenter": "DC1", "from_host": "h1",
+                                 "to_datacenter": "DC1", "to_host": "h2"}]
+    assert (changes["resized"][0]["vcpu_before"], changes["resized"][0]["vcpu_after"]) == (2, 4)
+    assert changes["power"][0]["name"] == "batch" and changes["power"][0]["on_after"] is True
+    assert changes["disk"][0]["delta_used_gb"] == 10.0
+
+    by_dc = {d["datacenter"]: d for d in diff["datacenters"]}
+    assert (by_dc["DC1"]["count_before"], by_dc["DC1"]["count_after"], by_dc["DC1"]["removed"]) == (4, 3, 1)
+    assert (by_dc["DC2"]["count_before"], by_dc["DC2"]["added"]) == (0, 1)
+
+
+def test_falls_back_to_name_and_datacenter(workbook):
+    header = ["VM", "Powerstate", "CPUs", "Memory", "Provisioned MiB", "In Use MiB", "Host", "Datacenter", "Cluster",
+              "OS according to the VMware Tools"]
+    # Due VM omonime nello stesso datacenter restano distinte
+    rows = [_vm("web", None)[:-1], _vm("web", None, host="h2")[:-1], _vm("db", None)[:-1]]
+    base = _vms(workbook, "base.xlsx", rows, header)
+    target = _vms(workbook, "target.xlsx", rows[:2] + [_vm("db", None, dc="DC2")[:-1]], header)
+    diff = compute_diff(base, target)
+
+    assert diff["key"] == "name+datacenter"
+    s = diff["summary"]
+    # Cambiare datacenter cambia la chiave: rimossa e aggiunta, non spostata
+    assert (s["added"], s["removed"], s["moved"]) == (1, 1, 0)
+
+
+def test_identical_inventories(workbook):
+    vms = _vms(workbook, "same.xlsx", [_vm("web", "U1"), _vm("db", "U2")])
+    diff = compute_diff(vms, vms)
+    assert all(v == 0 for k, v in diff["summary"].items() if k not in ("base_count", "target_count"))
+    assert all(not rows for rows in diff["changes"].values())
@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+
+import pytest
+
+import exports
+from exports import parquet_available, stream_export
+from parser import read_inventory
+
+VMS = [
+    ("vm1", "poweredOn", 2, 4096, 102400, 51200, "h1", "DC1", "C1", "Ubuntu Linux (64-bit)", "u1"),
+    ("vm2", "poweredOff", 4, 8192, 204800, 10240, "h1", "DC1", "C1", "Microsoft Windows Server 2019 (64-bit)", "u2"),
+    ("vm3", "poweredOn", 1, 2048, 51200, 25600, "h3", "", "", "Ubuntu Linux (64-bit)", "u3"),
+]
+HOSTS = [("h1", "DC1", "C1", 2, 16, 131072), ("h2", "DC2", "C2", 1, 8, 65536)]
+
+
+@pytest.fixture
+def inventory(workbook):
+    return read_inventory(workbook(vinfo_rows=VMS, vhost_rows=HOSTS))
+
+
+def _csv_rows(inventory, dataset):
+    return list(csv.DictReader(io.StringIO(b"".join(stream_export(inventory, dataset, "csv")).decode())))
+
+
+def test_vm_csv_and_jsonl_match(inventory):
+    rows = _csv_rows(inventory, "vms")
+    records = [json.loads(line) for line in b"".join(stream_export(inventory, "vms", "jsonl")).splitlines()]
+    assert [r["name"] for r in rows] == [r["name"] for r in records] == ["vm1", "vm2", "vm3"]
+    assert records[1]["power_state"] == "poweredoff"
+    assert records[1]["vram_gb"] == 8.0
+    assert rows[0]["vram_gb"] == "4.0"
+
+
+def test_vm_export_is_chunked(inventory, monkeypatch):
+    monkeypatch.setattr(exports, "CHUNK_ROWS", 2)
+    parts = list(stream_export(inventory, "vms", "csv"))
+    assert len(parts) == 2
+    # Intestazione solo nel primo blocco
+    assert parts[0].startswith(b"name,") and not parts[1].startswith(b"name,")
+    assert len(_csv_rows(inventory, "vms")) == 3
+
+
+def test_hosts_include_hosts_without_vms_and_vm_only_hosts(inventory):
+    rows = {r["host"]: r for r in _csv_rows(inventory, "hosts")}
+    assert set(rows) == {"h1", "h2", "h3"}
+    assert (rows["h1"]["vms"], rows["h1"]["vms_on"], rows["h1"]["vms_off"]) == ("2", "1", "1")
+    assert rows["h2"]["vms"] == "0"
+    assert rows["h3"]["num_cpu"] == "0"
+
+
+def test_datacenter_and_os_totals(inventory):
+    dcs = {r["datacenter"]: r for r in _csv_rows(inventory, "datacenters")}
+    assert set(dcs) == {"DC1", exports.EMPTY_LABEL}
+    assert (dcs["DC1"]["vms"], dcs["DC1"]["vcpu"], dcs["DC1"]["vcpu_on"]) == ("2", "6", "2")
+    assert sum(int(r["vms"]) for r in _csv_rows(inventory, "os")) == 3
+
+
+def test_empty_inventory(workbook):
+    inventory = read_inventory(workbook(vinfo_rows=[]))
+    assert b"".join(stream_export(inventory, "datacenters", "jsonl")) == b""
+    assert b"".join(stream_export(inventory, "vms", "csv")).startswith(b"name,")
+
+
+def test_unknown_dataset_or_format(inventory):
+    with pytest.raises(KeyError):
+        stream_export(inventory, "clusters", "csv")
+    with pytest.raises(KeyError):
+        stream_export(inventory, "vms", "xml")
+
+
+@pytest.mark.skipif(not parquet_available(), reason="pyarrow non installato")
+def test_parquet_round_trip(inventory, monkeypatch):
+    import pyarrow.parquet as pq
+    monkeypatch.setattr(exports, "CHUNK_ROWS", 2)
+    table = pq.read_table(io.BytesIO(b"".join(stream_export(inventory, "vms", "parquet"))))
+    assert table.column("name").to_pylist() == ["vm1", "vm2", "vm3"]
+    assert pq.ParquetFile(io.BytesIO(b"".join(stream_export(inventory, "vms", "parquet")))).num_row_groups == 2
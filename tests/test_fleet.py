@@ -0,0 +1,68 @@
+from fleet import DELTA_FIELDS, ROLLUP_FIELDS, estate_name, fleet_overview, report_rollup
+from parser import read_inventory
+
+VMS = [
+    ("vm1", "poweredOn", 2, 4096, 102400, 51200, "h1", "DC1", "C1", "Ubuntu Linux (64-bit)", "u1"),
+    ("vm2", "poweredOff", 4, 8192, 204800, 10240, "h1", "DC1", "C1", "Microsoft Windows Server 2019 (64-bit)", "u2"),
+    ("vm3", "poweredOn", 1, 2048, 51200, 25600, "h3", "DC1", "C1", "", "u3"),
+]
+
+
+def _row(report_id, created, vms, filename="rvtools.xlsx", title=""):
+    row = {field: 0 for field in ROLLUP_FIELDS}
+    row.update(id=report_id, created=created, filename=filename, custom_title=title, custom_date="",
+               vms=vms, vcpu=2 * vms, vram_gb=1.5 * vms)
+    return row
+
+
+def test_report_rollup(workbook):
+    path = workbook(vinfo_rows=VMS, vhost_rows=[("h1", "DC1", "C1", 2, 16, 131072), ("h2", "DC1", "C1", 2, 16, 131072)])
+    rollup = report_rollup(read_inventory(path))
+    assert set(rollup) == set(ROLLUP_FIELDS)
+    assert (rollup["vms"], rollup["vms_on"], rollup["vcpu"], rollup["vcpu_on"]) == (3, 2, 7, 3)
+    assert (rollup["vram_gb"], rollup["vram_gb_on"]) == (14.0, 6.0)
+    # h1 e h2 da vHost, h3 solo dalle VM
+    assert rollup["hosts"] == 3
+    assert (rollup["vms_windows"], rollup["vms_linux"], rollup["vms_other"]) == (1, 1, 1)
+
+
+def test_estate_name_prefers_title():
+    assert estate_name({"custom_title": "Produzione", "filename": "a.xlsx"}) == "Produzione"
+    assert estate_name({"custom_title": "", "filename": "a.xlsx"}) == "a.xlsx"
+    assert estate_name({}) == ""
+
+
+def test_latest_report_per_estate_and_deltas():
+    rows = [
+        _row("r1", "2026-03-01T09:00:00", 10, title="Produzione"),
+        _row("r2", "2026-03-01T10:00:00", 4, filename="lab.xlsx"),
+        _row("r3", "2026-03-02T09:00:00", 12, title="Produzione"),
+    ]
+    overview = fleet_overview(rows)
+    assert overview["summary"]["estates"] == 2
+    assert overview["summary"]["reports"] == 3
+    assert overview["summary"]["vms"] == 16
+    by_estate = {e["estate"]: e for e in overview["estates"]}
+    assert by_estate["Produzione"]["report_id"] == "r3"
+    assert by_estate["Produzione"]["reports"] == 2
+    assert by_estate["Produzione"]["delta_vms"] == 2
+    assert by_estate["Produzione"]["delta_vram_gb"] == 3.0
+    assert all(by_estate["lab.xlsx"][f"delta_{field}"] is None for field in DELTA_FIELDS)
+
+
+def test_trend_sums_latest_report_of_each_estate_per_day():
+    rows = [
+        _row("r1", "2026-03-01T09:00:00", 10, title="Produzione"),
+        _row("r2", "2026-03-01T10:00:00", 11, title="Produzione"),
+        _row("r3", "2026-03-02T09:00:00", 4, title="Lab"),
+        _row("r4", "2026-03-04T09:00:00", 12, title="Produzione"),
+    ]
+    trend = fleet_overview(rows)["trend"]
+    assert [(t["date"], t["estates"], t["vms"]) for t in trend] == [
+        ("2026-03-01", 1, 11), ("2026-03-02", 2, 15), ("2026-03-04", 2, 16)]
+
+
+def test_empty_fleet():
+    overview = fleet_overview([])
+    assert overview["estates"] == [] and overview["trend"] == []
+    assert overview["summary"]["vms"] == 0
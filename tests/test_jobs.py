@@ -0,0 +1,134 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import pdf_available
+
+if not pdf_available():
+    # jobs importa la pipeline, che richiede WeasyPrint
+    pytest.skip("WeasyPrint non disponibile", allow_module_level=True)
+
+import jobs
+
+
+def _failing_at(phase):
+    def generate_report(progress, **params):
+        for p, pct in (("parsing", 10), ("summarizing", 50), ("indexing", 60), ("rendering", 70)):
+            progress(p, pct)
+            if p == phase:
+                raise RuntimeError("boom")
+    return generate_report
+
+
+@pytest.mark.parametrize("phase, label", [
+    ("parsing", "la lettura del file"),
+    ("rendering", "la generazione del report"),
+])
+def test_error_reports_failed_phase(tmp_path, monkeypatch, phase, label):
+    monkeypatch.setattr(jobs, "generate_report", _failing_at(phase))
+    jobs.run_job(str(tmp_path), "j1", {})
+    status = json.loads((tmp_path / "j1.json").read_text())
+    assert status["status"] == jobs.ERROR
+    assert status["failed_phase"] == phase
+    assert status["error"] == f"Errore durante {label}: boom"
+
+
+def test_job_runs_once(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(jobs, "generate_report", lambda progress, **params: calls.append(1))
+    jobs.run_job(str(tmp_path), "j1", {})
+    jobs.run_job(str(tmp_path), "j1", {})
+    assert calls == [1]
+
+
+def _write(tmp_path, job_id, **status):
+    (tmp_path / f"{job_id}.json").write_text(json.dumps({"id": job_id, "report_id": job_id, **status}))
+
+
+def test_job_of_dead_process_becomes_error(tmp_path):
+    queue = jobs.JobQueue(tmp_path)
+    _write(tmp_path, "j1", status=jobs.RUNNING, phase="rendering", updated=datetime.now().isoformat())
+    # pid che non esiste: il processo del pool è terminato
+    (tmp_path / "j1.claim").write_text("999999999")
+    status = queue.get("j1")
+    assert status["status"] == jobs.ERROR
+    assert status["failed_phase"] == "rendering"
+    assert "interrotta" in status["error"]
+
+
+def test_expire_stale_only_touches_lost_jobs(tmp_path):
+    lost = []
+    queue = jobs.JobQueue(tmp_path, on_lost=lost.append)
+    old = (datetime.now() - timedelta(hours=2)).isoformat()
+    # In attesa da ore nel pool di un worker vivo: non scade
+    _write(tmp_path, "queued_alive", status=jobs.QUEUED, phase="queued", created=old, owner=os.getpid())
+    _write(tmp_path, "queued_orphan", status=jobs.QUEUED, phase="queued", created=old, owner=999999999)
+    _write(tmp_path, "running_alive", status=jobs.RUNNING, phase="parsing", updated=old)
+    (tmp_path / "running_alive.claim").write_text(str(os.getpid()))
+    _write(tmp_path, "running_dead", status=jobs.RUNNING, phase="parsing", updated=old)
+    (tmp_path / "running_dead.claim").write_text("999999999")
+    _write(tmp_path, "done_old", status=jobs.DONE, phase="done", updated=old)
+
+    assert queue.expire_stale() == 2
+    assert sorted(lost) == ["queued_orphan", "running_dead"]
+    assert queue.get("queued_alive")["status"] == jobs.QUEUED
+    assert queue.get("running_alive")["status"] == jobs.RUNNING
+    assert queue.get("running_dead")["status"] == jobs.ERROR
+    assert queue.get("done_old")["status"] == jobs.DONE
+
+
+def test_expired_job_does_not_run_later(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(jobs, "generate_report", lambda progress, **params: calls.append(1))
+    _write(tmp_path, "j1", status=jobs.ERROR, phase="error")
+    jobs.run_job(str(tmp_path), "j1", {})
+    assert calls == []
+    assert json.loads((tmp_path / "j1.json").read_text())["status"] == jobs.ERROR
+
+
+def test_failed_submit_leaves_no_status(tmp_path, monkeypatch):
+    queue = jobs.JobQueue(tmp_path)
+    monkeypatch.setattr(queue, "_run", lambda job_id, params: (_ for _ in ()).throw(OSError("fork")))
+    with pytest.raises(OSError):
+        queue.submit("j1", {"report_id": "j1"})
+    assert queue.get("j1") is None
+
+
+def _crash_or_finish(progress, crash=False, **params):
+    if crash:
+        # Come un OOM kill o un crash di WeasyPrint: il processo del pool muore
+        os._exit(1)
+    progress("done", 100)
+
+
+def _wait(queue, job_id, statuses, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = queue.get(job_id)
+        if status and status["status"] in statuses:
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"{job_id}: {queue.get(job_id)}")
+
+
+def test_pool_is_rebuilt_after_a_worker_dies(tmp_path, monkeypatch):
+    # I processi del pool nascono con fork e vedono la pipeline finta
+    monkeypatch.setattr(jobs, "generate_report", _crash_or_finish)
+    lost = []
+    queue = jobs.JobQueue(tmp_path, max_workers=1, on_lost=lost.append)
+    queue.submit("j1", {"report_id": "j1", "crash": True})
+    deadline = time.monotonic() + 20
+    while not (tmp_path / "j1.claim").exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    broken = queue._pool
+    queue.submit("j2", {"report_id": "j2"})
+    queue.submit("j3", {"report_id": "j3"})
+    assert _wait(queue, "j2", (jobs.DONE,))["status"] == jobs.DONE
+    assert _wait(queue, "j3", (jobs.DONE,))["status"] == jobs.DONE
+    assert queue._pool is not broken
+    # Il job che ha fatto morire il processo non viene ripetuto: è in errore e ripulito
+    assert _wait(queue, "j1", (jobs.ERROR,))["status"] == jobs.ERROR
+    assert lost == ["j1"]
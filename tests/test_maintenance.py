@@ -0,0 +1,93 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from maintenance import Maintenance
+from metrics import MetricsStore
+
+
+def _other_worker(data_dir: str) -> bool:
+    # Un altro processo (come un secondo worker gunicorn) sulla stessa cartella dati
+    ran = []
+    return Maintenance(data_dir).run_as_leader(lambda: ran.append(1)) or bool(ran)
+
+
+def test_run_as_leader_runs_in_one_process_only(tmp_path):
+    ran = []
+    leader = Maintenance(tmp_path)
+    assert leader.run_as_leader(lambda: ran.append(1))
+    assert ran == [1]
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(_other_worker, str(tmp_path)).result() is False
+
+
+def _tick_elsewhere(data_dir: str) -> list:
+    ran = []
+    other = Maintenance(data_dir)
+    other.add_task("prune", lambda: ran.append("prune"), 1)
+    other.tick(force=True)
+    return ran
+
+
+def _lead_and_exit(data_dir: str):
+    Maintenance(data_dir).run_as_leader(lambda: None)
+
+
+def test_tick_runs_tasks_in_the_leader_only(tmp_path):
+    ran = []
+    leader = Maintenance(tmp_path)
+    leader.add_task("prune", lambda: ran.append("prune"), 1)
+    leader.tick()
+    assert ran == ["prune"] and leader.is_leader
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(_tick_elsewhere, str(tmp_path)).result() == []
+
+
+def test_state_survives_a_new_leader(tmp_path):
+    ran = []
+    first = Maintenance(tmp_path)
+    first.add_task("prune", lambda: ran.append("prune"), 1)
+    first.tick()
+    first.tick()
+    assert ran == ["prune"]
+
+    # Un nuovo leader (stesso processo, nuova istanza) legge lo stato salvato
+    second = Maintenance(tmp_path)
+    second.add_task("prune", lambda: ran.append("prune"), 1)
+    second.tick()
+    assert ran == ["prune"]
+    second.tick(force=True)
+    assert ran == ["prune", "prune"]
+
+
+def test_pending_and_failing_tasks(tmp_path):
+    backlog = [3]
+
+    def drain():
+        backlog[0] -= 1
+        return backlog[0] > 0
+
+    def broken():
+        raise OSError("disco pieno")
+
+    metrics = MetricsStore(tmp_path / "metrics.db")
+    maintenance = Maintenance(tmp_path, metrics=metrics)
+    maintenance.add_task("drain", drain, 24)
+    maintenance.add_task("broken", broken, 24)
+    for _ in range(5):
+        maintenance.tick()
+    # Rieseguita a ogni tick finché resta lavoro, poi solo allo scadere dell'intervallo
+    assert backlog == [0]
+
+    status = maintenance.status()
+    assert status["this_process_is_leader"]
+    assert status["tasks"]["drain"]["pending"] is False and status["tasks"]["drain"]["next_due"]
+    assert status["tasks"]["broken"]["status"] == "error"
+    assert status["tasks"]["broken"]["error"] == "OSError: disco pieno"
+    assert 'rvtools_maintenance_errors_total{task="broken"} 1' in metrics.exposition()
+
+
+def test_lock_is_released_when_the_leader_exits(tmp_path):
+    leader = multiprocessing.Process(target=_lead_and_exit, args=(str(tmp_path),))
+    leader.start()
+    leader.join()
+    assert Maintenance(tmp_path).run_as_leader(lambda: None)
@@ -0,0 +1,63 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from metrics import MetricsStore, PhaseTimer
+
+
+def _record(path: str):
+    MetricsStore(path).record_task("prune", 0.2)
+
+
+def test_phase_timer_measures_and_merges():
+    timer = PhaseTimer()
+    with timer.phase("parse"):
+        sum(range(100000))
+    with pytest.raises(RuntimeError):
+        with timer.phase("render"):
+            raise RuntimeError("errore nel rendering")
+    timer.add({"upload": {"seconds": 1.5, "cpu_seconds": 0.1, "peak_rss_mb": 50.0}})
+
+    assert set(timer.phases) == {"parse", "render", "upload"}
+    # La fase è misurata anche quando termina con un'eccezione
+    assert set(timer.phases["render"]) == {"seconds", "cpu_seconds", "peak_rss_mb"}
+    assert timer.phases["parse"]["seconds"] >= 0
+    assert timer.phases["parse"]["peak_rss_mb"] > 0
+
+
+def test_histogram_buckets_are_cumulative(tmp_path):
+    store = MetricsStore(tmp_path / "metrics.db")
+    store.record_phases({"parse": {"seconds": 0.07, "cpu_seconds": 0.04, "peak_rss_mb": 100.0}})
+    store.record_phases({"parse": {"seconds": 3.0, "cpu_seconds": 2.0, "peak_rss_mb": 100.0}})
+    text = store.exposition()
+
+    assert 'rvtools_phase_duration_seconds_bucket{phase="parse",le="0.05"} 0' in text
+    assert 'rvtools_phase_duration_seconds_bucket{phase="parse",le="0.1"} 1' in text
+    assert 'rvtools_phase_duration_seconds_bucket{phase="parse",le="5"} 2' in text
+    assert 'rvtools_phase_duration_seconds_bucket{phase="parse",le="+Inf"} 2' in text
+    assert 'rvtools_phase_duration_seconds_count{phase="parse"} 2' in text
+    assert 'rvtools_phase_duration_seconds_sum{phase="parse"} 3.07' in text
+    assert 'rvtools_phase_peak_rss_bytes_bucket{phase="parse",le="134217728"} 2' in text
+
+
+def test_reports_and_task_errors(tmp_path):
+    store = MetricsStore(tmp_path / "metrics.db")
+    meta = {"total": 40, "metrics": {"workbook_bytes": 2 * 1024 * 1024, "phases": {}}}
+    store.record_report(meta)
+    store.record_report(meta)
+    store.record_task("prune", 0.5, ok=False)
+    text = store.exposition()
+
+    assert "rvtools_reports_total 2\n" in text
+    assert "rvtools_vms_total 80\n" in text
+    assert 'rvtools_maintenance_errors_total{task="prune"} 1\n' in text
+    assert 'rvtools_workbook_bytes_bucket{le="5242880"} 2' in text
+    assert "# TYPE rvtools_reports_total counter" in text
+
+
+def test_observations_from_other_processes_are_shared(tmp_path):
+    path = str(tmp_path / "metrics.db")
+    store = MetricsStore(path)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        list(pool.map(_record, [path] * 4))
+    assert 'rvtools_maintenance_duration_seconds_count{task="prune"} 4' in store.exposition()
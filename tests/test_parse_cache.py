@@ -0,0 +1,47 @@
+import pandas as pd
+
+from parse_cache import CACHE_VERSION, ParseCache, sha256_file
+from parser import read_inventory
+
+ROWS = [
+    ("vm1", "poweredOn", 2, 4096, 102400, 51200, "h1", "DC1", "C1", "Ubuntu Linux (64-bit)", "U1"),
+    ("vm2", "poweredOff", 4, 8192, 204800, 1024, "", "DC1", "C1", "Microsoft Windows Server 2019 (64-bit)", "U2"),
+]
+HOSTS = [("h1", "DC1", "C1", 2, 32, 512 * 1024)]
+
+
+def test_round_trip_keeps_frames_and_schema(tmp_path, workbook):
+    path = workbook(vinfo_rows=ROWS, vhost_rows=HOSTS)
+    inventory = read_inventory(path)
+    sha = sha256_file(path)
+    cache = ParseCache(tmp_path / "cache")
+    assert cache.get(sha) is None
+
+    cache.put(sha, inventory)
+    assert (tmp_path / "cache" / "inventory" / f"{sha}.v{CACHE_VERSION}.npz").exists()
+    cached = cache.get(sha)
+    pd.testing.assert_frame_equal(cached["vms"], inventory["vms"])
+    pd.testing.assert_frame_equal(cached["hosts"], inventory["hosts"])
+    assert cached["hosts"]["num_cores"].tolist() == [32]
+    assert cached["sheet_names"] == inventory["sheet_names"]
+    assert cached["schema"] == inventory["schema"]
+
+
+def test_store_blob_shares_identical_uploads(tmp_path, workbook):
+    cache = ParseCache(tmp_path / "cache")
+    first = workbook("first.xlsx", vinfo_rows=ROWS)
+    second = tmp_path / "second.xlsx"
+    second.write_bytes(open(first, "rb").read())
+    sha = sha256_file(first)
+
+    blob = cache.store_blob(sha, first)
+    assert cache.store_blob(sha, second) == blob
+    # Stesso contenuto: i due upload sono collegamenti allo stesso blob
+    assert second.stat().st_ino == blob.stat().st_ino
+    assert sha256_file(second) == sha
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = ParseCache(tmp_path / "cache")
+    (tmp_path / "cache" / "inventory" / f"abc.v{CACHE_VERSION}.npz").write_bytes(b"not a zip")
+    assert cache.get("abc") is None
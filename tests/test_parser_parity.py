@@ -0,0 +1,68 @@
+"""
+Parità del parser colonnare con il parser originale riga per riga
+(tests/baseline_parser.py) su workbook sintetici delle varianti di intestazione.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+import baseline_parser
+from parser import parse_rvtools, read_inventory
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bench"))
+from generate_workbook import generate  # noqa: E402
+
+VM_FIELDS = ("power_state", "host", "datacenter", "cluster", "num_cpu", "memory_mb", "disk_used_gb",
+             "disk_provisioned_gb", "num_vcpu", "os", "simple_os")
+TOTALS = ("count", "tot_vcpu", "tot_vram_gb", "tot_disk_used_gb", "tot_disk_prov_gb")
+
+
+@pytest.fixture(scope="module", params=["rvtools4", "legacy", "gb"])
+def parsed(request, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp(request.param) / "synthetic.xlsx")
+    generate(path, vms=1500, hosts=30, variant=request.param, seed=7)
+    return baseline_parser.parse_rvtools(path), parse_rvtools(path), read_inventory(path)
+
+
+def test_vm_values_match_baseline(parsed):
+    baseline, _, inventory = parsed
+    expected = {vm.name: tuple(getattr(vm, f) for f in VM_FIELDS)
+                for vm in baseline["vms_on"] + baseline["vms_off"]}
+    vms = inventory["vms"]
+    actual = {name: tuple(row) for name, *row in vms[["name", *VM_FIELDS]].itertuples(index=False)}
+    assert actual == expected
+
+
+def test_summaries_match_baseline(parsed):
+    baseline, columnar, _ = parsed
+    for key in ("summary_on", "summary_off", "summary_total"):
+        assert {t: columnar[key][t] for t in TOTALS} == {t: baseline[key][t] for t in TOTALS}, key
+    assert set(columnar["datacenters"]) == set(baseline["datacenters"])
+    for dc, expected in baseline["datacenters"].items():
+        for power in ("on", "off"):
+            actual = columnar["datacenters"][dc][power]
+            assert {t: actual[t] for t in TOTALS} == {t: expected[power][t] for t in TOTALS}, (dc, power)
+            assert actual["os_counts"] == expected[power]["os_counts"]
+            assert actual["os_dist"] == expected[power]["os_dist"]
+
+
+def test_hosts_match_baseline(parsed):
+    baseline, columnar, _ = parsed
+    expected = {name: (h.datacenter, h.cluster, h.num_cpu, h.memory_gb, len(h.vms_on), len(h.vms_off))
+                for name, h in baseline["host_stats"].items()}
+    actual = {name: (h.datacenter, h.cluster, h.num_cpu, h.memory_gb, len(h.vms_on), len(h.vms_off))
+              for name, h in columnar["host_stats"].items()}
+    assert actual == expected
+
+
+def test_small_hosts_and_vms_keep_rvtools_units(workbook):
+    # Layout RVTools standard con valori piccoli: "# Memory" e "Memory" restano MiB
+    vms = [(f"vm{i}", "poweredOn", 1, 256, 2048, 1024, "h1", "DC1", "C1", "Ubuntu Linux (64-bit)", f"u{i}")
+           for i in range(2)]
+    path = workbook(vinfo_rows=vms, vhost_rows=[("h1", "DC1", "C1", 1, 4, 8192)])
+    baseline, columnar = baseline_parser.parse_rvtools(path), parse_rvtools(path)
+    assert baseline["host_stats"]["h1"].memory_gb == columnar["host_stats"]["h1"].memory_gb == 8.0
+    assert baseline["summary_total"]["tot_vram_gb"] == columnar["summary_total"]["tot_vram_gb"] == 0.5
+    assert {t: columnar["summary_total"][t] for t in TOTALS} == {t: baseline["summary_total"][t] for t in TOTALS}
@@ -0,0 +1,80 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from conftest import pdf_available
+
+if not pdf_available():
+    pytest.skip("WeasyPrint non disponibile", allow_module_level=True)
+
+import pdf_cache
+from metrics import PhaseTimer
+
+
+def test_parts_render_serially_inside_a_pool(monkeypatch):
+    monkeypatch.setattr(pdf_cache, "PDF_WORKERS", 8)
+    assert pdf_cache._part_workers(5) == 5
+    assert pdf_cache._part_workers(12) == 8
+    # Nei processi del pool dei job o di bulk_ingest niente pool annidato
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(pdf_cache._part_workers, 5).result() == 1
+
+
+@pytest.fixture
+def report(tmp_path):
+    folder = tmp_path / "report"
+    folder.mkdir()
+    (folder / "report.html").write_text("<html>report</html>")
+    return folder
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Rendering finto: scrive un PDF fittizio e conta le chiamate."""
+    calls = []
+
+    def render(report_folder, target, base_dir):
+        time.sleep(0.1)
+        calls.append(target.name)
+        target.write_bytes(b"%PDF-1.7")
+
+    monkeypatch.setattr(pdf_cache, "_render", render)
+    monkeypatch.setattr(pdf_cache, "_render_parts", lambda parts, target, base_dir: render(None, target, base_dir))
+    return calls
+
+
+def test_key_covers_content_branding_and_logo(report, tmp_path):
+    static = tmp_path / "static"
+    static.mkdir()
+    settings = {"primary_color": "#003366", "company_name": "ACME"}
+    key = pdf_cache.pdf_key(report, settings, static)
+    assert pdf_cache.pdf_key(report, {**settings, "company_name": "Altro"}, static) != key
+    (static / "logo.svg").write_text("<svg/>")
+    assert pdf_cache.pdf_key(report, settings, static) != key
+    (static / "logo.svg").unlink()
+    (report / pdf_cache.PRINT_DIR).mkdir()
+    (report / pdf_cache.PRINT_DIR / "01.html").write_text("<html>parte</html>")
+    assert pdf_cache.pdf_key(report, settings, static) != key
+
+
+def test_pdf_is_rendered_once_per_key(report, tmp_path, renders):
+    timer = PhaseTimer()
+    path, key = pdf_cache.get_pdf(report, {}, tmp_path, tmp_path, timer=timer)
+    assert path.name == f"report-{key[:16]}.pdf" and "pdf" in timer.phases
+
+    timer = PhaseTimer()
+    assert pdf_cache.get_pdf(report, {}, tmp_path, tmp_path, timer=timer) == (path, key)
+    assert renders == [path.name] and timer.phases == {}
+
+    # Un cambio di branding genera un nuovo PDF e rimuove il precedente
+    new_path, _ = pdf_cache.get_pdf(report, {"company_name": "Altro"}, tmp_path, tmp_path)
+    assert len(renders) == 2
+    assert sorted(report.glob("report-*.pdf")) == [new_path]
+
+
+def test_concurrent_requests_share_one_render(report, tmp_path, renders):
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: pdf_cache.get_pdf(report, {}, tmp_path, tmp_path), range(4)))
+    assert len(set(results)) == 1
+    assert len(renders) == 1
@@ -0,0 +1,67 @@
+import io
+import pickle
+
+import pydyf
+
+from pdf_merge import detach, merge
+
+
+def _part(texts, lang=None):
+    """Documento pydyf come quello passato da WeasyPrint al finisher: una pagina per testo."""
+    pdf = pydyf.PDF()
+    pdf.info["Title"] = pydyf.String("Report")
+    if lang:
+        pdf.catalog["Lang"] = pydyf.String(lang)
+    font = pydyf.Dictionary({"Type": "/Font", "Subtype": "/Type1", "BaseFont": "/Courier"})
+    pdf.add_object(font)
+    resources = pydyf.Dictionary({"Font": pydyf.Dictionary({"F1": font.reference})})
+    pdf.add_object(resources)
+    for text in texts:
+        content = pydyf.Stream()
+        content.begin_text()
+        # Elementi non bytes nello stream, come i numeri scritti da WeasyPrint
+        content.set_font_size("F1", 12.5)
+        content.move_text_to(72, 720)
+        content.show_text_string(text)
+        content.end_text()
+        pdf.add_object(content)
+        pdf.add_page(pydyf.Dictionary({
+            "Type": "/Page", "Parent": pdf.pages.reference, "MediaBox": pydyf.Array([0, 0, 595, 842]),
+            "Resources": resources.reference, "Contents": content.reference,
+        }))
+    return pdf
+
+
+def _page_text(pdf, page) -> bytes:
+    # Contents: stato salvato, contenuto originale, etichetta del numero di pagina
+    _, content, label = (pdf.objects[int(ref.split()[0])] for ref in page["Contents"])
+    return b"\n".join(content.stream + label.stream)
+
+
+def test_merge_renumbers_parts_and_pages():
+    # Le parti attraversano il confine tra processi: devono sopravvivere a pickle
+    parts = [pickle.loads(pickle.dumps(detach(_part(texts, lang))))
+             for texts, lang in ((["uno", "due"], "it"), (["tre"], None))]
+    pdf = merge(parts)
+
+    assert pdf.pages["Count"] == 3
+    assert pdf.catalog["Lang"].data == b"(it)"
+    pages = [pdf.objects[int(n)] for n in pdf.pages["Kids"][::3]]
+    for number, (page, text) in enumerate(zip(pages, ["uno", "due", "tre"]), start=1):
+        content = _page_text(pdf, page)
+        assert f"({text}) Tj".encode() in content
+        assert f"(Pagina {number} di 3) Tj".encode() in content
+        assert b"/F1 12.5 Tf" in content
+        # Il font del contenuto punta a quello della propria parte, rinumerato
+        resources = pdf.objects[int(page["Resources"].split()[0])]
+        assert pdf.objects[int(resources["Font"]["F1"].split()[0])]["BaseFont"] == "/Courier"
+
+    output = io.BytesIO()
+    pdf.write(output, compress=True)
+    assert output.getvalue().startswith(b"%PDF-")
+    assert output.getvalue().rstrip().endswith(b"%%EOF")
+
+
+def test_merge_without_parts():
+    pdf = merge([])
+    assert pdf.pages["Count"] == 0
@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import pdf_available
+
+if not pdf_available():
+    # pipeline importa pdf_cache, che richiede WeasyPrint e le sue librerie di sistema
+    pytest.skip("WeasyPrint non disponibile", allow_module_level=True)
+
+import pipeline
+from catalog import READY, Catalog
+from search_index import SearchIndex
+
+ROWS = [("vm1", "poweredOn", 2, 4096, 102400, 51200, "h1", "DC1", "C1", "Ubuntu Linux (64-bit)", "u1")]
+
+
+@pytest.fixture
+def job(tmp_path, workbook):
+    upload_folder, report_folder = tmp_path / "uploads" / "r1", tmp_path / "reports" / "r1"
+    upload_folder.mkdir(parents=True)
+    report_folder.mkdir(parents=True)
+    catalog = Catalog(tmp_path / "catalog.sqlite3")
+    catalog.add_pending("r1", "rvtools.xlsx", "2026-01-01T10:00:00")
+    params = {
+        "report_id": "r1",
+        "xlsx_path": workbook(vinfo_rows=ROWS),
+        "filename": "rvtools.xlsx",
+        "upload_folder": str(upload_folder),
+        "report_folder": str(report_folder),
+        "cache_dir": str(tmp_path / "cache"),
+        "settings": {},
+        "created": "2026-01-01T10:00:00",
+        "catalog_path": str(tmp_path / "catalog.sqlite3"),
+        "search_path": str(tmp_path / "search.sqlite3"),
+    }
+    return params, catalog
+
+
+def test_report_is_generated_and_catalogued(job):
+    params, catalog = job
+    meta = pipeline.generate_report(**params)
+    assert meta["total"] == 1
+    assert catalog.get("r1")["status"] == READY
+    assert SearchIndex(params["search_path"]).indexed() == {"r1"}
+
+
+@pytest.mark.parametrize("target", ["write_report", "write_print_parts", "build_vm_index"])
+def test_failure_in_any_phase_leaves_nothing_behind(job, monkeypatch, target):
+    params, catalog = job
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(pipeline, target, fail)
+    with pytest.raises(RuntimeError):
+        pipeline.generate_report(**params)
+    assert catalog.get("r1") is None
+    assert not pipeline.Path(params["report_folder"]).exists()
+    assert not pipeline.Path(params["upload_folder"]).exists()
+    assert SearchIndex(params["search_path"]).indexed() == set()
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from conftest import VHOST_HEADER, VINFO_HEADER
+from parser import check_workbook
+from schema import resolve
+
+# Intestazione "legacy" del generatore di bench/: nessun layout RVTools noto
+LEGACY_VINFO = ["Name", "Power State", "Num CPUs", "Memory MB", "Provisioned MB", "In Use MB", "DC", "Cluster",
+                "ESX Host", "Guest OS"]
+
+
+def test_known_layout_has_nothing_missing():
+    schema = resolve("vInfo", VINFO_HEADER)
+    assert schema.layout == "RVTools 4.x"
+    assert schema.missing == []
+    assert schema.missing_optional == []
+
+
+def test_optional_fields_are_not_missing():
+    # Senza UUID il layout resta riconosciuto e nessun campo atteso manca
+    schema = resolve("vInfo", [h for h in VINFO_HEADER if h != "VM UUID"])
+    assert schema.layout == "RVTools 4.x"
+    assert schema.missing == []
+    assert schema.missing_optional == ["UUID"]
+
+    hosts = resolve("vHost", ["Host", "# CPU", "# Memory"])
+    assert hosts.missing == []
+    assert hosts.missing_optional == ["Datacenter", "Cluster", "Cores"]
+    assert resolve("vHost", VHOST_HEADER).layout == "RVTools 3.x/4.x"
+
+
+def test_unknown_layout_without_missing_fields():
+    schema = resolve("vInfo", LEGACY_VINFO)
+    assert schema.layout is None
+    assert schema.missing == []
+    assert schema.describe({})["missing_optional"] == ["UUID"]
+
+
+def test_check_workbook_reports_only_expected_fields(workbook):
+    legacy = check_workbook(workbook("legacy.xlsx", vinfo_header=LEGACY_VINFO))
+    assert legacy["layout"] is None
+    assert legacy["missing"] == []
+
+    partial = check_workbook(workbook("partial.xlsx", vinfo_header=["VM", "Powerstate", "CPUs", "VM UUID"]))
+    assert partial["missing"] == ["Host", "Datacenter", "Cluster", "Memory", "Disk gb", "In Use MB", "OS"]
+
+    with pytest.raises(ValueError, match="Powerstate"):
+        check_workbook(workbook("broken.xlsx", vinfo_header=["VM", "CPUs"]))
+
+
+def test_known_layout_units_are_fixed():
+    vinfo = resolve("vInfo", VINFO_HEADER)
+    assert vinfo.unit("Memory", np.array([256.0, 256.0])) == "MiB"
+    hosts = resolve("vHost", VHOST_HEADER)
+    values, unit = hosts.convert("Memory", np.array([8192.0]))
+    assert (unit, values.tolist()) == ("MiB", [8.0])
+    assert vinfo.describe({"Memory": "MiB"})["inferred"] == []
+
+
+def test_unknown_layout_infers_units_from_values():
+    hosts = resolve("vHost", ["Name", "CPUs", "RAM"])
+    assert hosts.layout is None
+    assert hosts.unit("Memory", np.array([512.0, 768.0])) == "GB"
+    assert hosts.unit("Memory", np.array([262144.0, 524288.0])) == "MiB"
+    # Il solo nome "Memory" fuori da un layout noto non fissa l'unità
+    vinfo = resolve("vInfo", ["VM", "Powerstate", "Memory"])
+    assert vinfo.layout is None
+    assert vinfo.unit("Memory", np.array([16.0, 32.0])) == "GB"
@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+from parser import read_inventory
+from search_index import SearchIndex, parse_query
+
+
+def _vm(name, host, os_name="Ubuntu Linux (64-bit)", power="poweredOn"):
+    return (name, power, 2, 4096, 102400, 51200, host, "DC1", "C1", os_name, name.upper())
+
+
+def _add(index, workbook, report_id, created, rows, title="Sede"):
+    vms = read_inventory(workbook(f"{report_id}.xlsx", vinfo_rows=rows))["vms"]
+    index.add({"id": report_id, "created": created, "custom_title": title, "filename": f"{report_id}.xlsx"}, vms)
+
+
+@pytest.fixture
+def index(tmp_path, workbook):
+    index = SearchIndex(tmp_path / "search.sqlite3")
+    _add(index, workbook, "r1", "2026-03-01T10:00:00", [_vm("web-01", "esx-a"), _vm("db-01", "esx-a")])
+    _add(index, workbook, "r2", "2026-04-01T10:00:00", [_vm("web-01", "esx-b"), _vm("app-01", "esx-b")])
+    return index
+
+
+def test_history_of_a_vm(index):
+    result = index.search("web-01", field="vm")
+    assert [(m["value"], m["reports"], m["first_seen"][:10], m["present"]) for m in result["matches"]] == [
+        ("web-01", 2, "2026-03-01", True),
+    ]
+    # Su quale host era la VM a marzo
+    assert [(h["report_id"], h["host"]) for h in result["hits"]] == [("r2", "esx-b"), ("r1", "esx-a")]
+    march = index.search("web-01", field="vm", until="2026-03-31")
+    assert [h["host"] for h in march["hits"]] == ["esx-a"]
+
+
+def test_absent_from_latest_report(index):
+    result = index.search("db-01")
+    assert [(m["field"], m["present"], m["last_report_id"]) for m in result["matches"]] == [("vm", False, "r1")]
+
+
+def test_short_query_and_prefix(index):
+    # Sotto i 3 caratteri niente trigram: scansione dei termini
+    assert {m["value"] for m in index.search("01", field="vm")["matches"]} == {"web-01", "db-01", "app-01"}
+    assert {m["value"] for m in index.search("esx", field="host", mode="prefix")["matches"]} == {"esx-a", "esx-b"}
+    assert index.search("sx-", mode="prefix")["matches"] == []
+
+
+def test_delete_prunes_orphan_terms(index):
+    index.delete("r1")
+    assert index.indexed() == {"r2"}
+    assert index.search("db-01")["matches"] == []
+    assert index.search("esx-a")["matches"] == []
+    with sqlite3.connect(index.path) as conn:
+        terms = {value for value, in conn.execute("SELECT value FROM terms")}
+        fts = {value for value, in conn.execute("SELECT value FROM terms_fts WHERE terms_fts MATCH '\"esx\"'")}
+    assert "db-01" not in terms and "esx-a" not in terms
+    assert fts == {"esx-b"}
+    # I termini condivisi con altri report restano
+    assert [m["reports"] for m in index.search("web-01", field="vm")["matches"]] == [1]
+
+
+def test_reindexing_replaces_rows(index, workbook):
+    _add(index, workbook, "r2", "2026-04-01T10:00:00", [_vm("web-01", "esx-c")])
+    assert [h["host"] for h in index.search("web-01", field="vm")["hits"]] == ["esx-c", "esx-a"]
+    assert index.search("app-01")["matches"] == []
+
+
+@pytest.mark.parametrize("args, message", [
+    ({}, "q obbligatorio"),
+    ({"q": "x", "field": "ram"}, "Campo non supportato"),
+    ({"q": "x", "mode": "regex"}, "Modalità"),
+    ({"q": "x", "since": "01/03/2026"}, "Data non valida"),
+    ({"q": "x", "limit": "0"}, "limit"),
+])
+def test_parse_query_rejects_bad_parameters(args, message):
+    with pytest.raises(ValueError, match=message):
+        parse_query(args)
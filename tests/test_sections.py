@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import openpyxl
+import pytest
+
+from conftest import VINFO_HEADER
+import sections
+from sections import available_sections, get_section
+
+UPLOADED = datetime(2024, 6, 1, 12, 0)
+
+
+@pytest.fixture
+def folders(tmp_path):
+    """Cartella del report (con timestamp.txt) e cartella dell'upload con un export completo."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "vInfo"
+    ws.append(VINFO_HEADER)
+    snaps = wb.create_sheet("vSnapshot")
+    snaps.append(["VM", "Name", "Date / time", "Size MiB (total)", "Datacenter", "Host"])
+    snaps.append(["vm1", "pre-upgrade", datetime(2024, 5, 29), 2048, "DC1", "h1"])
+    snaps.append(["vm1", "old", datetime(2023, 1, 1), 10240, "DC1", "h1"])
+    snaps.append(["vm2", "no date", None, 1024, "DC2", "h2"])
+    snaps.append([None, "orfano", datetime(2024, 5, 1), 512, "DC2", "h2"])
+    parts = wb.create_sheet("vPartition")
+    parts.append(["VM", "Disk", "Capacity MiB", "Consumed MiB", "Datacenter"])
+    parts.append(["vm1", "/", 10240, 9728, "DC1"])
+    parts.append(["vm2", "C:\\", 20480, 10240, "DC2"])
+    disks = wb.create_sheet("vDisk")
+    disks.append(["VM", "Disk", "Capacity MiB", "Thin", "Disk Mode", "Datacenter"])
+    disks.append(["vm1", "Hard disk 1", 10240, "True", "persistent", "DC1"])
+    disks.append(["vm1", "Hard disk 2", 20480, "False", None, "DC1"])
+
+    upload, report = tmp_path / "upload", tmp_path / "report"
+    upload.mkdir()
+    report.mkdir()
+    wb.save(upload / "rvtools.xlsx")
+    (report / "timestamp.txt").write_text(UPLOADED.isoformat())
+    return report, upload
+
+
+def test_available_sections_follow_sheets():
+    assert [key for key, _, _ in available_sections(["vInfo", "vDisk", "vSnapshot"])] == ["snapshots", "disks"]
+    assert available_sections(["vInfo"]) == []
+
+
+def test_snapshots_age_from_upload_time(folders):
+    data = get_section("snapshots", *folders)
+    summary = data["summary"]
+    # La riga senza VM è scartata
+    assert (summary["count"], summary["vms"], summary["undated"]) == (3, 2, 1)
+    assert summary["size_gb"] == 13.0
+    assert summary["oldest"].startswith("2023-01-01")
+    assert {b["label"]: b["count"] for b in data["age_buckets"]} == {
+        "< 7 giorni": 1, "7-30 giorni": 0, "30-90 giorni": 0, "> 90 giorni": 1}
+    assert [s["name"] for s in data["largest"]] == ["old", "pre-upgrade", "no date"]
+
+
+def test_partitions_free_space_by_difference(folders):
+    data = get_section("partitions", *folders)
+    summary = data["summary"]
+    assert (summary["capacity_gb"], summary["consumed_gb"], summary["free_gb"]) == (30.0, 19.5, 10.5)
+    assert summary["low_free"] == 1
+    assert [p["vm"] for p in data["low_free"]] == ["vm1"]
+
+
+def test_disks_thin_and_modes(folders):
+    data = get_section("disks", *folders)
+    assert data["summary"] == {"disks": 2, "vms": 1, "capacity_gb": 30.0, "thin": 1, "thin_gb": 10.0}
+    assert {m["mode"]: m["disks"] for m in data["modes"]} == {"persistent": 1, sections.EMPTY_LABEL: 1}
+
+
+def test_section_is_computed_once(folders, monkeypatch):
+    report, upload = folders
+    first = get_section("disks", report, upload)
+    assert (report / sections.SECTIONS_DIR / f"disks.v{sections.SECTIONS_VERSION}.json").exists()
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("il foglio non deve essere riletto")
+    monkeypatch.setattr(sections, "XlsxReader", unexpected)
+    assert get_section("disks", report, upload) == first
+
+
+def test_missing_sheet_or_file(folders, tmp_path):
+    report, upload = folders
+    wb = openpyxl.Workbook()
+    wb.active.title = "vInfo"
+    wb.save(upload / "rvtools.xlsx")
+    with pytest.raises(FileNotFoundError):
+        get_section("snapshots", report, upload)
+    with pytest.raises(FileNotFoundError):
+        get_section("snapshots", report, tmp_path / "vuota")
+    with pytest.raises(KeyError):
+        get_section("networks", report, upload)
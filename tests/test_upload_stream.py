@@ -0,0 +1,117 @@
+import hashlib
+import io
+import os
+import time
+import zipfile
+
+import openpyxl
+import pytest
+from flask import Flask, jsonify, request
+
+from conftest import VINFO_HEADER
+from parser import check_workbook
+from upload_stream import PART_PREFIX, PART_SUFFIX, StreamingRequest, purge_parts
+
+ROWS = [("vm1", "poweredOn", 2, 4096, 102400, 51200, "h1", "DC1", "C1", "Ubuntu Linux (64-bit)", "u1")]
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "uploads"
+    directory.mkdir()
+    monkeypatch.setattr(StreamingRequest, "upload_dir", directory)
+    return directory
+
+
+@pytest.fixture
+def client(upload_dir):
+    app = Flask(__name__)
+    app.request_class = StreamingRequest
+
+    @app.route("/keep", methods=["POST"])
+    def keep():
+        f = request.files["file"]
+        f.stream.flush()
+        seen = {"part": f.stream.path.parent == upload_dir, "size": f.stream.size, "sha256": f.stream.hexdigest()}
+        f.stream.commit(upload_dir / "kept.xlsx")
+        return jsonify(seen)
+
+    @app.route("/reject", methods=["POST"])
+    def reject():
+        request.files["file"]
+        return jsonify(error="rifiutato"), 400
+
+    return app.test_client()
+
+
+def _post(client, url, data: bytes, name="rvtools.xlsx"):
+    return client.post(url, data={"file": (io.BytesIO(data), name)}, content_type="multipart/form-data")
+
+
+def _parts(directory) -> list:
+    return sorted(directory.glob(f"{PART_PREFIX}*{PART_SUFFIX}"))
+
+
+def test_xlsx_is_received_in_place_with_its_hash(client, upload_dir):
+    data = os.urandom(300_000)
+    seen = _post(client, "/keep", data).get_json()
+    assert seen == {"part": True, "size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+    assert (upload_dir / "kept.xlsx").read_bytes() == data
+    assert _parts(upload_dir) == []
+
+
+def test_rejected_upload_leaves_no_part_file(client, upload_dir):
+    assert _post(client, "/reject", b"x" * 1000).status_code == 400
+    assert _parts(upload_dir) == []
+
+
+def test_other_files_are_not_written_to_the_upload_dir(client, upload_dir):
+    _post(client, "/reject", b"x" * 1000, name="note.txt")
+    assert list(upload_dir.iterdir()) == []
+
+
+def test_purge_parts_removes_only_old_parts(upload_dir):
+    old, recent = upload_dir / f"{PART_PREFIX}old{PART_SUFFIX}", upload_dir / f"{PART_PREFIX}new{PART_SUFFIX}"
+    other = upload_dir / "rvtools.xlsx"
+    for path in (old, recent, other):
+        path.write_bytes(b"x")
+    two_days_ago = time.time() - 48 * 3600
+    os.utime(old, (two_days_ago, two_days_ago))
+    os.utime(other, (two_days_ago, two_days_ago))
+    purge_parts(upload_dir)
+    assert sorted(upload_dir.iterdir()) == [recent, other]
+
+
+# ── Rifiuto prima del parsing (check_workbook) ───────────────────────────────
+def test_check_workbook_accepts_rvtools(workbook):
+    checked = check_workbook(workbook(vinfo_rows=ROWS, vhost_rows=[]))
+    assert (checked["vinfo"], checked["vhost"], checked["missing"]) == ("vInfo", "vHost", [])
+
+
+def test_check_workbook_rejects_non_zip(tmp_path):
+    path = tmp_path / "finto.xlsx"
+    path.write_bytes(b"non sono uno zip")
+    with pytest.raises(ValueError, match="non è un workbook Excel valido"):
+        check_workbook(str(path))
+
+
+def test_check_workbook_rejects_zip_without_workbook(tmp_path):
+    path = tmp_path / "archivio.xlsx"
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("readme.txt", "ciao")
+    with pytest.raises(ValueError, match="non è un workbook Excel valido"):
+        check_workbook(str(path))
+
+
+def test_check_workbook_rejects_missing_vinfo(tmp_path):
+    wb = openpyxl.Workbook()
+    wb.active.title = "Foglio1"
+    wb.save(tmp_path / "altro.xlsx")
+    with pytest.raises(ValueError, match="Foglio vInfo non trovato"):
+        check_workbook(str(tmp_path / "altro.xlsx"))
+
+
+def test_check_workbook_rejects_missing_required_columns(workbook):
+    header = [h for h in VINFO_HEADER if h != "Powerstate"]
+    with pytest.raises(ValueError, match="Colonne obbligatorie mancanti"):
+        check_workbook(workbook(vinfo_header=header))
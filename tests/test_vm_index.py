@@ -0,0 +1,41 @@
+import pytest
+
+from parse_cache import save_inventory
+from parser import read_inventory
+from vm_index import INDEX_FILE, INVENTORY_FILE, build_vm_index, get_vm_index
+
+ROWS = [
+    ("beta", "poweredOn", 4, 8192, 102400, 51200, "h1", "DC1", "C1", "Ubuntu Linux (64-bit)", "U1"),
+    ("Alpha", "poweredOff", 2, 4096, 102400, 51200, "", "DC1", "C1", "Microsoft Windows Server 2019 (64-bit)", "U2"),
+    ("gamma", "poweredOn", 8, 16384, 102400, 51200, "h2", "", "C2", "Ubuntu Linux (64-bit)", "U3"),
+]
+
+
+@pytest.fixture
+def vm_index(tmp_path, workbook):
+    inventory = read_inventory(workbook(vinfo_rows=ROWS))
+    save_inventory(tmp_path / INVENTORY_FILE, inventory)
+    build_vm_index(inventory["vms"], tmp_path / INDEX_FILE)
+    return get_vm_index(tmp_path)
+
+
+def test_sort_is_case_insensitive_and_reversible(vm_index):
+    assert [v["name"] for v in vm_index.query()["items"]] == ["Alpha", "beta", "gamma"]
+    assert [v["name"] for v in vm_index.query(sort="-num_vcpu")["items"]] == ["gamma", "beta", "Alpha"]
+    with pytest.raises(ValueError):
+        vm_index.query(sort="uuid")
+
+
+def test_filters_use_report_labels(vm_index):
+    # Host e datacenter vuoti si filtrano con l'etichetta "N/D" del report
+    assert [v["name"] for v in vm_index.query(host="N/D")["items"]] == ["Alpha"]
+    assert [v["name"] for v in vm_index.query(dc="N/D")["items"]] == ["gamma"]
+    assert [v["name"] for v in vm_index.query(power="on", family="linux")["items"]] == ["beta", "gamma"]
+    assert [v["name"] for v in vm_index.query(q="ALP")["items"]] == ["Alpha"]
+
+
+def test_pagination_clamps_page(vm_index):
+    result = vm_index.query(per_page=2, page=9)
+    assert (result["page"], result["pages"], result["total"]) == (2, 2, 3)
+    assert [v["name"] for v in result["items"]] == ["gamma"]
+    assert result["items"][0]["vram_gb"] == 16.0
@@ -0,0 +1,55 @@
+import pytest
+
+from parser import read_inventory
+from whatif import WhatIf, parse_params
+
+
+def _vms(n, host="h1", cluster="C1"):
+    # 4 vCPU e 8 GB ciascuna, tutte accese
+    return [(f"vm{i}", "poweredOn", 4, 8192, 102400, 51200, host, "DC1", cluster, "Ubuntu Linux (64-bit)", f"u{i}")
+            for i in range(n)]
+
+
+def test_pcpu_capacity_comes_from_cores(workbook):
+    # 2 host da 2 socket e 32 core: a 4:1 ognuno ospita 32 VM da 4 vCPU
+    hosts = [("h1", "DC1", "C1", 2, 32, 512 * 1024), ("h2", "DC1", "C1", 2, 32, 512 * 1024)]
+    inventory = read_inventory(workbook(vinfo_rows=_vms(40), vhost_rows=hosts))
+    assert inventory["hosts"]["num_cores"].tolist() == [32, 32]
+
+    result = WhatIf(inventory).simulate(cpu_ratio=4, mem_ratio=1, reserve=0)
+    s = result["summary"]
+    assert s["pcpu"] == 64
+    assert s["vcpu_per_pcpu"] == 2.5
+    assert s["unplaced_vms"] == 0
+    assert s["hosts_needed"] == 2
+    assert s["pcpu_basis"] == "cores"
+    assert s["hosts_pcpu_sockets"] == 0
+
+
+def test_falls_back_to_sockets_and_says_so(workbook):
+    header = ["Host", "Datacenter", "Cluster", "# CPU", "# Memory"]
+    hosts = [("h1", "DC1", "C1", 2, 512 * 1024), ("h2", "DC1", "C1", 2, 512 * 1024)]
+    inventory = read_inventory(workbook(vinfo_rows=_vms(4), vhost_rows=hosts, vhost_header=header))
+
+    s = WhatIf(inventory).simulate(cpu_ratio=4, mem_ratio=1, reserve=0)["summary"]
+    assert s["pcpu"] == 4
+    assert s["pcpu_basis"] == "sockets"
+    assert s["hosts_pcpu_sockets"] == 2
+    # 2 socket a 4:1 = 8 vCPU per host: 2 VM da 4 vCPU per host
+    assert s["unplaced_vms"] == 0 and s["hosts_needed"] == 2
+
+
+def test_reserve_and_overflow(workbook):
+    hosts = [("h1", "DC1", "C1", 2, 8, 512 * 1024), ("h2", "DC1", "C1", 2, 8, 512 * 1024)]
+    inventory = read_inventory(workbook(vinfo_rows=_vms(10), vhost_rows=hosts))
+    # Un host di riserva: resta un host da 8 core x 4 = 32 vCPU, cioè 8 VM
+    s = WhatIf(inventory).simulate(cpu_ratio=4, mem_ratio=1, reserve=1)["summary"]
+    assert s["unplaced_vms"] == 2
+    assert s["clusters_over_capacity"] == 1
+    assert s["hosts_freed"] == 0
+
+
+@pytest.mark.parametrize("args", [{"cpu_ratio": "0"}, {"cpu_ratio": "x"}, {"reserve": "-1"}, {"mem_ratio": "9"}])
+def test_parse_params_rejects_invalid(args):
+    with pytest.raises(ValueError):
+        parse_params(args)
@@ -0,0 +1,43 @@
+import io
+import tracemalloc
+from datetime import datetime
+
+import openpyxl
+
+from conftest import VINFO_HEADER
+from parser import read_inventory
+from xlsx_reader import ROW, SHEET_DATA, XlsxReader, _iter_elements
+
+
+def test_iso_date_cells_are_read_as_text(tmp_path):
+    # Celle t="d" (date ISO 8601), come le scrivono alcuni strumenti al posto del numero seriale
+    wb = openpyxl.Workbook(iso_dates=True)
+    ws = wb.active
+    ws.title = "vInfo"
+    ws.append(VINFO_HEADER + ["Creation date"])
+    ws.append(["vm1", "poweredOn", 2, 4096, 102400, 51200, "h1", "DC1", "C1", "Ubuntu Linux (64-bit)", "u1",
+               datetime(2024, 5, 1, 12, 30)])
+    path = tmp_path / "dates.xlsx"
+    wb.save(path)
+
+    with XlsxReader(str(path)) as xl:
+        frame = xl.read_sheet("vInfo")
+    assert frame["Creation date"].tolist() == ["2024-05-01T12:30:00"]
+    assert read_inventory(str(path))["vms"]["name"].tolist() == ["vm1"]
+
+
+def _peak_bytes(rows: int) -> int:
+    xml = ("<worksheet><sheetData>" + "".join(f'<row r="{i}"><c r="A{i}"><v>{i}</v></c></row>'
+                                             for i in range(1, rows + 1)) + "</sheetData></worksheet>").encode()
+    f = io.BytesIO(xml)
+    tracemalloc.start()
+    seen = sum(1 for _ in _iter_elements(f, ROW, SHEET_DATA))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert seen == rows
+    return peak
+
+
+def test_memory_does_not_grow_with_rows():
+    # Le righe già lette vengono staccate da sheetData, non solo svuotate
+    assert _peak_bytes(50000) < 2 * _peak_bytes(5000)